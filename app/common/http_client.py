@@ -1,91 +1,174 @@
 from __future__ import annotations
 
+import asyncio
+import datetime as dt
+import logging
+import os
 import random
 import time
-from functools import lru_cache
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
 from typing import Any
 
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 from .errors import ExternalError
 from .logging_setup import get_correlation_id, get_logger
+from .settings import settings
 
 # ----------------------------------------------------------------------
 # Configuração
 # ----------------------------------------------------------------------
 DEFAULT_TIMEOUT: tuple[int, int] = (5, 30)  # (connect, read)
+ASYNC_TIMEOUT = httpx.Timeout(connect=5, read=30, write=30, pool=5)
+ASYNC_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
 TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+# forma em set para checagem O(1) no caminho quente (a tupla segue exportada para quem precisa de iterável)
+TRANSIENT_STATUSES_SET: frozenset[int] = frozenset(TRANSIENT_STATUSES)
 # Inclui POST porque alguns endpoints de terceiros consideram POST idempotente/retry-safe
 IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "POST"})
 
+DEFAULT_HEADERS: dict[str, str] = {
+    "User-Agent": "lg-logistica-v2/HTTPClient (+https://example.invalid)",
+    "Accept": "application/json, */*;q=0.1",
+}
+
 logger = get_logger("http")
 
 
 # ----------------------------------------------------------------------
 # Retry / Session
 # ----------------------------------------------------------------------
-def _build_retry(
-    total: int = 5,
-    backoff_factor: float = 0.5,
-    statuses: tuple[int, ...] = TRANSIENT_STATUSES,
-    methods: frozenset[str] = IDEMPOTENT_METHODS,
-) -> Retry:
-    """
-    Cria política de retry exponencial com respeito ao cabeçalho Retry-After (429/503).
-    """
-    common_kwargs: dict[str, Any] = {
-        "total": total,
-        "connect": total,
-        "read": total,
-        "status": total,
-        "backoff_factor": backoff_factor,
-        "status_forcelist": statuses,
-        "raise_on_status": False,
-        "respect_retry_after_header": True,
-    }
-    # Compat com versões antigas do urllib3
+RETRY_TOTAL = 5
+RETRY_BASE_S = 0.5
+RETRY_CAP_S = 30.0
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """
+    Interpreta o cabeçalho Retry-After (segundos ou HTTP-date). Retorna None se ausente/inválido.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
     try:
-        return Retry(allowed_methods=methods, **common_kwargs)
-    except TypeError:
-        return Retry(method_whitelist=methods, **common_kwargs)  # type: ignore[arg-type]
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt.UTC)
+    return max(0.0, (when - dt.datetime.now(dt.UTC)).total_seconds())
+
+
+def _backoff_delay(
+    attempt: int,
+    retry_after: float | None = None,
+    base_s: float = RETRY_BASE_S,
+    cap_s: float = RETRY_CAP_S,
+) -> float:
+    """
+    Backoff exponencial com "full jitter": uniform(0, min(cap, base * 2**attempt)).
+    Se o servidor mandou Retry-After, espera pelo menos esse tempo (limitado a `cap_s`).
+    """
+    delay = random.uniform(0, min(cap_s, base_s * (2**attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap_s))
+    return delay
+
+
+# Pool dimensionado pela concorrência real de workers. `pool_block=True` faz quem exceder o pool
+# esperar por uma conexão keep-alive (TLS já negociado) em vez de abrir sockets extras.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", str(settings.GURU_MAX_CONCURRENCY * 4)))
+
+# Adapter único do processo. Quem injeta `session=` própria deve montar este mesmo adapter
+# (`s.mount("https://", ADAPTER)`) para compartilhar o pool.
+ADAPTER = HTTPAdapter(
+    max_retries=0,
+    pool_connections=HTTP_POOL_SIZE,
+    pool_maxsize=HTTP_POOL_SIZE,
+    pool_block=True,
+)
 
 
 def _build_session() -> requests.Session:
     """
     Cria uma sessão com:
       - headers default
-      - pool de conexões
-      - retry/backoff para erros transitórios
+      - pool de conexões compartilhado (ADAPTER)
+    Retries ficam a cargo de `_request_with_handling` (full jitter), não do urllib3.
     """
     s = requests.Session()
-    s.headers.update(
-        {
-            "User-Agent": "lg-logistica-v2/HTTPClient (+https://example.invalid)",
-            "Accept": "application/json, */*;q=0.1",
-        }
-    )
-    retry = _build_retry()
-    adapter = HTTPAdapter(max_retries=retry, pool_connections=50, pool_maxsize=50)
-    s.mount("https://", adapter)
-    s.mount("http://", adapter)
+    s.headers.update(DEFAULT_HEADERS)
+    s.mount("https://", ADAPTER)
+    s.mount("http://", ADAPTER)
     return s
 
 
-@lru_cache(maxsize=1)
-def _get_cached_session() -> requests.Session:
+@dataclass
+class _Clientes:
+    """Clientes HTTP compartilhados do processo, criados na primeira necessidade."""
+
+    session: requests.Session | None = None  # sync (pool)
+    async_client: httpx.AsyncClient | None = None  # async (httpx)
+
+
+_CLIENTES = _Clientes()
+
+
+def get_session(session: requests.Session | None = None) -> requests.Session:
     """
-    Sessão compartilhada entre chamadas (pool + retry).
+    Permite injetar uma sessão custom, senão usa a compartilhada.
     """
-    return _build_session()
+    if session is not None:
+        return session
+    if _CLIENTES.session is None:
+        _CLIENTES.session = _build_session()
+    return _CLIENTES.session
 
 
-def get_session(session: requests.Session | None = None) -> requests.Session:
+# ----------------------------------------------------------------------
+# Cliente assíncrono (httpx)
+# ----------------------------------------------------------------------
+def _build_async_client() -> httpx.AsyncClient:
     """
-    Permite injetar uma sessão custom, senão usa a cacheada.
+    Cria o AsyncClient compartilhado (pool + HTTP/2 quando o pacote `h2` está instalado).
     """
-    return session or _get_cached_session()
+    try:
+        import h2  # noqa: F401
+
+        http2 = True
+    except ImportError:
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=ASYNC_LIMITS,
+        timeout=ASYNC_TIMEOUT,
+        headers=DEFAULT_HEADERS,
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    AsyncClient único por processo. Deve ser usado apenas a partir do event loop do app
+    (as conexões ficam presas ao loop em que foram abertas).
+    """
+    client = _CLIENTES.async_client
+    if client is None or client.is_closed:
+        client = _CLIENTES.async_client = _build_async_client()
+    return client
+
+
+async def aclose_async_client() -> None:
+    """
+    Fecha o AsyncClient compartilhado (chamado no shutdown do app).
+    """
+    client, _CLIENTES.async_client = _CLIENTES.async_client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
 
 
 # ----------------------------------------------------------------------
@@ -95,86 +178,214 @@ def _request_with_handling(method: str, url: str, **kwargs: Any) -> requests.Res
     """
     Wrapper com:
       - timeout padrão (connect/read)
-      - retry/backoff (na sessão)
+      - retry com backoff exponencial "full jitter" (status/erros transitórios, métodos idempotentes)
+      - respeito ao cabeçalho Retry-After
       - correlation-id automático
-      - jitter opcional para suavizar thundering herd
       - mapeamento de exceções para ExternalError com flags de retry
     """
     timeout = kwargs.pop("timeout", DEFAULT_TIMEOUT)
     session: requests.Session = kwargs.pop("session", get_session())
-    jitter_max: float = kwargs.pop("jitter_max", 0.0)
+    # `jitter_max` é aceito por compatibilidade, mas ignorado aqui: dormir antes da 1ª tentativa
+    # prende a thread do worker à toa, e o full jitter do retry já descorrelaciona os clientes.
+    # (Na versão assíncrona o jitter continua, via asyncio.sleep.)
+    kwargs.pop("jitter_max", None)
+    total: int = kwargs.pop("retries", RETRY_TOTAL)
 
     # alerta se alguém desativar TLS sem querer
     if kwargs.get("verify") is False:
         logger.warning("TLS verification disabled explicitly for %s", url)
 
+    # adiciona correlation-id (o requests já mescla com session.headers internamente)
+    cid = get_correlation_id()
+    headers = kwargs.pop("headers", None)
+    if not headers:
+        headers = {"X-Correlation-ID": cid}
+    elif "X-Correlation-ID" not in headers:
+        headers = {**headers, "X-Correlation-ID": cid}
+    kwargs["headers"] = headers
+
+    max_attempts = total + 1 if method.upper() in IDEMPOTENT_METHODS else 1
+    for attempt in range(max_attempts):
+        last = attempt == max_attempts - 1
+        try:
+            res = session.request(method, url, timeout=timeout, **kwargs)
+            if res.status_code in TRANSIENT_STATUSES_SET and not last:
+                delay = _backoff_delay(attempt, _parse_retry_after(res.headers.get("Retry-After")))
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning(
+                        "HTTP %s retry",
+                        method,
+                        extra={
+                            "url": url,
+                            "status": res.status_code,
+                            "attempt": attempt + 1,
+                            "sleep_s": round(delay, 3),
+                        },
+                    )
+                res.close()
+                time.sleep(delay)
+                continue
+            res.raise_for_status()
+            # evita montar o dict de `extra` quando INFO está desligado (caminho quente)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "HTTP %s OK",
+                    method,
+                    extra={"url": url, "status": res.status_code, "cid": cid},
+                )
+            return res
+
+        except requests.Timeout as e:
+            if not last:
+                time.sleep(_backoff_delay(attempt))
+                continue
+            logger.warning("HTTP %s timeout", method, extra={"url": url, "cid": cid})
+            raise ExternalError(
+                f"Timeout ao chamar {url}",
+                code="HTTP_TIMEOUT",
+                cause=e,
+                retryable=True,
+                data={"url": url},
+            ) from e
+
+        except requests.HTTPError as e:
+            status = getattr(e.response, "status_code", None)
+            retryable = status in TRANSIENT_STATUSES_SET
+            logger.error(
+                "HTTP %s error",
+                method,
+                extra={
+                    "url": url,
+                    "status": status,
+                    "retryable": retryable,
+                    "cid": cid,
+                },
+            )
+            raise ExternalError(
+                f"Falha HTTP {status} ao chamar {url}",
+                code="HTTP_ERROR",
+                cause=e,
+                retryable=retryable,
+                data={
+                    "url": url,
+                    "status": status,
+                    "text": getattr(e.response, "text", None),
+                },
+            ) from e
+
+        except requests.RequestException as e:
+            if isinstance(e, requests.ConnectionError) and not last:
+                time.sleep(_backoff_delay(attempt))
+                continue
+            logger.error(
+                "HTTP %s request exception",
+                method,
+                extra={"url": url, "cid": cid},
+            )
+            raise ExternalError(
+                f"Erro de rede ao chamar {url}",
+                code="HTTP_REQUEST_ERROR",
+                cause=e,
+                retryable=True,
+                data={"url": url},
+            ) from e
+
+    raise AssertionError("unreachable")  # pragma: no cover
+
+
+async def _arequest_with_handling(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """
+    Versão assíncrona de `_request_with_handling` sobre o AsyncClient compartilhado:
+      - mesmo mapeamento de exceções para ExternalError
+      - retry com backoff exponencial "full jitter" para status/erros transitórios (métodos idempotentes)
+      - jitter opcional via `asyncio.sleep` (não bloqueia o event loop)
+    """
+    client: httpx.AsyncClient = kwargs.pop("client", None) or get_async_client()
+    jitter_max: float = kwargs.pop("jitter_max", 0.0)
+    total: int = kwargs.pop("retries", RETRY_TOTAL)
+
     if jitter_max and jitter_max > 0:
-        time.sleep(random.uniform(0, jitter_max))
+        await asyncio.sleep(random.uniform(0, jitter_max))
 
-    # adiciona correlation-id
-    headers = kwargs.pop("headers", {}) or {}
-    headers = {**session.headers, **headers}
-    headers.setdefault("X-Correlation-ID", get_correlation_id())
+    cid = get_correlation_id()
+    headers = kwargs.pop("headers", None)
+    if not headers:
+        headers = {"X-Correlation-ID": cid}
+    elif "X-Correlation-ID" not in headers:
+        headers = {**headers, "X-Correlation-ID": cid}
     kwargs["headers"] = headers
 
-    try:
-        res = session.request(method, url, timeout=timeout, **kwargs)
-        res.raise_for_status()
-        logger.info(
-            "HTTP %s OK",
-            method,
-            extra={"url": url, "status": res.status_code, "cid": get_correlation_id()},
-        )
-        return res
-
-    except requests.Timeout as e:
-        logger.warning("HTTP %s timeout", method, extra={"url": url, "cid": get_correlation_id()})
-        raise ExternalError(
-            f"Timeout ao chamar {url}",
-            code="HTTP_TIMEOUT",
-            cause=e,
-            retryable=True,
-            data={"url": url},
-        ) from e
-
-    except requests.HTTPError as e:
-        status = getattr(e.response, "status_code", None)
-        retryable = bool(status in TRANSIENT_STATUSES)
-        logger.error(
-            "HTTP %s error",
-            method,
-            extra={
-                "url": url,
-                "status": status,
-                "retryable": retryable,
-                "cid": get_correlation_id(),
-            },
-        )
-        raise ExternalError(
-            f"Falha HTTP {status} ao chamar {url}",
-            code="HTTP_ERROR",
-            cause=e,
-            retryable=retryable,
-            data={
-                "url": url,
-                "status": status,
-                "text": getattr(e.response, "text", None),
-            },
-        ) from e
-
-    except requests.RequestException as e:
-        logger.error(
-            "HTTP %s request exception",
-            method,
-            extra={"url": url, "cid": get_correlation_id()},
-        )
-        raise ExternalError(
-            f"Erro de rede ao chamar {url}",
-            code="HTTP_REQUEST_ERROR",
-            cause=e,
-            retryable=True,
-            data={"url": url},
-        ) from e
+    max_attempts = total + 1 if method.upper() in IDEMPOTENT_METHODS else 1
+    for attempt in range(max_attempts):
+        last = attempt == max_attempts - 1
+        try:
+            res = await client.request(method, url, **kwargs)
+            if res.status_code in TRANSIENT_STATUSES_SET and not last:
+                await res.aclose()
+                await asyncio.sleep(_backoff_delay(attempt, _parse_retry_after(res.headers.get("Retry-After"))))
+                continue
+            res.raise_for_status()
+            # evita montar o dict de `extra` quando INFO está desligado (caminho quente)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "HTTP %s OK",
+                    method,
+                    extra={"url": url, "status": res.status_code, "cid": cid},
+                )
+            return res
+
+        except httpx.TimeoutException as e:
+            if not last:
+                await asyncio.sleep(_backoff_delay(attempt))
+                continue
+            logger.warning("HTTP %s timeout", method, extra={"url": url, "cid": cid})
+            raise ExternalError(
+                f"Timeout ao chamar {url}",
+                code="HTTP_TIMEOUT",
+                cause=e,
+                retryable=True,
+                data={"url": url},
+            ) from e
+
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            retryable = status in TRANSIENT_STATUSES_SET
+            logger.error(
+                "HTTP %s error",
+                method,
+                extra={
+                    "url": url,
+                    "status": status,
+                    "retryable": retryable,
+                    "cid": cid,
+                },
+            )
+            raise ExternalError(
+                f"Falha HTTP {status} ao chamar {url}",
+                code="HTTP_ERROR",
+                cause=e,
+                retryable=retryable,
+                data={"url": url, "status": status, "text": e.response.text},
+            ) from e
+
+        except httpx.RequestError as e:
+            if not last:
+                await asyncio.sleep(_backoff_delay(attempt))
+                continue
+            logger.error(
+                "HTTP %s request exception",
+                method,
+                extra={"url": url, "cid": cid},
+            )
+            raise ExternalError(
+                f"Erro de rede ao chamar {url}",
+                code="HTTP_REQUEST_ERROR",
+                cause=e,
+                retryable=True,
+                data={"url": url},
+            ) from e
+
+    raise AssertionError("unreachable")  # pragma: no cover
 
 
 # ----------------------------------------------------------------------
@@ -186,3 +397,11 @@ def http_get(url: str, **kwargs: Any) -> requests.Response:
 
 def http_post(url: str, **kwargs: Any) -> requests.Response:
     return _request_with_handling("POST", url, **kwargs)
+
+
+async def ahttp_get(url: str, **kwargs: Any) -> httpx.Response:
+    return await _arequest_with_handling("GET", url, **kwargs)
+
+
+async def ahttp_post(url: str, **kwargs: Any) -> httpx.Response:
+    return await _arequest_with_handling("POST", url, **kwargs)
@@ -0,0 +1,48 @@
+# app/common/jsonutil.py
+from __future__ import annotations
+
+import contextlib
+import os
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps_json(obj: Any, option: int = 0) -> bytes:
+    """
+    Serialização única das linhas de coleta (respostas, NDJSON, snapshots e planilhas em disco).
+    str/int/float/bool/None, date/datetime, UUID e numpy saem pelo caminho nativo do orjson;
+    o `default` só é chamado para o resto (na prática Decimal/Timestamp do pandas) e é o
+    próprio `str` (builtin, sem cadeia de isinstance), para não falhar no meio de uma coleta grande.
+    """
+    return orjson.dumps(obj, default=str, option=_ORJSON_OPTS | option)
+
+
+def gravar_atomico(destino: Path, conteudo: bytes | Iterable[bytes]) -> None:
+    """
+    Grava `conteudo` (bytes ou pedaços de bytes) em `destino` sem nunca deixar o arquivo pela metade:
+    tmp exclusivo no mesmo diretório + fsync + `os.replace`. Em caso de erro o tmp é removido.
+    """
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp_fd, tmp_path = tempfile.mkstemp(prefix=f"{destino.name}.", suffix=".tmp", dir=destino.parent)
+    try:
+        with os.fdopen(tmp_fd, "wb") as f:
+            if isinstance(conteudo, bytes):
+                f.write(conteudo)
+            else:
+                f.writelines(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, destino)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+__all__ = ["dumps_json", "gravar_atomico"]
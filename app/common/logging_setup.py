@@ -2,18 +2,24 @@
 
 from __future__ import annotations
 
+import atexit
+import functools
 import io
 import logging
+import logging.handlers
 import os
+import queue
 import re
+import secrets
 import sys
-import uuid
-from collections.abc import Iterable
-from contextvars import ContextVar
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, Future
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass
 from typing import Any, TextIO, cast
 
-from pythonjsonlogger import jsonlogger
-
 # ---------------------------
 # Contexto propagado por execução
 # ---------------------------
@@ -27,30 +33,50 @@ def get_correlation_id() -> str:
 
 
 # ---------------------------
-# Filtro de contexto + máscara opcional
+# Máscara de segredos
+# ---------------------------
+# padrões simples para mascarar chaves (amplie conforme necessário), unidos numa única
+# alternância: uma passada de regex por linha em vez de uma por padrão
+_SECRET_RE = re.compile(
+    r"(?P<k>api[_-]?key\s*=\s*|token\s*=\s*|authorization:\s*bearer\s+)(?P<v>[A-Za-z0-9._\-]{6,})",
+    re.IGNORECASE,
+)
+
+
+def mask_secrets(text: str) -> str:
+    """Mascara valores de api_key/token/bearer em um texto já formatado."""
+    if not text:
+        return text
+    # sem "=" nem ":" não há sintaxe de segredo possível — evita o regex
+    if "=" not in text and ":" not in text:
+        return text
+    return _SECRET_RE.sub(r"\g<k>***", text)
+
+
+# ---------------------------
+# Filtro de contexto
 # ---------------------------
+@functools.lru_cache(maxsize=1)
+def _pid() -> int:
+    """pid do processo, lido uma vez (e relido no filho após fork, ex.: workers do gunicorn)."""
+    return os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_pid.cache_clear)
+
+
 class ContextFilter(logging.Filter):
-    def __init__(self, *, service: str, version: str, mask_secrets: bool = False) -> None:
+    """
+    Injeta campos de contexto no record. Não altera `record.msg`: a máscara de segredos
+    roda no formatter, só para registros efetivamente emitidos.
+    O nome da thread já vem no record (`threadName`); os formatters o expõem como thread_name.
+    """
+
+    def __init__(self, *, service: str, version: str) -> None:
         super().__init__()
         self.service = service
         self.version = version
-        self.mask_secrets = mask_secrets
-        # padrões simples para mascarar chaves (amplie conforme necessário)
-        self._patterns: list[re.Pattern[str]] = []
-        if mask_secrets:
-            self._patterns = [
-                re.compile(r"(api[_-]?key\s*=\s*)([A-Za-z0-9_\-]{6,})", re.IGNORECASE),
-                re.compile(r"(token\s*=\s*)([A-Za-z0-9_\-]{6,})", re.IGNORECASE),
-                re.compile(r"(authorization:\s*bearer\s+)([A-Za-z0-9\._\-]{6,})", re.IGNORECASE),
-            ]
-
-    def _mask(self, msg: str) -> str:
-        if not self.mask_secrets or not msg:
-            return msg
-        masked = msg
-        for p in self._patterns:
-            masked = p.sub(r"\1***", masked)
-        return masked
 
     def filter(self, record: logging.LogRecord) -> bool:
         # Campos padronizados
@@ -58,61 +84,136 @@ class ContextFilter(logging.Filter):
         record.env = app_env_ctx.get()
         record.service = self.service
         record.version = self.version
-        record.pid = os.getpid()
-        # preservar record.thread como id; expor nome separado
-        record.thread_name = getattr(record, "threadName", "")
-
-        # Se a msg for string, podemos mascarar segredos
-        if isinstance(record.msg, str):
-            record.msg = self._mask(record.msg)
+        record.pid = _pid()
         return True
 
 
 # ---------------------------
-# Formatter JSON (UTC, ISO-8601)
+# Formatters (UTC, ISO-8601) com máscara opcional
 # ---------------------------
-class UtcJsonFormatter(jsonlogger.JsonFormatter):
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        kwargs.setdefault("timestamp", True)
-        kwargs.setdefault("json_ensure_ascii", False)
-        kwargs.setdefault("json_indent", None)
-        kwargs.setdefault("rename_fields", {"asctime": "ts", "levelname": "level", "message": "msg"})
-        # se o stub reclamar dos kwargs, habilite a linha abaixo:
-        # super().__init__(*args, **kwargs)  # type: ignore[call-arg]
-        super().__init__(*args, **kwargs)
-
-    def add_fields(
-        self,
-        log_record: dict[str, Any],
-        record: logging.LogRecord,
-        message_dict: dict[str, Any],
-    ) -> None:
-        super().add_fields(log_record, record, message_dict)
-        if "ts" in log_record and isinstance(log_record["ts"], str) and not log_record["ts"].endswith("Z"):
-            log_record["ts"] += "Z"
+def _json_default(obj: Any) -> str:
+    # fallback para objetos que o orjson não serializa nativamente (exceções, Paths, etc.)
+    return str(obj)
+
+
+def _orjson_dumps(obj: Any, *, default: Any = None, **_: Any) -> str:
+    """Serializer compatível com a assinatura de json.dumps usada pelo jsonlogger, via orjson."""
+    import orjson
+
+    return orjson.dumps(obj, default=default or _json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_utc_json_formatter_cls() -> type[logging.Formatter]:
+    """
+    Define UtcJsonFormatter sob demanda: `pythonjsonlogger` só é importado
+    se algum handler realmente usar JSON (LOG_JSON=0 nunca paga esse import).
+    """
+    from pythonjsonlogger import jsonlogger
+
+    class UtcJsonFormatter(jsonlogger.JsonFormatter):
+        def __init__(self, *args: Any, mask_secrets: bool = False, **kwargs: Any) -> None:
+            kwargs.setdefault("timestamp", True)
+            kwargs.setdefault("json_ensure_ascii", False)
+            kwargs.setdefault("json_indent", None)
+            kwargs.setdefault("json_serializer", _orjson_dumps)
+            kwargs.setdefault("json_default", _json_default)
+            kwargs.setdefault(
+                "rename_fields",
+                {"asctime": "ts", "levelname": "level", "message": "msg", "threadName": "thread_name"},
+            )
+            # se o stub reclamar dos kwargs, habilite a linha abaixo:
+            # super().__init__(*args, **kwargs)  # type: ignore[call-arg]
+            super().__init__(*args, **kwargs)
+            self.mask_secrets = mask_secrets
+
+        def formatTime(self, record: logging.LogRecord, datefmt: str | None = None) -> str:
+            # RFC 3339 em UTC direto (ex.: 2024-01-31T12:00:00.123Z), sem depender do asctime local
+            if datefmt:
+                return super().formatTime(record, datefmt)
+            return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+        def format(self, record: logging.LogRecord) -> str:
+            out = super().format(record)
+            return mask_secrets(out) if self.mask_secrets else out
+
+    return UtcJsonFormatter
+
+
+class MaskingFormatter(logging.Formatter):
+    def __init__(self, fmt: str | None = None, *, mask_secrets: bool = False) -> None:
+        super().__init__(fmt)
+        self.mask_secrets = mask_secrets
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = super().format(record)
+        return mask_secrets(out) if self.mask_secrets else out
 
 
 # ---------------------------
 # Builders de formatter
 # ---------------------------
-def _build_json_formatter() -> logging.Formatter:
+def _build_json_formatter(*, mask_secrets: bool = False) -> logging.Formatter:
     fmt = (
         "%(asctime)s %(levelname)s %(name)s %(message)s "
-        "%(correlation_id)s %(env)s %(service)s %(version)s %(pid)s %(thread_name)s %(filename)s:%(lineno)d"
+        "%(correlation_id)s %(env)s %(service)s %(version)s %(pid)s %(threadName)s %(filename)s:%(lineno)d"
     )
-    return UtcJsonFormatter(fmt)
+    return _get_utc_json_formatter_cls()(fmt, mask_secrets=mask_secrets)  # type: ignore[call-arg]
 
 
-def _build_text_formatter() -> logging.Formatter:
-    return logging.Formatter(
+def _build_text_formatter(*, mask_secrets: bool = False) -> logging.Formatter:
+    return MaskingFormatter(
         "[%(asctime)s] %(levelname)s %(name)s %(env)s %(service)s:%(version)s "
-        "(cid=%(correlation_id)s pid=%(pid)s thread=%(thread_name)s) %(message)s"
+        "(cid=%(correlation_id)s pid=%(pid)s thread=%(threadName)s) %(message)s",
+        mask_secrets=mask_secrets,
     )
 
 
 # ---------------------------
 # Setup principal
 # ---------------------------
+@dataclass
+class _EstadoListener:
+    """Listener em background que escreve nos handlers reais (console/arquivo)."""
+
+    listener: logging.handlers.QueueListener | None = None
+
+
+_LISTENER = _EstadoListener()
+
+
+def _stop_listener() -> None:
+    """Drena a fila pendente e fecha os handlers do listener atual."""
+    listener, _LISTENER.listener = _LISTENER.listener, None
+    if listener is not None:
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+
+
+atexit.register(_stop_listener)
+
+
+def _restart_listener_in_child() -> None:
+    """
+    Threads não sobrevivem ao fork: no processo filho (workers com preload), o listener
+    herdado está morto e a fila nunca seria drenada. Recria fila + listener com os mesmos handlers.
+    """
+    if _LISTENER.listener is None:
+        return
+    qh = next((h for h in logging.getLogger().handlers if isinstance(h, logging.handlers.QueueHandler)), None)
+    if qh is None:
+        return
+    q: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    qh.queue = q
+    _LISTENER.listener = logging.handlers.QueueListener(q, *_LISTENER.listener.handlers, respect_handler_level=True)
+    _LISTENER.listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
 def setup_logging(
     *,
     level: int | str | None = None,
@@ -127,6 +228,8 @@ def setup_logging(
       - Arquivo opcional (LOG_FILE ou parâmetro file_path)
       - Campos padrão: service, version, env, correlation_id, pid, thread_name
       - Máscara opcional de segredos: LOG_MASK_SECRETS=1
+      - Escrita não bloqueante: o root só enfileira (QueueHandler); um QueueListener
+        em background formata e escreve no console/arquivo
     """
     service = os.getenv("APP_NAME", "lg-logistica")
     version = os.getenv("APP_VERSION", "0.0.0")
@@ -143,31 +246,44 @@ def setup_logging(
         json_console = os.getenv("LOG_JSON", "1") not in ("0", "false", "False")
 
     file_path = file_path or os.getenv("LOG_FILE")
-    mask_secrets = os.getenv("LOG_MASK_SECRETS", "0") in ("1", "true", "True")
+    mask = os.getenv("LOG_MASK_SECRETS", "0") in ("1", "true", "True")
 
     root = logging.getLogger()
     root.setLevel(level)
 
-    # Evita duplicações
+    # Evita duplicações (inclusive listener de um setup anterior)
+    _stop_listener()
     for h in list(root.handlers):
         root.removeHandler(h)
+        if isinstance(h, logging.handlers.QueueHandler):
+            h.close()
 
-    ctx_filter = ContextFilter(service=service, version=version, mask_secrets=mask_secrets)
+    handlers: list[logging.Handler] = []
 
     # Console
     ch = logging.StreamHandler(stream=sys.stdout)
     ch.setLevel(level)
-    ch.setFormatter(_build_json_formatter() if json_console else _build_text_formatter())
-    ch.addFilter(ctx_filter)
-    root.addHandler(ch)
+    ch.setFormatter(
+        _build_json_formatter(mask_secrets=mask) if json_console else _build_text_formatter(mask_secrets=mask)
+    )
+    handlers.append(ch)
 
     # Arquivo opcional
     if file_path:
         fh = logging.FileHandler(file_path, encoding="utf-8")
         fh.setLevel(level)
-        fh.setFormatter(_build_json_formatter())
-        fh.addFilter(ctx_filter)
-        root.addHandler(fh)
+        fh.setFormatter(_build_json_formatter(mask_secrets=mask))
+        handlers.append(fh)
+
+    # O filtro de contexto roda no QueueHandler, ainda na thread de origem,
+    # para capturar correlation_id/env (ContextVars) antes de enfileirar.
+    q: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    qh = logging.handlers.QueueHandler(q)
+    qh.addFilter(ContextFilter(service=service, version=version))
+    root.addHandler(qh)
+
+    _LISTENER.listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    _LISTENER.listener.start()
 
     # Reduz ruído de libs conhecidas (sempre WARNING)
     for name in quiet_loggers or ():
@@ -180,12 +296,17 @@ def setup_logging(
 # ---------------------------
 # Helpers
 # ---------------------------
+def new_correlation_id() -> str:
+    """Gera um correlation_id curto (16 hex, 64 bits de entropia, sem hífens)."""
+    return secrets.token_hex(8)
+
+
 def set_correlation_id(value: str | None = None) -> str:
     """Define (ou gera) o correlation_id para o contexto atual.
 
     Retorna o valor definido.
     """
-    cid = value or str(uuid.uuid4())
+    cid = value or new_correlation_id()
     correlation_id_ctx.set(cid)
     return cid
 
@@ -198,11 +319,36 @@ def bind_context(*, app_env: str | None = None, correlation_id: str | None = Non
         set_correlation_id(correlation_id)
 
 
+def __getattr__(name: str) -> Any:
+    # mantém `logging_setup.UtcJsonFormatter` acessível sem importar pythonjsonlogger no load
+    if name == "UtcJsonFormatter":
+        return _get_utc_json_formatter_cls()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_logger(name: str | None = None) -> logging.Logger:
     """Sugar para obter logger tipado."""
     return logging.getLogger(name or "lglog")
 
 
+# ---------------------------
+# Propagação de contexto para threads
+# ---------------------------
+# Threads (executor.submit / threading.Thread) NÃO herdam o Context de quem as dispara,
+# então correlation_id/env se perdem nos logs e nos headers de saída. Em routers/services,
+# use estes helpers em vez de `executor.submit` cru. (`asyncio.to_thread` já copia o contexto.)
+def run_in_ctx[**P, R](fn: Callable[P, R], /, *args: P.args, **kwargs: P.kwargs) -> R:
+    """Executa `fn` numa cópia do contexto atual."""
+    ctx = copy_context()
+    return ctx.run(fn, *args, **kwargs)
+
+
+def submit_in_ctx[**P, R](executor: Executor, fn: Callable[P, R], /, *args: P.args, **kwargs: P.kwargs) -> Future[R]:
+    """`executor.submit` preservando o contexto (uma cópia por tarefa) de quem submete."""
+    ctx = copy_context()
+    return executor.submit(functools.partial(ctx.run, fn, *args, **kwargs))
+
+
 # ---------------------------
 # Captura opcional de stdout/stderr
 # ---------------------------
@@ -211,30 +357,43 @@ class _StreamToLogger(io.TextIOBase):
         super().__init__()
         self.logger = logger
         self.level = level
-        self._buf = ""
+        # fragmentos ainda sem "\n"; juntados só quando uma linha fecha
+        self._buf: list[str] = []
+
+    def _emit(self, line: str) -> None:
+        line = line.strip()
+        if line:
+            self.logger.log(self.level, line)
 
     def write(self, buf: str) -> int:
         if not isinstance(buf, str):
             buf = str(buf)
-        self._buf += buf
         written = len(buf)
-        while "\n" in self._buf:
-            line, self._buf = self._buf.split("\n", 1)
-            line = line.strip()
-            if line:
-                self.logger.log(self.level, line)
+        if "\n" not in buf:
+            if buf:
+                self._buf.append(buf)
+            return written
+
+        combined = "".join(self._buf) + buf if self._buf else buf
+        lines = combined.split("\n")
+        # o último elemento é o resto sem "\n" final ("" se terminou em quebra de linha)
+        tail = lines.pop()
+        for line in lines:
+            self._emit(line)
+        self._buf = [tail] if tail else []
         return written
 
     def flush(self) -> None:
-        if self._buf.strip():
-            self.logger.log(self.level, self._buf.strip())
-            self._buf = ""
+        if self._buf:
+            self._emit("".join(self._buf))
+            self._buf = []
 
     def isatty(self) -> bool:
         return False
 
 
 _redirected_once: bool = False
+_redirect_lock = threading.Lock()
 
 
 def redirect_std_streams_to_logger(
@@ -250,15 +409,18 @@ def redirect_std_streams_to_logger(
     Respeita variável de ambiente env_switch (default: LOG_CAPTURE_STDOUT=1).
     """
     global _redirected_once
-    if _redirected_once:
-        return
-
-    enabled = os.getenv(env_switch, "1") not in ("0", "false", "False")
-    if not enabled:
-        return
-
-    if capture_stdout:
-        sys.stdout = cast(TextIO, _StreamToLogger(logging.getLogger(stdout_logger_name), logging.INFO))
-    if capture_stderr:
-        sys.stderr = cast(TextIO, _StreamToLogger(logging.getLogger(stderr_logger_name), logging.ERROR))
-    _redirected_once = True
+    with _redirect_lock:
+        if _redirected_once:
+            return
+
+        enabled = os.getenv(env_switch, "1") not in ("0", "false", "False")
+        if not enabled:
+            return
+
+        # não embrulha de novo se o stream já foi redirecionado. Compara pelo nome da classe:
+        # após um reload do módulo, `_StreamToLogger` é outro objeto e isinstance falharia.
+        if capture_stdout and type(sys.stdout).__name__ != _StreamToLogger.__name__:
+            sys.stdout = cast(TextIO, _StreamToLogger(logging.getLogger(stdout_logger_name), logging.INFO))
+        if capture_stderr and type(sys.stderr).__name__ != _StreamToLogger.__name__:
+            sys.stderr = cast(TextIO, _StreamToLogger(logging.getLogger(stderr_logger_name), logging.ERROR))
+        _redirected_once = True
@@ -1,28 +1,106 @@
 # app/common/middlewares.py
 from __future__ import annotations
 
-import uuid
-from collections.abc import Awaitable, Callable
+import zlib
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app.common.logging_setup import get_correlation_id, set_correlation_id
+from app.common.logging_setup import new_correlation_id, set_correlation_id
 
 
-class CorrelationIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable[[Request], Awaitable[Response]],
-    ) -> Response:
-        # Reaproveita X-Request-Id se cliente enviar, senão gera UUID novo
-        cid = request.headers.get("X-Request-Id") or str(uuid.uuid4())
-        set_correlation_id(cid)
+class CorrelationIdMiddleware:
+    """
+    Middleware ASGI puro (sem BaseHTTPMiddleware): evita a task extra + stream em memória
+    por request. Lê/gera o X-Request-Id, fixa o correlation_id do contexto e o devolve
+    no header da resposta.
+    """
 
-        # Executa a request
-        response = await call_next(request)
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        # Sempre devolve o correlation id no header
-        response.headers["X-Request-Id"] = get_correlation_id()
-        return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Reaproveita X-Request-Id se cliente enviar, senão gera um id novo
+        cid = ""
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                cid = value.decode("latin-1")
+                break
+        cid = set_correlation_id(cid or new_correlation_id())
+
+        async def send_with_cid(message: Message) -> None:
+            # Sempre devolve o correlation id no header
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-Id"] = cid
+            await send(message)
+
+        await self.app(scope, receive, send_with_cid)
+
+
+class GZipMiddleware:
+    """
+    Compressão gzip das respostas (ASGI puro). As coletas devolvem listas grandes com as
+    mesmas chaves em toda linha, o que comprime muito bem.
+
+    Diferente do `starlette.middleware.gzip.GZipMiddleware`, em respostas em streaming
+    (NDJSON) cada bloco recebido sai comprimido na hora (`Z_SYNC_FLUSH`), sem esperar o
+    zlib acumular dados: o cliente recebe as primeiras linhas sem atraso.
+    Respostas menores que `minimum_size` ou já codificadas passam direto.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 4096, compresslevel: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not any(
+            name == b"accept-encoding" and b"gzip" in value for name, value in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        inicio: list[Message] = []  # http.response.start retido até decidir os headers
+        gz: zlib._Compress | None = None
+        direto = False
+
+        async def send_gzip(message: Message) -> None:
+            nonlocal gz, direto
+            if message["type"] == "http.response.start":
+                inicio.append(message)
+                return
+            if direto or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            if gz is None:
+                start = inicio[0]
+                headers = MutableHeaders(scope=start)
+                if "content-encoding" in headers or (not more_body and len(body) < self.minimum_size):
+                    direto = True
+                    await send(start)
+                    await send(message)
+                    return
+                gz = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                headers["Content-Encoding"] = "gzip"
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    # resposta inteira numa mensagem: comprime tudo e mantém o Content-Length
+                    comprimido = gz.compress(body) + gz.flush()
+                    headers["Content-Length"] = str(len(comprimido))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": comprimido})
+                    return
+                del headers["Content-Length"]
+                await send(start)
+
+            dados = gz.compress(body) + gz.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+            await send({"type": "http.response.body", "body": dados, "more_body": more_body})
+
+        await self.app(scope, receive, send_gzip)
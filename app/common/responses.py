@@ -0,0 +1,132 @@
+# app/common/responses.py
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from typing import Any
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.common.jsonutil import dumps_json
+
+# tamanho aproximado de cada pedaço enviado no streaming NDJSON
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    Resposta JSON serializada direto com orjson (sem `jsonable_encoder`/validação de response_model).
+    Diferente da `fastapi.responses.ORJSONResponse`, tolera valores que o orjson não conhece
+    nativamente (Decimal, Timestamp do pandas, etc.) via `dumps_json`.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+class PydanticResponse(JSONResponse):
+    """
+    Resposta a partir de um model já montado (tipicamente via `Model.model_construct(...)`,
+    sem revalidar): serializa com `model_dump_json` do pydantic-core, sem passar pelo
+    `response_model` (validação + `jsonable_encoder` + `json.dumps`). Use com
+    `response_model=None` e o schema em `responses={200: {"model": ...}}` para o OpenAPI.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.model_dump_json(by_alias=True).encode()
+
+
+def linhas_para_colunas(linhas: Iterable[Mapping[str, Any]]) -> dict[str, list[Any]]:
+    """
+    Transpõe a lista de linhas (AoS) em colunas (SoA): `{coluna: [valores...]}`, colunas na
+    ordem em que aparecem; linha sem a coluna → `None`. Cada chave sai uma vez só no corpo.
+    """
+    linhas = list(linhas)
+    colunas = dict.fromkeys(k for r in linhas for k in r)
+    return {k: [r.get(k) for r in linhas] for k in colunas}
+
+
+def _iter_ndjson(cabecalho: Mapping[str, Any], linhas: Iterable[Any]) -> Iterator[bytes]:
+    nl = orjson.OPT_APPEND_NEWLINE
+    buf = bytearray(dumps_json(cabecalho, nl))
+    for linha in linhas:
+        buf += dumps_json(linha, nl)
+        if len(buf) >= NDJSON_CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def ndjson_response(cabecalho: Mapping[str, Any], linhas: Iterable[Any]) -> StreamingResponse:
+    """
+    Resposta NDJSON em streaming: 1ª linha = `cabecalho` (ex.: contagem/persistência),
+    depois um objeto por linha. Cada linha é serializada sob demanda e enviada em blocos
+    de ~64 KiB, sem montar o corpo inteiro em memória.
+    """
+    return StreamingResponse(_iter_ndjson(cabecalho, linhas), media_type="application/x-ndjson")
+
+
+def colunas_response(cabecalho: Mapping[str, Any], linhas: Sequence[Mapping[str, Any]]) -> ORJSONResponse:
+    """
+    Resposta colunar: `{**cabecalho, "total": n, "colunas": {coluna: [valores...]}}`.
+    Em coletas grandes evita repetir as ~20 chaves em cada linha; o cliente reconstrói as
+    linhas por índice. Monta e serializa o corpo (chame fora do event loop).
+    """
+    return ORJSONResponse({**cabecalho, "total": len(linhas), "colunas": linhas_para_colunas(linhas)})
+
+
+# ------------------------------------------------------------------
+# ETag / If-None-Match (polling repetido do front-end)
+# ------------------------------------------------------------------
+_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_confere(request: Request, etag: str) -> bool:
+    """True se o `If-None-Match` do cliente já contém `etag` (ignora o prefixo fraco `W/`)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def nao_modificado(etag: str, cache_control: str = _CACHE_CONTROL) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def com_etag(
+    request: Request, response: Response, etag: str | None = None, cache_control: str = _CACHE_CONTROL
+) -> Response:
+    """
+    Marca a resposta com ETag (hash do corpo, se `etag` não for dado) e devolve 304 sem corpo
+    quando o cliente já tem essa versão — o front-end que repete a mesma consulta não
+    baixa tudo de novo.
+    """
+    if etag is None:
+        etag = f'"{hashlib.blake2b(response.body, digest_size=16).hexdigest()}"'
+    if etag_confere(request, etag):
+        return nao_modificado(etag, cache_control)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+__all__ = [
+    "ORJSONResponse",
+    "PydanticResponse",
+    "colunas_response",
+    "com_etag",
+    "dumps_json",
+    "etag_confere",
+    "linhas_para_colunas",
+    "nao_modificado",
+    "ndjson_response",
+]
@@ -15,6 +15,7 @@ class Settings(BaseSettings):
     APP_ENV: str = "dev"
     GURU_MAX_CONCURRENCY: int = 4  # quantas requisições simultâneas
     GURU_QPS: float = 3.0  # requisições por segundo (média)
+    VAR_DIR: Path = BASE_DIR.parent / "var"  # dados gerados em runtime (caches, snapshots); independe do cwd
 
     model_config = SettingsConfigDict(
         env_file=str(BASE_DIR / ".env"),  # busca o .env na raiz do projeto
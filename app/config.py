@@ -1,40 +1,40 @@
 # app/config.py
 from __future__ import annotations
 
+import os
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
 
-from pydantic import AliasChoices, Field
-from pydantic_settings import BaseSettings, SettingsConfigDict
+# valores padrão
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+DEFAULT_REGRAS_PATH = "app/config_ofertas.json"
 
 
-class Settings(BaseSettings):
-    # valores padrão
-    timezone: str = Field(
-        default="America/Sao_Paulo",
-        # nomes de env aceitos (primeiro que existir é usado)
-        validation_alias=AliasChoices("TZ", "TIMEZONE"),
-    )
-    regras_path: str = Field(
-        default="app/config_ofertas.json",
-        validation_alias=AliasChoices("REGRAS_PATH"),
-    )
+@dataclass(frozen=True, slots=True)
+class Settings:
+    timezone: str = DEFAULT_TIMEZONE
+    regras_path: str = DEFAULT_REGRAS_PATH
+
 
-    # configuração do carregamento
-    model_config = SettingsConfigDict(
-        env_file=".env",
-        env_file_encoding="utf-8",
-        case_sensitive=False,
+def _load_settings() -> Settings:
+    # nomes de env aceitos (primeiro que existir é usado)
+    return Settings(
+        timezone=os.getenv("TZ") or os.getenv("TIMEZONE") or DEFAULT_TIMEZONE,
+        regras_path=os.getenv("REGRAS_PATH") or DEFAULT_REGRAS_PATH,
     )
 
 
+# Instância única do processo (construída no primeiro uso)
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    return Settings()
+    return _load_settings()
+
+
+# cwd do processo, lido uma vez (servidor não muda de diretório em runtime)
+_CWD = Path.cwd()
 
 
 def resolve_path(p: str) -> Path:
     path = Path(p)
-    if not path.is_absolute():
-        path = Path.cwd() / path
-    return path
+    return path if path.is_absolute() else _CWD / path
@@ -2,11 +2,16 @@
 from __future__ import annotations
 
 import os
+import time
 from pathlib import Path
 
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+# Cliente HTTP assíncrono compartilhado (fechado no shutdown)
+from app.common.http_client import aclose_async_client
+
 # Logging unificado (JSON/UTC, mask de segredos, correlation id, captura de stdout/stderr)
 from app.common.logging_setup import (
     get_logger,
@@ -16,8 +21,9 @@ from app.common.logging_setup import (
 
 # Middleware de correlação (garante X-Request-Id de entrada/saída)
 # Se o seu módulo ainda exporta RequestIdMiddleware, troque o import abaixo.
-from app.common.middlewares import CorrelationIdMiddleware
+from app.common.middlewares import CorrelationIdMiddleware, GZipMiddleware
 from app.routers.fretebarato_cotacao import router as cotar_fretes_router
+from app.routers.guru_coleta_paginas import router as guru_coleta_paginas_router
 from app.routers.guru_importar_planilha import router as guru_importar_planilha_router
 from app.routers.guru_produtos import router as guru_produtos_router
 from app.routers.guru_regras import router as regras_router
@@ -30,6 +36,12 @@ from app.routers.shopify_fulfillment import router as shopify_fulfillment_router
 from app.routers.shopify_produtos import router as shopify_produtos_router
 from app.routers.shopify_vendas_produtos import router as shopify_vendas_router
 
+# Gravação agendada do catálogo (skus.json)
+from app.services.loader_catalogo import carregar_catalogo, iniciar_flusher_skus, parar_flusher_skus
+
+# Caches de skus.json / config_ofertas.json (pré-aquecidos no startup)
+from app.services.loader_main import pre_aquecer_caches
+
 
 # -----------------------------------------------------------------------------
 # Inicialização de logging
@@ -52,6 +64,26 @@ def _init_logging() -> None:
     )
 
 
+# -----------------------------------------------------------------------------
+# Pré-aquecimento dos caches (skus.json, config_ofertas.json, regras derivadas)
+# -----------------------------------------------------------------------------
+def _pre_aquecer() -> None:
+    pre_aquecer_caches()
+    carregar_catalogo()  # índice sku → nomes do catálogo
+
+
+async def _prewarm() -> None:
+    logger = get_logger(__name__)
+    t0 = time.perf_counter()
+    try:
+        await to_thread.run_sync(_pre_aquecer)
+    except Exception as e:
+        # não impede o boot: o primeiro request refaz a leitura e devolve o erro adequado
+        logger.warning("prewarm_falhou", extra={"erro": str(e)})
+        return
+    logger.info("prewarm_ok", extra={"duracao_ms": round((time.perf_counter() - t0) * 1000, 1)})
+
+
 # -----------------------------------------------------------------------------
 # Criação do app
 # -----------------------------------------------------------------------------
@@ -63,6 +95,13 @@ def create_app() -> FastAPI:
     # Middleware de correlação (injeta/propaga X-Request-Id)
     app.add_middleware(CorrelationIdMiddleware)
 
+    # Compressão gzip das respostas grandes (coletas/NDJSON); nível e tamanho mínimo via env
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=int(os.getenv("GZIP_MIN_SIZE", "4096")),
+        compresslevel=int(os.getenv("GZIP_LEVEL", "6")),
+    )
+
     # CORS — em produção, restrinja as origens
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
     app.add_middleware(
@@ -76,6 +115,7 @@ def create_app() -> FastAPI:
     # Routers
     app.include_router(guru_vendas_assinaturas_router)
     app.include_router(guru_vendas_produtos_router)
+    app.include_router(guru_coleta_paginas_router)
     app.include_router(shopify_vendas_router)
     app.include_router(guru_produtos_router)
     app.include_router(shopify_produtos_router)
@@ -85,6 +125,16 @@ def create_app() -> FastAPI:
     app.include_router(shopify_fulfillment_router)
     app.include_router(cotar_fretes_router)
 
+    # Fecha o pool do cliente HTTP assíncrono compartilhado
+    app.add_event_handler("shutdown", aclose_async_client)
+
+    # Gravação agendada do skus.json (coalesce rajadas de mutações do catálogo)
+    app.add_event_handler("startup", iniciar_flusher_skus)
+    app.add_event_handler("shutdown", parar_flusher_skus)
+
+    # Parse dos JSONs + mapas derivados antes do primeiro request
+    app.add_event_handler("startup", _prewarm)
+
     @app.get("/health", tags=["Health"])
     def health() -> dict[str, bool]:
         return {"ok": True}
@@ -94,3 +144,22 @@ def create_app() -> FastAPI:
 
 # Instância utilizada pelo servidor (uvicorn/gunicorn)
 app = create_app()
+
+
+if __name__ == "__main__":
+    import sys
+
+    import uvicorn
+
+    # Produção: `python -m app.main`. Event loop uvloop + parser httptools (ambos C, vêm com
+    # uvicorn[standard]) explícitos, para falhar cedo se faltarem em vez de cair no asyncio/h11 puros.
+    # Um worker por padrão: regras, ofertas e caches vivem em memória por processo. Mais workers só via
+    # WEB_CONCURRENCY, sabendo que edições simultâneas de regras/ofertas em workers diferentes não se enxergam.
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop não existe no Windows
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
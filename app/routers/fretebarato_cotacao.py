@@ -3,7 +3,7 @@ from __future__ import annotations
 from fastapi import APIRouter, HTTPException
 
 from app.schemas.fretebarato_cotacao import CotarFretesAutoRequest, CotarFretesResponse
-from app.services.fretebarato_cotacao import cotar_fretes_auto, get_planilha_atual  # type: ignore[attr-defined]
+from app.services.fretebarato_cotacao import cotar_fretes_auto, has_planilha  # type: ignore[attr-defined]
 
 router = APIRouter(prefix="/fretebarato", tags=["Cotações"])
 
@@ -14,8 +14,7 @@ router = APIRouter(prefix="/fretebarato", tags=["Cotações"])
     summary="Cotar frete (Frete Barato) montando lotes automaticamente por email+cep a partir do snapshot coletado",
 )
 def cotar_fretes_endpoint(req: CotarFretesAutoRequest) -> CotarFretesResponse:
-    linhas, _ = get_planilha_atual()
-    if not linhas:
+    if not has_planilha():
         # Nenhuma coleta disponível ainda
         raise HTTPException(status_code=412, detail="Nenhum snapshot de pedidos coletados está disponível")
     try:
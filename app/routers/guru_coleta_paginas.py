@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from app.common.responses import ORJSONResponse, com_etag, etag_confere, nao_modificado
+from app.schemas.guru_vendas_assinaturas import ColetaOut
+from app.services.coleta_paginas import COLETA_TTL_S, etag_pagina, proxima_pagina
+
+router = APIRouter(prefix="/guru/pedidos", tags=["Coletas"], default_response_class=ORJSONResponse)
+
+
+@router.get(
+    "/pagina",
+    response_model=None,
+    responses={200: {"model": ColetaOut}},
+    summary="Próxima página de uma coleta",
+    description=(
+        "Lê a página seguinte de uma coleta já executada (`/guru/pedidos/assinaturas` ou "
+        "`/guru/pedidos/produtos` chamadas com `limit`), a partir do `next_cursor` devolvido. "
+        f"Não refaz a coleta nem regrava a planilha. O resultado fica disponível por {COLETA_TTL_S // 60} minutos. "
+        "Responde com `ETag`; repetindo a mesma página com `If-None-Match`, devolve `304` sem corpo."
+    ),
+)
+def pagina_coleta(
+    request: Request,
+    cursor: str = Query(..., description="`next_cursor` da página anterior"),
+    limit: int = Query(100, ge=1, le=500, description="Tamanho da página"),
+) -> Response:
+    try:
+        etag = etag_pagina(cursor, limit)
+        if etag_confere(request, etag):
+            return nao_modificado(etag)
+        return com_etag(request, ORJSONResponse(proxima_pagina(cursor, limit)), etag)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except KeyError:
+        raise HTTPException(status_code=410, detail="Coleta expirada ou desconhecida; refaça a coleta.") from None
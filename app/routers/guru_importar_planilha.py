@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+from anyio import to_thread
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 
+from app.common.responses import ORJSONResponse
 from app.schemas.guru_importar_planilha import (  # <- confira o nome do módulo/schema
     ImportacaoParams,  # modelo de entrada (form) com sku
     ImportResultado,  # modelo de saída
-    RegistroImportado,  # item da saída
 )
 from app.services.guru_importar_planilha import importar as importar_service
 
@@ -14,7 +15,10 @@ router = APIRouter(prefix="/guru", tags=["Importação"])
 
 @router.post(
     "/importar-planilha",
-    response_model=ImportResultado,
+    # registros já montados no service com as chaves finais (aliases) e todos os valores str:
+    # o dict vai direto para o orjson, sem um objeto pydantic por linha; o schema fica só no OpenAPI
+    response_model=None,
+    responses={200: {"model": ImportResultado}},
     summary="Importar planilha de vendas do Guru",
     description=(
         "Recebe um arquivo CSV/XLSX exportado do Guru via multipart/form-data. "
@@ -24,20 +28,16 @@ router = APIRouter(prefix="/guru", tags=["Importação"])
 async def importar_guru_planilha(
     file: UploadFile = File(..., description="Planilha do Guru (.csv ou .xlsx)"),
     params: ImportacaoParams = Depends(ImportacaoParams.as_form),
-) -> ImportResultado:
+) -> ORJSONResponse:
     """
     - `file`: arquivo CSV/XLSX do Guru
     - `params.sku`: SKU do produto (conforme `skus.json`)
     """
     try:
-        payload = importar_service(await file.read(), file.filename or "", params.sku)
+        # passa o arquivo temporário do upload direto (sem copiar tudo para bytes) e parseia fora do loop
+        await file.seek(0)
+        payload = await to_thread.run_sync(importar_service, file.file, file.filename or "", params.sku)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    registros = [RegistroImportado.model_validate(r) for r in payload["registros"]]
-    return ImportResultado(
-        total=payload["total"],
-        produto_nome=payload["produto_nome"],
-        sku=payload["sku"],
-        registros=registros,
-    )
+    return ORJSONResponse(payload)
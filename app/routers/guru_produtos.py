@@ -6,6 +6,7 @@ from typing import Any
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
+from app.common.responses import PydanticResponse
 from app.services.guru_produtos import coletar_produtos_guru
 
 router = APIRouter(prefix="/guru", tags=["Coletas"])
@@ -19,13 +20,14 @@ class GuruProdutosPageResponse(BaseModel):
 
 @router.get(
     "/produtos",
-    response_model=GuruProdutosPageResponse,
+    response_model=None,
+    responses={200: {"model": GuruProdutosPageResponse}},
     summary="Listar produtos do Guru",
 )
 def listar_produtos_guru(
     limit: int = Query(100, ge=1, le=100, description="Qtde por página (máx 100)"),
     cursor: str | None = Query(None, description="Cursor da próxima página fornecido pela página anterior"),
-) -> GuruProdutosPageResponse:
+) -> PydanticResponse:
     try:
         payload = coletar_produtos_guru(limit=limit, cursor=cursor)
     except Exception as e:
@@ -33,4 +35,6 @@ def listar_produtos_guru(
 
     data = payload.get("data") or []
     next_cursor = payload.get("next_cursor")
-    return GuruProdutosPageResponse(count=len(data), next_cursor=next_cursor, data=data)
+    # página crua do Guru: sem revalidar cada item (model_construct), serializada via pydantic-core
+    page = GuruProdutosPageResponse.model_construct(count=len(data), next_cursor=next_cursor, data=data)
+    return PydanticResponse(page)
@@ -1,13 +1,16 @@
 # app/routers/guru_regras.py
 from __future__ import annotations
 
+from collections.abc import Mapping, Sequence
 from pathlib import Path
-from typing import Any
+from typing import Any, cast
 
 from fastapi import APIRouter, HTTPException, Query
 
+from app.common.responses import PydanticResponse
+
 # modelos pydantic centralizados
-from app.schemas.guru_regras import ConfigOfertas, Regra
+from app.schemas.guru_regras import ConfigOfertas, Regra, RegraOp
 
 # service de regras (backend puro)
 from app.services import guru_regras as regras
@@ -23,19 +26,30 @@ RegraList = list[dict[str, Any]]  # resposta “bruta” (shape do arquivo)
 # ======================= Helpers (id → idx) =======================
 
 
-def _load_rules() -> list[dict[str, Any]]:
+def _load_rules() -> Sequence[Mapping[str, Any]]:
+    # compartilhada com o cache: só leitura
     return regras.carregar_regras(CFG_PATH)
 
 
+def _load_rules_mutaveis() -> list[dict[str, Any]]:
+    return regras.copiar_regras(regras.carregar_regras(CFG_PATH))
+
+
 def _save_rules(rules: list[dict[str, Any]]) -> None:
     regras.salvar_regras(CFG_PATH, rules)
 
 
-def _find_idx_by_id(rules: list[dict[str, Any]], rid: str) -> int:
-    for i, r in enumerate(rules):
-        if str(r.get("id") or "") == rid:
-            return i
-    raise HTTPException(status_code=404, detail="Regra não encontrada (id inválido)")
+def _load_rules_indexadas() -> tuple[list[dict[str, Any]], dict[str, int]]:
+    # lista copiada para alteração; o índice continua compartilhado
+    rules, indice = regras.carregar_regras_indexadas(CFG_PATH)
+    return regras.copiar_regras(rules), indice
+
+
+def _find_idx_by_id(indice: dict[str, int], rid: str) -> int:
+    idx = indice.get(rid)
+    if idx is None:
+        raise HTTPException(status_code=404, detail="Regra não encontrada (id inválido)")
+    return idx
 
 
 # ======================= Endpoints =======================
@@ -47,7 +61,7 @@ def _find_idx_by_id(rules: list[dict[str, Any]], rid: str) -> int:
     summary="Listar regras",
     description="Retorna todas as regras carregadas do arquivo `config_ofertas.json`.",
 )
-def listar_regras() -> RegraList:
+def listar_regras() -> Sequence[Mapping[str, Any]]:
     try:
         return _load_rules()
     except Exception as e:
@@ -56,7 +70,9 @@ def listar_regras() -> RegraList:
 
 @router.put(
     "/",
-    response_model=ConfigOfertas,
+    # validado uma vez aqui e serializado via pydantic-core; sem response_model (que validaria de novo)
+    response_model=None,
+    responses={200: {"model": ConfigOfertas}},
     summary="Substituir todas as regras",
     description="""
 ⚠️ Sobrescreve **todas** as regras salvas em `config_ofertas.json`.
@@ -67,11 +83,11 @@ def listar_regras() -> RegraList:
 Use este endpoint para **importação em massa** ou **reset**. Para operações individuais, use `POST /`, `PUT /{id}`, `DELETE /{id}`.
 """,
 )
-def substituir_todas_regras(body: ConfigOfertas) -> ConfigOfertas:
+def substituir_todas_regras(body: ConfigOfertas) -> PydanticResponse:
     try:
         _save_rules([r.model_dump() for r in body.rules])
         # recarrega do disco para devolver no mesmo formato do arquivo
-        return ConfigOfertas(rules=[Regra.model_validate(r) for r in _load_rules()])
+        return PydanticResponse(ConfigOfertas.model_validate({"rules": _load_rules()}))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falha ao salvar regras: {e}")
 
@@ -84,7 +100,7 @@ def substituir_todas_regras(body: ConfigOfertas) -> ConfigOfertas:
 )
 def adicionar_regra(regra_in: Regra) -> RegraList:
     try:
-        rules = _load_rules()
+        rules = _load_rules_mutaveis()
         regras.add_regra(rules, regra_in.model_dump())
         _save_rules(rules)
         return rules
@@ -100,8 +116,8 @@ def adicionar_regra(regra_in: Regra) -> RegraList:
 )
 def editar_regra(regra_id: str, regra_in: Regra) -> RegraList:
     try:
-        rules = _load_rules()
-        idx = _find_idx_by_id(rules, regra_id)
+        rules, indice = _load_rules_indexadas()
+        idx = _find_idx_by_id(indice, regra_id)
         regras.edit_regra(rules, idx, regra_in.model_dump())
         _save_rules(rules)
         return rules
@@ -119,8 +135,8 @@ def editar_regra(regra_id: str, regra_in: Regra) -> RegraList:
 )
 def remover_regra(regra_id: str) -> RegraList:
     try:
-        rules = _load_rules()
-        idx = _find_idx_by_id(rules, regra_id)
+        rules, indice = _load_rules_indexadas()
+        idx = _find_idx_by_id(indice, regra_id)
         regras.del_regra(rules, idx)
         _save_rules(rules)
         return rules
@@ -130,6 +146,45 @@ def remover_regra(regra_id: str) -> RegraList:
         raise HTTPException(status_code=500, detail=f"Falha ao remover regra: {e}")
 
 
+@router.patch(
+    "/batch",
+    response_model=RegraList,
+    summary="Aplicar lote de operações (add/edit/del)",
+    description=(
+        "Aplica, na ordem enviada, uma lista de operações `add` | `edit` | `del` sobre as regras, "
+        "com **uma única** leitura e gravação do `config_ofertas.json`. "
+        "Se alguma operação falhar (ex.: id inexistente), nada é gravado."
+    ),
+)
+def aplicar_lote_regras(ops: list[RegraOp]) -> RegraList:
+    try:
+        rules, indice = _load_rules_indexadas()
+        indice = dict(indice)  # cópia local: o índice em cache é compartilhado
+        for n, o in enumerate(ops):
+            if o.op == "add":
+                regras.add_regra(rules, cast(Regra, o.regra).model_dump(mode="json"))
+                indice.setdefault(str(rules[-1].get("id") or ""), len(rules) - 1)
+                continue
+
+            rid = (o.id or "").strip()
+            idx = indice.get(rid)
+            if idx is None:
+                raise HTTPException(status_code=404, detail=f"Operação {n} ({o.op}): regra não encontrada (id={rid})")
+            if o.op == "edit":
+                regras.edit_regra(rules, idx, cast(Regra, o.regra).model_dump(mode="json", exclude={"id"}))
+            else:
+                regras.del_regra(rules, idx)
+                indice = regras.indexar_por_id(rules)  # posições após idx mudaram
+
+        if ops:
+            _save_rules(rules)
+        return rules
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Falha ao aplicar lote de regras: {e}")
+
+
 @router.get(
     "/contexto",
     response_model=dict[str, Any],
@@ -1,27 +1,26 @@
 from __future__ import annotations
 
+from functools import partial
 from pathlib import Path
 from typing import Literal
 
-from fastapi import APIRouter, HTTPException, Query
+from anyio import to_thread
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
+from app.common.responses import ORJSONResponse, colunas_response, com_etag, ndjson_response
 from app.schemas.guru_vendas_assinaturas import ColetaOut, PersistenciaPlanilha
+from app.services.coleta_paginas import primeira_pagina
 from app.services.guru_vendas_assinaturas import (
     garantir_dedup_ids_assinaturas,  # ✅ validador de dedup_id
     montar_payload_busca_assinaturas,
 )
 from app.services.guru_worker_coleta import executar_worker_guru
-from app.services.loader_main import carregar_cfg, carregar_skus
-from app.services.loader_regras_assinaturas import (
-    montar_mapas_cupons,
-    montar_ofertas_embutidas,
-    normalizar_rules,
-)
+from app.services.loader_main import carregar_regras_derivadas, carregar_skus, sku_para_nome
 
 # persistência em planilha (JSON) com dedupe/merge
 from app.storage.planilhas import append_coleta
 
-router = APIRouter(prefix="/guru/pedidos", tags=["Coletas"])
+router = APIRouter(prefix="/guru/pedidos", tags=["Coletas"], default_response_class=ORJSONResponse)
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 SKUS_PATH = BASE_DIR / "skus.json"
@@ -30,7 +29,10 @@ CFG_PATH = BASE_DIR / "config_ofertas.json"
 
 @router.get(
     "/assinaturas",
-    response_model=ColetaOut,
+    # a resposta sai direto como ORJSONResponse (sem validação/jsonable_encoder sobre milhares de linhas);
+    # o schema fica só documentado no OpenAPI
+    response_model=None,
+    responses={200: {"model": ColetaOut}},
     summary="Coletar assinaturas",
     description=(
         "Executa a **coleta completa** e retorna todas as linhas em `linhas`, junto com `contagem`.\n\n"
@@ -42,7 +44,8 @@ CFG_PATH = BASE_DIR / "config_ofertas.json"
     ),
     response_description="Retorna todas as linhas coletadas (`linhas`) e o resumo (`contagem`).",
 )
-def coletar_assinaturas(
+async def coletar_assinaturas(
+    request: Request,
     ano: int,
     mes: int,
     box_sku: str,
@@ -58,21 +61,36 @@ def coletar_assinaturas(
         ),
         example="pln_20251002_154522_ab12cd",
     ),
-) -> ColetaOut:
+    formato: Literal["json", "ndjson", "colunas"] = Query(
+        "json",
+        description=(
+            "`json` (padrão): objeto único `{linhas, contagem, persistencia}`. "
+            "`ndjson`: streaming `application/x-ndjson` — 1ª linha `{contagem, persistencia}`, depois uma linha por registro. "
+            "`colunas`: `{contagem, persistencia, total, colunas: {coluna: [valores]}}` — cada chave aparece uma vez só."
+        ),
+    ),
+    limit: int | None = Query(
+        None,
+        ge=1,
+        le=500,
+        description=(
+            "Tamanho da página. Omitido = todas as linhas. Com `limit`, a resposta traz `next_cursor` "
+            "para buscar as páginas seguintes em `/guru/pedidos/pagina` (sem refazer a coleta)."
+        ),
+    ),
+) -> Response:
     try:
-        skus_info = carregar_skus()
-        cfg = carregar_cfg()
+        skus_info = await to_thread.run_sync(carregar_skus)
+        # regras normalizadas + mapas de ofertas/cupons, memoizados pela versão do config_ofertas.json
+        regras = await to_thread.run_sync(carregar_regras_derivadas)
 
         # resolve nome do box pelo SKU
-        box_entry = next((nome for nome, info in skus_info.items() if info.get("sku") == box_sku), None)
+        box_entry = (await to_thread.run_sync(sku_para_nome)).get(box_sku)
         if not box_entry:
             raise HTTPException(status_code=400, detail=f"SKU '{box_sku}' não encontrado no skus.json")
 
         modo_str = "PERÍODO" if modo_periodo == 1 else "TODAS"
 
-        ofertas_embutidas = montar_ofertas_embutidas(cfg)
-        cupons_cdf, cupons_bi_mens = montar_mapas_cupons(cfg)
-
         dados = montar_payload_busca_assinaturas(
             ano=ano,
             mes=mes,
@@ -81,26 +99,26 @@ def coletar_assinaturas(
             periodicidade=periodicidade,
             skus_info=skus_info,
         )
-        dados["rules"] = normalizar_rules(cfg)
-        dados["ofertas_embutidas"] = ofertas_embutidas
-        dados["cupons_personalizados_cdf"] = cupons_cdf
-        dados["cupons_personalizados_bi_mens"] = cupons_bi_mens
-        dados["cupons_personalizados_anual"] = cupons_cdf
-        dados["cupons_personalizados_bimestral"] = cupons_bi_mens
+        dados["rules"] = regras.rules
+        dados["ofertas_embutidas"] = regras.ofertas_embutidas
+        dados["cupons_personalizados_cdf"] = regras.cupons_cdf
+        dados["cupons_personalizados_bi_mens"] = regras.cupons_bi_mens
+        dados["cupons_personalizados_anual"] = regras.cupons_cdf
+        dados["cupons_personalizados_bimestral"] = regras.cupons_bi_mens
 
-        # 1) coleta
-        linhas, contagem = executar_worker_guru(dados, skus_info=skus_info)
+        # 1) coleta (bloqueante/rede) no threadpool, liberando o event loop
+        linhas, contagem = await to_thread.run_sync(partial(executar_worker_guru, dados, skus_info=skus_info))
 
         # 2) valida dedup_id (não-destrutivo): exige transaction_id e preenche dedup_id
         #    apenas quando estiver ausente (linha principal); não mexe nas derivadas já setadas (transaction_id:SKU)
         try:
-            garantir_dedup_ids_assinaturas(linhas)
+            await to_thread.run_sync(garantir_dedup_ids_assinaturas, linhas)
         except ValueError as e:
             raise HTTPException(status_code=422, detail=str(e))
 
         # 3) persistir na planilha (dedupe por dedup_id + merge de campos em linhas existentes)
         try:
-            adicionados, atualizados = append_coleta(planilha_id, linhas)
+            adicionados, atualizados = await to_thread.run_sync(append_coleta, planilha_id, linhas)
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail=f"planilha_id não encontrada: {planilha_id}")
         except Exception as e:
@@ -112,7 +130,14 @@ def coletar_assinaturas(
             atualizados=atualizados,
         )
 
-        return ColetaOut(linhas=linhas, contagem=contagem, persistencia=persistencia)
+        cabecalho = {"contagem": contagem, "persistencia": persistencia.model_dump()}
+        if formato == "ndjson":
+            return ndjson_response(cabecalho, linhas)
+        if formato == "colunas":
+            return com_etag(request, await to_thread.run_sync(colunas_response, cabecalho, linhas))
+        if limit is not None:
+            return ORJSONResponse(await to_thread.run_sync(primeira_pagina, linhas, cabecalho, limit))
+        return com_etag(request, ORJSONResponse({"linhas": linhas, **cabecalho}))
 
     except HTTPException:
         raise
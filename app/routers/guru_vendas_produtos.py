@@ -1,24 +1,31 @@
 from __future__ import annotations
 
 from datetime import date
-from typing import Any
+from functools import partial
+from typing import Any, Literal
 
-from fastapi import APIRouter, HTTPException, Query
+from anyio import to_thread
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
+from app.common.responses import ORJSONResponse, colunas_response, com_etag, ndjson_response
 from app.schemas.guru_vendas_produtos import ColetaOut, PersistenciaPlanilha
-from app.services.guru_vendas_produtos import iniciar_coleta_vendas_produtos
+from app.services.coleta_paginas import primeira_pagina
+from app.services.guru_vendas_produtos import garantir_dedup_ids_produtos, iniciar_coleta_vendas_produtos
 from app.services.guru_worker_coleta import executar_worker_guru
 from app.services.loader_produtos_info import load_skus_info
 
 # persistência em planilha (JSON) com dedupe por dedup_id (line item)
 from app.storage.planilhas import append_coleta
 
-router = APIRouter(prefix="/guru/pedidos", tags=["Coletas"])
+router = APIRouter(prefix="/guru/pedidos", tags=["Coletas"], default_response_class=ORJSONResponse)
 
 
 @router.get(
     "/produtos",
-    response_model=ColetaOut,
+    # a resposta sai direto como ORJSONResponse: sem response_model (evita a segunda validação das linhas);
+    # o schema fica só documentado no OpenAPI
+    response_model=None,
+    responses={200: {"model": ColetaOut}},
     summary="Coletar vendas de produtos",
     description=(
         "Executa a **coleta completa** e retorna **todas as linhas** em `linhas`, com `contagem`.\n\n"
@@ -28,7 +35,8 @@ router = APIRouter(prefix="/guru/pedidos", tags=["Coletas"])
     ),
     response_description="Retorna todas as linhas (`linhas`) e o resumo (`contagem`).",
 )
-def buscar_vendas_produtos_guru(
+async def buscar_vendas_produtos_guru(
+    request: Request,
     data_ini: date = Query(..., description="Data inicial (YYYY-MM-DD)"),
     data_fim: date = Query(..., description="Data final (YYYY-MM-DD)"),
     nome_produto: str | None = Query(None, description="Nome do produto; vazio para todos"),
@@ -40,10 +48,27 @@ def buscar_vendas_produtos_guru(
         ),
         example="pln_20251002_154522_ab12cd",
     ),
-) -> ColetaOut:
+    formato: Literal["json", "ndjson", "colunas"] = Query(
+        "json",
+        description=(
+            "`json` (padrão): objeto único `{linhas, contagem, persistencia}`. "
+            "`ndjson`: streaming `application/x-ndjson` — 1ª linha `{contagem, persistencia}`, depois uma linha por registro. "
+            "`colunas`: `{contagem, persistencia, total, colunas: {coluna: [valores]}}` — cada chave aparece uma vez só."
+        ),
+    ),
+    limit: int | None = Query(
+        None,
+        ge=1,
+        le=500,
+        description=(
+            "Tamanho da página. Omitido = todas as linhas. Com `limit`, a resposta traz `next_cursor` "
+            "para buscar as páginas seguintes em `/guru/pedidos/pagina` (sem refazer a coleta)."
+        ),
+    ),
+) -> Response:
     try:
         # 1) Carregar SKUs
-        skus_info = load_skus_info()
+        skus_info = await to_thread.run_sync(load_skus_info)
 
         # 2) Montar payload de coleta
         payload = iniciar_coleta_vendas_produtos(
@@ -53,25 +78,20 @@ def buscar_vendas_produtos_guru(
             skus_info=skus_info,
         )
 
-        # 3) Executar coleta
-        linhas, contagem = executar_worker_guru(payload, skus_info=skus_info)
+        # 3) Executar coleta (bloqueante/rede) no threadpool, liberando o event loop
+        linhas, contagem = await to_thread.run_sync(partial(executar_worker_guru, payload, skus_info=skus_info))
 
-        # 4) Garantir dedup_id obrigatório:
+        # 4) Garantir dedup_id obrigatório (fora do event loop):
         #    - se já vier (ex.: de desmembrar combo), preserva
         #    - se não vier (linha principal), usa transaction_id
-        for r in linhas:
-            tid = str(r.get("transaction_id") or "").strip()
-            if not tid:
-                raise HTTPException(status_code=422, detail="Linha sem transaction_id; dedup_id é obrigatório.")
-            if not str(r.get("dedup_id") or "").strip():
-                # principal
-                r["dedup_id"] = tid
-            # se a linha for de combo, a função desmembrar_combo_planilha já deve
-            # ter setado dedup_id = f"{transaction_id}:{SKU}"
+        try:
+            await to_thread.run_sync(garantir_dedup_ids_produtos, linhas)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
 
         # 5) Persistir na planilha (dedupe por dedup_id + merge)
         try:
-            adicionados, atualizados = append_coleta(planilha_id, linhas)
+            adicionados, atualizados = await to_thread.run_sync(append_coleta, planilha_id, linhas)
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail=f"planilha_id não encontrada: {planilha_id}")
         except Exception as e:
@@ -83,8 +103,15 @@ def buscar_vendas_produtos_guru(
             atualizados=atualizados,
         )
 
-        # 6) Retorno completo
-        return ColetaOut(linhas=linhas, contagem=contagem, persistencia=persistencia)
+        # 6) Retorno completo, serializado direto (sem jsonable_encoder sobre milhares de linhas)
+        cabecalho = {"contagem": contagem, "persistencia": persistencia.model_dump()}
+        if formato == "ndjson":
+            return ndjson_response(cabecalho, linhas)
+        if formato == "colunas":
+            return com_etag(request, await to_thread.run_sync(colunas_response, cabecalho, linhas))
+        if limit is not None:
+            return ORJSONResponse(await to_thread.run_sync(primeira_pagina, linhas, cabecalho, limit))
+        return com_etag(request, ORJSONResponse({"linhas": linhas, **cabecalho}))
 
     except HTTPException:
         raise
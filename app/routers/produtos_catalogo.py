@@ -2,33 +2,42 @@ from __future__ import annotations
 
 from typing import Any
 
+from anyio import to_thread
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from app.common.responses import ORJSONResponse
 from app.schemas.produtos_catalogo import (
-    AssinaturaPatch,
-    ComboPatch,
+    PATCH_MODELS,
+    IdsBulk,
     ItemCreate,
     ProdutoPatch,
     SKUsPayload,
 )
 from app.services.loader_catalogo import (
+    carregar_catalogo,
     carregar_skus,
+    mutar_skus,
     salvar_skus,
 )
 
-router = APIRouter(prefix="/catalogo", tags=["Catálogo / SKUs"])
+router = APIRouter(prefix="/catalogo", tags=["Catálogo / SKUs"], default_response_class=ORJSONResponse)
+
+# Schema (apenas documentação) das rotas que devolvem o catálogo inteiro direto como ORJSONResponse,
+# sem passar pelo jsonable_encoder
+_CATALOGO_RESPONSES: dict[int | str, dict[str, Any]] = {200: {"model": dict[str, dict[str, Any]]}}
 
 
 # =========================
 # Helpers internos
 # =========================
+# Os endpoints são `async def`; leitura/gravação do skus.json (IO + parse/cópia) roda no threadpool
+# via `to_thread.run_sync`, para não bloquear o event loop. Mutações passam uma função a `mutar_skus`,
+# que a aplica ao estado mais recente do catálogo (nunca a um snapshot lido antes).
 
 
-def _assert_sku_unico(skus: dict[str, dict[str, Any]], sku: str, nome_atual: str | None = None) -> None:
-    iguais = [
-        n for n, info in skus.items() if str(info.get("sku") or "") == sku and (nome_atual is None or n != nome_atual)
-    ]
+def _assert_sku_unico(indice: dict[str, list[str]], sku: str, nome_atual: str | None = None) -> None:
+    iguais = [n for n in indice.get(sku, ()) if nome_atual is None or n != nome_atual]
     if iguais:
         raise HTTPException(
             status_code=409,
@@ -36,8 +45,10 @@ def _assert_sku_unico(skus: dict[str, dict[str, Any]], sku: str, nome_atual: str
         )
 
 
-def _resolver_por_sku(skus: dict[str, dict[str, Any]], sku: str) -> tuple[str, dict[str, Any]]:
-    hits = [(nome, info) for nome, info in skus.items() if str(info.get("sku") or "") == sku]
+def _resolver_por_sku(
+    skus: dict[str, dict[str, Any]], indice: dict[str, list[str]], sku: str
+) -> tuple[str, dict[str, Any]]:
+    hits = indice.get(sku, ())
     if not hits:
         raise HTTPException(status_code=404, detail="Item não encontrado por SKU")
     if len(hits) > 1:
@@ -46,10 +57,11 @@ def _resolver_por_sku(skus: dict[str, dict[str, Any]], sku: str) -> tuple[str, d
             detail={
                 "erro": "duplicidade_sku",
                 "mensagem": "Há mais de um item com esse SKU. Ajuste o catálogo para ter SKUs únicos.",
-                "nomes_afetados": [n for n, _ in hits],
+                "nomes_afetados": list(hits),
             },
         )
-    return hits[0]
+    nome = hits[0]
+    return nome, skus[nome]
 
 
 # =========================
@@ -61,10 +73,12 @@ def _resolver_por_sku(skus: dict[str, dict[str, Any]], sku: str) -> tuple[str, d
     "/",
     summary="Listar todos produtos cadastrados",
     description="Retorna o conteúdo do `skus.json` como dict nome→info (formato atual do arquivo).",
+    response_model=None,
+    responses=_CATALOGO_RESPONSES,
 )
-def listar_skus() -> dict[str, dict[str, Any]]:
+async def listar_skus() -> ORJSONResponse:
     try:
-        return carregar_skus()
+        return ORJSONResponse(await to_thread.run_sync(carregar_skus))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falha ao carregar SKUs: {e}")
 
@@ -73,12 +87,13 @@ def listar_skus() -> dict[str, dict[str, Any]]:
     "/",
     summary="Substituir o arquivo skus.json por um novo",
     description="Sobrescreve o arquivo `skus.json` com o payload enviado.",
-    response_model=dict[str, dict[str, Any]],
+    response_model=None,
+    responses=_CATALOGO_RESPONSES,
 )
-def substituir_skus(body: SKUsPayload) -> dict[str, dict[str, Any]]:
+async def substituir_skus(body: SKUsPayload) -> ORJSONResponse:
     try:
-        salvar_skus(body.skus)
-        return carregar_skus()
+        await to_thread.run_sync(salvar_skus, body.skus)
+        return ORJSONResponse(await to_thread.run_sync(carregar_skus))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falha ao salvar SKUs: {e}")
 
@@ -97,55 +112,56 @@ def substituir_skus(body: SKUsPayload) -> dict[str, dict[str, Any]]:
         "- `tipo='combo'`: exige `composto_de` (lista de SKUs).\n"
         "- `tipo='assinatura'`: exige `recorrencia` e `periodicidade` ('mensal' | 'bimestral')."
     ),
+    response_model=None,
+    responses=_CATALOGO_RESPONSES,
 )
-def criar_item_por_sku(sku: str, body: ItemCreate) -> dict[str, dict[str, Any]]:
+async def criar_item_por_sku(sku: str, body: ItemCreate) -> ORJSONResponse:
     sku = (sku or "").strip()
     if not sku:
         raise HTTPException(status_code=422, detail="SKU obrigatório")
-    try:
-        skus = carregar_skus()
+    nome_key = (body.nome or "").strip()
+    if not nome_key:
+        raise HTTPException(status_code=422, detail="Nome obrigatório")
+
+    info: dict[str, Any] = {
+        "sku": sku,
+        "peso": body.peso,
+        "guru_ids": body.guru_ids,
+        "shopify_ids": body.shopify_ids,
+        "indisponivel": body.indisponivel,
+    }
+
+    if body.tipo == "produto":
+        info.update({"tipo": "produto", "composto_de": []})
+    elif body.tipo == "combo":
+        info.update({"tipo": "combo", "composto_de": body.composto_de})
+    else:  # assinatura
+        info.update(
+            {
+                "tipo": "assinatura",
+                "recorrencia": body.recorrencia,
+                "periodicidade": body.periodicidade,
+                "composto_de": [],  # por consistência no arquivo
+            }
+        )
+
+    if body.preco_fallback is not None:
+        info["preco_fallback"] = body.preco_fallback
 
+    def _criar(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> None:
         # 409 se já houver esse SKU
-        existentes = [n for n, i in skus.items() if str(i.get("sku") or "") == sku]
+        existentes = list(indice.get(sku, ()))
         if existentes:
             raise HTTPException(
                 status_code=409,
                 detail={"erro": "sku_existente", "mensagem": "Já existe item com esse SKU.", "nomes": existentes},
             )
+        _assert_sku_unico(indice, sku, nome_atual=None)
+        skus[nome_key] = dict(info)
 
-        info: dict[str, Any] = {
-            "sku": sku,
-            "peso": body.peso,
-            "guru_ids": body.guru_ids,
-            "shopify_ids": body.shopify_ids,
-            "indisponivel": body.indisponivel,
-        }
-
-        if body.tipo == "produto":
-            info.update({"tipo": "produto", "composto_de": []})
-        elif body.tipo == "combo":
-            info.update({"tipo": "combo", "composto_de": body.composto_de})
-        else:  # assinatura
-            info.update(
-                {
-                    "tipo": "assinatura",
-                    "recorrencia": body.recorrencia,
-                    "periodicidade": body.periodicidade,
-                    "composto_de": [],  # por consistência no arquivo
-                }
-            )
-
-        if body.preco_fallback is not None:
-            info["preco_fallback"] = body.preco_fallback
-
-        nome_key = (body.nome or "").strip()
-        if not nome_key:
-            raise HTTPException(status_code=422, detail="Nome obrigatório")
-
-        _assert_sku_unico(skus, sku, nome_atual=None)
-        skus[nome_key] = info
-        salvar_skus(skus)
-        return skus
+    try:
+        skus, _ = await to_thread.run_sync(mutar_skus, _criar, sku)
+        return ORJSONResponse(skus)
     except HTTPException:
         raise
     except Exception as e:
@@ -165,20 +181,21 @@ def criar_item_por_sku(sku: str, body: ItemCreate) -> dict[str, dict[str, Any]]:
         "Se houver mais de um item com o mesmo SKU, retorna 409 (duplicidade). "
         "Assinaturas normalmente têm `sku=''` e não são elegíveis por este endpoint."
     ),
-    response_model=dict[str, dict[str, Any]],
+    response_model=None,
+    responses=_CATALOGO_RESPONSES,
 )
-def remover_item_por_sku(sku: str) -> dict[str, dict[str, Any]]:
+async def remover_item_por_sku(sku: str) -> ORJSONResponse:
     try:
         sku = (sku or "").strip()
         if not sku:
             raise HTTPException(status_code=422, detail="SKU inválido")
 
-        skus = carregar_skus()
-        nome, _ = _resolver_por_sku(skus, sku)
+        def _remover(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> None:
+            nome, _ = _resolver_por_sku(skus, indice, sku)
+            del skus[nome]
 
-        del skus[nome]
-        salvar_skus(skus)
-        return skus
+        skus, _ = await to_thread.run_sync(mutar_skus, _remover, sku)
+        return ORJSONResponse(skus)
     except HTTPException:
         raise
     except Exception as e:
@@ -199,17 +216,18 @@ class IndisponibilidadeIn(BaseModel):
     summary="Marcar indisponibilidade por SKU",
     description="Procura o item pelo campo `sku` e define `indisponivel`.",
 )
-def set_indisponivel_por_sku(sku: str, body: IndisponibilidadeIn) -> dict[str, Any]:
+async def set_indisponivel_por_sku(sku: str, body: IndisponibilidadeIn) -> dict[str, Any]:
     try:
         sku = (sku or "").strip()
         if not sku:
             raise HTTPException(status_code=422, detail="SKU inválido")
 
-        skus = carregar_skus()
-        nome, info = _resolver_por_sku(skus, sku)
+        def _marcar(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> tuple[str, dict[str, Any]]:
+            nome, info = _resolver_por_sku(skus, indice, sku)
+            info["indisponivel"] = bool(body.indisponivel)
+            return nome, info
 
-        info["indisponivel"] = bool(body.indisponivel)
-        salvar_skus(skus)
+        _, (nome, info) = await to_thread.run_sync(mutar_skus, _marcar, sku)
         return {"nome": nome, **info}
     except HTTPException:
         raise
@@ -230,30 +248,19 @@ def set_indisponivel_por_sku(sku: str, body: IndisponibilidadeIn) -> dict[str, A
         "produto → ProdutoPatch | combo → ComboPatch | assinatura → AssinaturaPatch."
     ),
 )
-def patch_por_sku(sku: str, body: dict[str, Any]) -> dict[str, Any]:
+async def patch_por_sku(sku: str, body: dict[str, Any]) -> dict[str, Any]:
     try:
         sku = (sku or "").strip()
         if not sku:
             raise HTTPException(status_code=422, detail="SKU inválido")
 
-        skus = carregar_skus()
-        nome, info = _resolver_por_sku(skus, sku)
-
-        tipo = str(info.get("tipo") or "produto")
-
-        patch: BaseModel
-        if tipo == "combo":
-            patch = ComboPatch.model_validate(body)
-        elif tipo == "assinatura":
-            patch = AssinaturaPatch.model_validate(body)
-        else:
-            patch = ProdutoPatch.model_validate(body)
-
-        data = patch.model_dump(exclude_unset=True)
-        for k, v in data.items():
-            info[k] = v
+        def _patch(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> tuple[str, dict[str, Any]]:
+            nome, info = _resolver_por_sku(skus, indice, sku)
+            patch_cls = PATCH_MODELS.get(str(info.get("tipo") or "produto"), ProdutoPatch)
+            info.update(patch_cls.model_validate(body).model_dump(exclude_unset=True))
+            return nome, info
 
-        salvar_skus(skus)
+        _, (nome, info) = await to_thread.run_sync(mutar_skus, _patch, sku)
         return {"nome": nome, **info}
 
     except HTTPException:
@@ -273,13 +280,15 @@ class IdsIn(BaseModel):
     "/{sku}/gid",
     summary="Adicionar um ou mais Guru IDs ao item (por SKU)",
 )
-def add_guru_ids(sku: str, body: IdsIn) -> dict[str, Any]:
-    skus = carregar_skus()
-    nome, info = _resolver_por_sku(skus, (sku or "").strip())
-    ids = set(info.get("guru_ids") or [])
-    ids.update(body.ids)
-    info["guru_ids"] = list(ids)
-    salvar_skus(skus)
+async def add_guru_ids(sku: str, body: IdsIn) -> dict[str, Any]:
+    def _add(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> tuple[str, dict[str, Any]]:
+        nome, info = _resolver_por_sku(skus, indice, (sku or "").strip())
+        ids = set(info.get("guru_ids") or ())
+        ids.update(body.ids)
+        info["guru_ids"] = sorted(ids)
+        return nome, info
+
+    _, (nome, info) = await to_thread.run_sync(mutar_skus, _add, sku)
     return {"nome": nome, **info}
 
 
@@ -287,11 +296,15 @@ def add_guru_ids(sku: str, body: IdsIn) -> dict[str, Any]:
     "/{sku}/{gid}",
     summary="Remover um Guru ID do item (por SKU)",
 )
-def remove_guru_id(sku: str, gid: str) -> dict[str, Any]:
-    skus = carregar_skus()
-    nome, info = _resolver_por_sku(skus, (sku or "").strip())
-    info["guru_ids"] = [x for x in (info.get("guru_ids") or []) if x != gid]
-    salvar_skus(skus)
+async def remove_guru_id(sku: str, gid: str) -> dict[str, Any]:
+    def _remover(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> tuple[str, dict[str, Any]]:
+        nome, info = _resolver_por_sku(skus, indice, (sku or "").strip())
+        ids = set(info.get("guru_ids") or ())
+        ids.discard(gid)
+        info["guru_ids"] = sorted(ids)
+        return nome, info
+
+    _, (nome, info) = await to_thread.run_sync(mutar_skus, _remover, sku)
     return {"nome": nome, **info}
 
 
@@ -303,25 +316,43 @@ class IdsIntIn(BaseModel):
     "/{sku}/sid",
     summary="Adicionar um ou mais Shopify IDs ao item (por SKU)",
 )
-def add_shopify_ids(sku: str, body: IdsIntIn) -> dict[str, Any]:
-    skus = carregar_skus()
-    nome, info = _resolver_por_sku(skus, (sku or "").strip())
-    ids = set(info.get("shopify_ids") or [])
-    ids.update(body.ids)
-    info["shopify_ids"] = list(ids)
-    salvar_skus(skus)
+async def add_shopify_ids(sku: str, body: IdsIntIn) -> dict[str, Any]:
+    def _add(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> tuple[str, dict[str, Any]]:
+        nome, info = _resolver_por_sku(skus, indice, (sku or "").strip())
+        ids = set(info.get("shopify_ids") or ())
+        ids.update(body.ids)
+        info["shopify_ids"] = sorted(ids)
+        return nome, info
+
+    _, (nome, info) = await to_thread.run_sync(mutar_skus, _add, sku)
     return {"nome": nome, **info}
 
 
-@router.delete(
-    "/{sku}/{sid}",
-    summary="Remover um Shopify ID do item (por SKU)",
+@router.patch(
+    "/{sku}/ids",
+    summary="Adicionar/remover Guru e Shopify IDs em lote (por SKU)",
+    description=(
+        "Aplica `add_guru`/`remove_guru`/`add_shopify`/`remove_shopify` no item de uma vez, "
+        "com uma única gravação do `skus.json`. Remoções são aplicadas depois das adições.\n"
+        "É também a rota para remover Shopify IDs (`DELETE /{sku}/{id}` remove Guru IDs)."
+    ),
 )
-def remove_shopify_id(sku: str, sid: int) -> dict[str, Any]:
-    skus = carregar_skus()
-    nome, info = _resolver_por_sku(skus, (sku or "").strip())
-    info["shopify_ids"] = [x for x in (info.get("shopify_ids") or []) if int(x) == int(x) and x != sid]
-    salvar_skus(skus)
+async def patch_ids_por_sku(sku: str, body: IdsBulk) -> dict[str, Any]:
+    def _aplicar(skus: dict[str, dict[str, Any]], indice: dict[str, list[str]]) -> tuple[str, dict[str, Any]]:
+        nome, info = _resolver_por_sku(skus, indice, (sku or "").strip())
+
+        guru = set(info.get("guru_ids") or ())
+        guru.update(body.add_guru)
+        guru.difference_update(body.remove_guru)
+        info["guru_ids"] = sorted(guru)
+
+        shopify = set(info.get("shopify_ids") or ())
+        shopify.update(body.add_shopify)
+        shopify.difference_update(body.remove_shopify)
+        info["shopify_ids"] = sorted(shopify)
+        return nome, info
+
+    _, (nome, info) = await to_thread.run_sync(mutar_skus, _aplicar, sku)
     return {"nome": nome, **info}
 
 
@@ -335,14 +366,14 @@ def remove_shopify_id(sku: str, sid: int) -> dict[str, Any]:
     summary="Obter item por SKU",
     description="Retorna o item (produto/combo) cujo `sku` coincida (assinaturas normalmente não têm SKU).",
 )
-def obter_por_sku(sku: str) -> dict[str, Any]:
+async def obter_por_sku(sku: str) -> dict[str, Any]:
     try:
         sku = (sku or "").strip()
         if not sku:
             raise HTTPException(status_code=422, detail="SKU inválido")
 
-        skus = carregar_skus()
-        nome, info = _resolver_por_sku(skus, sku)
+        skus, indice = await to_thread.run_sync(carregar_catalogo)
+        nome, info = _resolver_por_sku(skus, indice, sku)
         return {"nome": nome, **info}
     except HTTPException:
         raise
@@ -1,29 +1,60 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
-from app.schemas.shopify_produtos import ShopifyProdutosResponse
-from app.services.shopify_produtos import buscar_produtos_shopify
+from app.common.responses import PydanticResponse, com_etag, etag_confere, nao_modificado
+from app.schemas.shopify_produtos import ProductShopifyVariant, ShopifyProdutosResponse
+from app.services.shopify_produtos import CATALOGO_TTL_S, catalogo_shopify
 
 router = APIRouter(prefix="/shopify", tags=["Coletas"])
 
+# o catálogo muda pouco: o navegador pode reusar por 1 min e depois revalida via If-None-Match
+_CACHE_CONTROL_CATALOGO = f"private, max-age={min(CATALOGO_TTL_S, 60)}"
+
+# corpo JSON já serializado por (etag do catálogo, limit): enquanto o catálogo em cache não muda,
+# cada GET devolve os mesmos bytes sem re-serializar milhares de variantes
+_CORPOS_MAX = 32
+_corpos: dict[tuple[str, int], bytes] = {}
+
+
+def _corpo_catalogo(etag_catalogo: str, limit: int, variantes: list[ProductShopifyVariant]) -> bytes:
+    chave = (etag_catalogo, limit)
+    corpo = _corpos.get(chave)
+    if corpo is None:
+        if len(_corpos) >= _CORPOS_MAX or any(k[0] != etag_catalogo for k in _corpos):
+            _corpos.clear()  # catálogo novo (ou limits demais): descarta os corpos antigos
+        resposta = ShopifyProdutosResponse.model_construct(count=len(variantes), data=variantes)
+        corpo = _corpos[chave] = resposta.model_dump_json(by_alias=True).encode()
+    return corpo
+
 
 @router.get(
     "/produtos",
-    response_model=ShopifyProdutosResponse,
+    # variantes já validadas no service: monta a resposta sem revalidar (model_construct)
+    # e serializa via pydantic-core; o schema fica só documentado no OpenAPI
+    response_model=None,
+    responses={200: {"model": ShopifyProdutosResponse}},
     summary="Listar produtos/variantes da Shopify",
     description=(
         "Retorna uma lista plana de variantes de produtos da Shopify, "
         "com `product_id`, `variant_id`, `title` e `sku`."
     ),
 )
-def listar_produtos_shopify(
+async def listar_produtos_shopify(
+    request: Request,
     limit: int = Query(0, ge=0, description="Opcional: limitar a quantidade de itens retornados (0 = todos)"),
-) -> ShopifyProdutosResponse:
+) -> Response:
     try:
-        todos = buscar_produtos_shopify()
-        if limit > 0:
-            todos = todos[:limit]
-        return ShopifyProdutosResponse(count=len(todos), data=todos)
+        todos, etag_catalogo = await catalogo_shopify(limit=limit or None)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Falha ao buscar produtos da Shopify: {e}")
+
+    # com o catálogo em cache o ETag já é conhecido: 304 sem serializar nada
+    etag = f'"{etag_catalogo}.{limit}"' if etag_catalogo else None
+    if etag and etag_confere(request, etag):
+        return nao_modificado(etag, _CACHE_CONTROL_CATALOGO)
+    if etag_catalogo:
+        resposta: Response = Response(_corpo_catalogo(etag_catalogo, limit, todos), media_type="application/json")
+    else:
+        resposta = PydanticResponse(ShopifyProdutosResponse.model_construct(count=len(todos), data=todos))
+    return com_etag(request, resposta, etag, _CACHE_CONTROL_CATALOGO)
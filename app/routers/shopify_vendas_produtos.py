@@ -1,53 +1,109 @@
 # /routers/shopify_vendas_produtos.py
 
-from datetime import datetime
-from typing import Any
+import math
+import re
+import sys
+from datetime import date
+from typing import Any, Literal
 
-from fastapi import APIRouter, HTTPException, Query
+from anyio import to_thread
+from fastapi import APIRouter, HTTPException, Query, Response
 
-from app.services.shopify_vendas_produtos import coletar_vendas_shopify
+from app.common.responses import ORJSONResponse, colunas_response, ndjson_response
+from app.services.loader_main import skus_validos
+from app.services.shopify_vendas_produtos import ShopifyRateLimitError, coletar_vendas_shopify_cache
+from app.utils.sku import parse_csv
 
-router = APIRouter(prefix="/shopify", tags=["Coletas"])
+router = APIRouter(prefix="/shopify", tags=["Coletas"], default_response_class=ORJSONResponse)
 
+# formato estrito YYYY-MM-DD (o `date.fromisoformat` do 3.11+ também aceita "20250101", "2025-W01"...);
+# a data em si (ex.: 2025-02-30) é conferida com `date.fromisoformat`
+_ISO_RE = re.compile(r"(\d{4})-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])")
 
-@router.get("/pedidos")
-def get_shopify_pedidos(
+
+def _data_existe(iso: str) -> bool:
+    try:
+        date.fromisoformat(iso)
+    except ValueError:
+        return False
+    return True
+
+
+# resposta direto como ORJSONResponse (sem response_model): as milhares de linhas não passam
+# por jsonable_encoder + json.dumps
+@router.get("/pedidos", response_model=None)
+async def get_shopify_pedidos(
     status: str = Query("any", pattern="^(any|unfulfilled)$"),
     data_inicio: str = Query(..., description="YYYY-MM-DD"),  # data no padrão ISO
     gpt: bool = Query(False, description="Ativa ajuste de endereço com IA na normalização"),
-) -> dict[str, Any]:
+    refresh: bool = Query(False, description="Ignora a coleta em cache e consulta a Shopify de novo"),
+    sku_produtos: str | None = Query(None, description="CSV de SKUs (do skus.json) para filtrar as linhas"),
+    formato: Literal["json", "ndjson", "colunas"] = Query(
+        "json",
+        description=(
+            "`json` (padrão): objeto único `{linhas, stats, filtros}`. "
+            "`ndjson`: streaming `application/x-ndjson` — 1ª linha `{stats, filtros}`, depois uma linha por pedido/item. "
+            "`colunas`: `{stats, filtros, total, colunas: {coluna: [valores]}}` — cada chave aparece uma vez só."
+        ),
+    ),
+) -> Response:
     # 1) Converter data_inicio para dd/MM/yyyy (padrão interno do service)
-    try:
-        _dt = datetime.strptime(data_inicio, "%Y-%m-%d")
-        data_inicio_ddmmyyyy = _dt.strftime("%d/%m/%Y")
-    except ValueError:
+    if not (m := _ISO_RE.fullmatch(data_inicio)) or not _data_existe(data_inicio):
         raise HTTPException(status_code=400, detail='data_inicio inválida: use "YYYY-MM-DD"')
+    data_inicio_ddmmyyyy = f"{m[3]}/{m[2]}/{m[1]}"
+
+    # 1.1) Filtro de SKUs: tokens conferidos contra o conjunto (pré-computado) do skus.json,
+    #      rejeitando SKU desconhecido antes de gastar chamadas na Shopify
+    skus_filtro: list[str] | None = None
+    if sku_produtos:
+        tokens = [sys.intern(t.upper()) for t in parse_csv(sku_produtos)]
+        validos = skus_validos()
+        if invalidos := [t for t in tokens if t not in validos]:
+            raise HTTPException(status_code=400, detail=f"SKU(s) desconhecido(s): {', '.join(invalidos)}")
+        skus_filtro = tokens or None
 
     # 2) Coleta completa -> linhas no layout da planilha (padronizar_planilha_bling)
+    #    pipeline bloqueante (GraphQL + CEP/endereço) numa thread, liberando o event loop;
+    #    mesmos filtros dentro do TTL reaproveitam a coleta (ou esperam a que já está rodando)
     try:
-        linhas, stats = coletar_vendas_shopify(
+        linhas, stats_coleta = await coletar_vendas_shopify_cache(
             data_inicio=data_inicio_ddmmyyyy,
             fulfillment_status=status,
-            sku_produtos=None,
+            sku_produtos=skus_filtro,
             enrich_cpfs=True,  # sempre injeta CPF quando disponível
             enrich_bairros=True,  # sempre busca bairro via CEP (lote/cache)
             enrich_enderecos=True,  # sempre normaliza endereço
+            refresh=refresh,
         )
         # Se quiser IA às vezes, conecte seu provider dentro de enriquecer_enderecos_nas_linhas
         # quando gpt=True (ex.: via variável global ou parâmetro adicional no pipeline).
-        # Aqui apenas propagamos a flag para facilitar debugging futuro:
-        stats.setdefault("flags", {})["gpt"] = gpt
+        # Aqui apenas propagamos a flag para facilitar debugging futuro
+        # (cópia rasa: o stats vem do cache compartilhado, não pode ser alterado in-place):
+        stats: dict[str, Any] = {**stats_coleta, "flags": {"gpt": gpt}}
+    except ShopifyRateLimitError as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Shopify limitando requisições; tente novamente em instantes",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
     except Exception:
         raise HTTPException(status_code=502, detail="Erro ao coletar/normalizar pedidos da Shopify")
 
     # 3) Retorno JSON no formato “planilha” (mesmas colunas do Bling)
     # Ex.: linhas: List[Dict[str, str]] com chaves como:
     # "Número pedido", "Nome Comprador", "CPF/CNPJ Comprador", "Endereço Entrega", "Número Entrega", ...
-    return {
-        "linhas": linhas,  # dados já prontos no shape da planilha
+    cabecalho = {
         "stats": stats,  # contagens auxiliares (status/produto etc.)
         "filtros": {
             "status": status,
             "data_inicio": data_inicio,  # ecoa a data ISO solicitada
+            "sku_produtos": skus_filtro,
         },
     }
+    # ndjson: cada linha é serializada sob demanda e enviada em blocos — o corpo inteiro
+    # (dezenas de MB em períodos longos) nunca fica em memória junto com as linhas
+    if formato == "ndjson":
+        return ndjson_response(cabecalho, linhas)
+    if formato == "colunas":
+        return await to_thread.run_sync(colunas_response, cabecalho, linhas)
+    return ORJSONResponse({"linhas": linhas, **cabecalho})  # dados já prontos no shape da planilha
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import re
 from enum import Enum
-from typing import Annotated
+from typing import Annotated, Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+_NAO_DIGITO = re.compile(r"\D")
 
 
 class TransportadoraEnum(str, Enum):
@@ -19,6 +22,22 @@ class EntradaIdentificacao(BaseModel):
     cep: str = Field(..., description="CEP de entrega (com ou sem máscara)")
     numero_entrega: str = Field(..., description="Número do endereço de entrega (ex.: '1500' ou '221A')")
 
+    # normalizados uma vez na entrada: o service compara direto com as linhas da planilha
+    @field_validator("cep", mode="before")
+    @classmethod
+    def _norm_cep(cls, v: Any) -> Any:
+        if not isinstance(v, str):
+            return v
+        cep = _NAO_DIGITO.sub("", v)
+        if not 1 <= len(cep) <= 8:
+            raise ValueError("cep inválido (esperado até 8 dígitos)")
+        return cep.zfill(8)  # planilhas costumam perder o zero à esquerda
+
+    @field_validator("email", "numero_entrega", mode="before")
+    @classmethod
+    def _strip(cls, v: Any) -> Any:
+        return v.strip() if isinstance(v, str) else v
+
 
 # app/schemas/fretebarato_cotacao.py (acréscimo campo)
 class CotarFretesAutoRequest(BaseModel):
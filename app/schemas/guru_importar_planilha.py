@@ -1,6 +1,8 @@
 # app/schemas/guru_importacao.py
 from __future__ import annotations
 
+from typing import Any
+
 from fastapi import Form
 from pydantic import BaseModel, Field, model_validator
 from pydantic.config import ConfigDict
@@ -17,7 +19,9 @@ class ImportacaoParams(BaseModel):
         cls,
         sku: str = Form(..., description="SKU do produto conforme skus.json"),
     ) -> ImportacaoParams:
-        return cls(sku=sku)
+        # o Form já entrega `sku` como str (validado pelo FastAPI): monta sem uma 2ª validação.
+        # Se o modelo ganhar campos com regras próprias, volte a validar (cls.model_validate).
+        return cls.model_construct(sku=sku)
 
 
 # -------------------------
@@ -32,9 +36,8 @@ class GuruPedidoRow(BaseModel):
     nome_produto: str = Field(alias="nome produto")
     id_produto: str = Field(alias="id produto")
 
-    # Assinatura (duas grafias possíveis)
+    # Assinatura (duas grafias possíveis; "assinatura codigo" é unificada no validador de entrada)
     assinatura_codigo: str | None = Field(default="", alias="assinatura código")
-    assinatura_codigo_alt: str | None = Field(default=None, alias="assinatura codigo", exclude=True)
 
     # Contato/entrega
     nome_contato: str = Field(alias="nome contato")
@@ -53,13 +56,18 @@ class GuruPedidoRow(BaseModel):
     data_pedido: str = Field(alias="data pedido")
     pagamento: str = Field(alias="pagamento")
 
-    @model_validator(mode="after")
-    def _coalesce_assinatura_codigo(self) -> GuruPedidoRow:
-        prim = (self.assinatura_codigo or "").strip()
-        alt = (self.assinatura_codigo_alt or "").strip()
+    @model_validator(mode="before")
+    @classmethod
+    def _coalesce_assinatura_codigo(cls, data: Any) -> Any:
+        """Sem "assinatura código" preenchido, usa a grafia sem acento (no dict cru, antes dos campos)."""
+        if not isinstance(data, dict):
+            return data
+        prim = str(data.get("assinatura código") or data.get("assinatura_codigo") or "").strip()
+        alt = str(data.get("assinatura codigo") or "").strip()
         if not prim and alt:
-            object.__setattr__(self, "assinatura_codigo", alt)
-        return self
+            data = {**data, "assinatura código": alt}
+            data.pop("assinatura_codigo", None)
+        return data
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -41,8 +41,9 @@ class Regra(BaseModel):
     oferta: OfertaCfg | None = None
     action: Action
 
+    # um passe "after" só: confere o alvo e completa o id
     @model_validator(mode="after")
-    def _check_alvos(self) -> Regra:
+    def _check_alvos_e_id(self) -> Regra:
         if self.applies_to == "cupom":
             if self.cupom is None:
                 raise ValueError("Para applies_to='cupom', o bloco 'cupom' é obrigatório.")
@@ -53,10 +54,6 @@ class Regra(BaseModel):
                 raise ValueError("Para applies_to='oferta', o bloco 'oferta' é obrigatório.")
             if self.cupom is not None:
                 raise ValueError("Para applies_to='oferta', não envie 'cupom'.")
-        return self
-
-    @model_validator(mode="after")
-    def _ensure_id(self) -> Regra:
         if self.id is None:
             self.id = uuid4()
         return self
@@ -64,3 +61,24 @@ class Regra(BaseModel):
 
 class ConfigOfertas(BaseModel):
     rules: list[Regra] = Field(default_factory=list)
+
+
+class RegraOp(BaseModel):
+    """
+    Operação de um lote (PATCH /guru/regras/batch):
+      - add:  exige `regra`
+      - edit: exige `id` e `regra` (mantém o id existente)
+      - del:  exige `id`
+    """
+
+    op: Literal["add", "edit", "del"]
+    id: str | None = Field(None, description="Id da regra alvo (edit/del)")
+    regra: Regra | None = Field(None, description="Regra a adicionar/gravar (add/edit)")
+
+    @model_validator(mode="after")
+    def _check_campos(self) -> RegraOp:
+        if self.op in ("edit", "del") and not (self.id or "").strip():
+            raise ValueError(f"Para op='{self.op}', 'id' é obrigatório.")
+        if self.op in ("add", "edit") and self.regra is None:
+            raise ValueError(f"Para op='{self.op}', 'regra' é obrigatória.")
+        return self
@@ -45,3 +45,7 @@ class ColetaOut(BaseModel):
         ),
         examples=[{"planilha_id": "pln_20251002_154522_ab12cd", "adicionados": 120, "atualizados": 8}],
     )
+    next_cursor: str | None = Field(
+        None,
+        description="Presente quando a rota é chamada com `limit`: cursor da próxima página (`/guru/pedidos/pagina`).",
+    )
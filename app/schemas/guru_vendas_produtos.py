@@ -37,3 +37,7 @@ class ColetaOut(BaseModel):
             "atualizados": 12
         }],
     )
+    next_cursor: str | None = Field(
+        None,
+        description="Presente quando a rota é chamada com `limit`: cursor da próxima página (`/guru/pedidos/pagina`).",
+    )
@@ -4,8 +4,11 @@ from typing import Any, Literal
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
+from app.utils.sku import normalizar_ids_int, normalizar_ids_str
+
 # agora inclui 'assinatura'
 TipoItem = Literal["produto", "combo", "assinatura"]
+Periodicidade = Literal["mensal", "bimestral"]
 
 
 class ItemCreate(BaseModel):
@@ -35,20 +38,12 @@ class ItemCreate(BaseModel):
     @field_validator("guru_ids", mode="before")
     @classmethod
     def _norm_guru(cls, v: Any) -> list[str]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",")]
-        return [str(x).strip() for x in list(v) if str(x).strip()]
+        return normalizar_ids_str(v)
 
     @field_validator("shopify_ids", mode="before")
     @classmethod
     def _norm_shopify(cls, v: Any) -> list[int]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",") if x.strip()]
-        return [int(x) for x in list(v) if str(x).strip().isdigit()]
+        return normalizar_ids_int(v)
 
     @model_validator(mode="after")
     def _require_fields_by_tipo(self) -> ItemCreate:
@@ -89,20 +84,12 @@ class ProdutoIn(BaseModel):
     @field_validator("guru_ids", mode="before")
     @classmethod
     def _norm_guru(cls, v: Any) -> list[str]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",")]
-        return [str(x).strip() for x in list(v) if str(x).strip()]
+        return normalizar_ids_str(v)
 
     @field_validator("shopify_ids", mode="before")
     @classmethod
     def _norm_shopify(cls, v: Any) -> list[int]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",") if x.strip()]
-        return [int(x) for x in list(v) if str(x).strip().isdigit()]
+        return normalizar_ids_int(v)
 
 
 class AssinaturaIn(BaseModel):
@@ -138,20 +125,12 @@ class AssinaturaIn(BaseModel):
     @field_validator("guru_ids", mode="before")
     @classmethod
     def _norm_guru(cls, v: Any) -> list[str]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",")]
-        return [str(x).strip() for x in list(v) if str(x).strip()]
+        return normalizar_ids_str(v)
 
     @field_validator("shopify_ids", mode="before")
     @classmethod
     def _norm_shopify(cls, v: Any) -> list[int]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",") if x.strip()]
-        return [int(x) for x in list(v) if str(x).strip().isdigit()]
+        return normalizar_ids_int(v)
 
 
 class ComboIn(BaseModel):
@@ -179,20 +158,12 @@ class ComboIn(BaseModel):
     @field_validator("composto_de", "guru_ids", mode="before")
     @classmethod
     def _norm_list(cls, v: Any) -> list[str]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",")]
-        return [str(x).strip() for x in list(v) if str(x).strip()]
+        return normalizar_ids_str(v)
 
     @field_validator("shopify_ids", mode="before")
     @classmethod
     def _norm_shopify(cls, v: Any) -> list[int]:
-        if v is None:
-            return []
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",") if x.strip()]
-        return [int(x) for x in list(v) if str(x).strip().isdigit()]
+        return normalizar_ids_int(v)
 
 
 class SKUsPayload(BaseModel):
@@ -209,101 +180,63 @@ class SKUsPayload(BaseModel):
 # =========================
 
 
-class ProdutoPatch(BaseModel):
-    """Atualização parcial de um produto (aplica apenas campos enviados)."""
+class _PatchBase(BaseModel):
+    """
+    Campos comuns aos PATCHes parciais (produto/combo/assinatura) e seus validadores,
+    declarados uma vez: cada tipo só acrescenta os próprios campos.
+    """
 
-    peso: float | None = Field(None, ge=0)
     guru_ids: list[str] | None = None
     shopify_ids: list[int] | None = None
     preco_fallback: float | None = Field(None, ge=0)
     indisponivel: bool | None = None
+    peso: float | None = Field(None, ge=0)
 
     @field_validator("guru_ids", mode="before")
     @classmethod
-    def _norm_guru(cls, v: Any):
-        if v is None:
-            return v
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",")]
-        return [str(x).strip() for x in list(v) if str(x).strip()]
+    def _norm_guru(cls, v: Any) -> list[str] | None:
+        return None if v is None else normalizar_ids_str(v)
 
     @field_validator("shopify_ids", mode="before")
     @classmethod
-    def _norm_shopify(cls, v: Any):
-        if v is None:
-            return v
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",") if x.strip()]
-        return [int(x) for x in list(v) if str(x).strip().isdigit()]
+    def _norm_shopify(cls, v: Any) -> list[int] | None:
+        return None if v is None else normalizar_ids_int(v)
 
 
-class AssinaturaPatch(BaseModel):
-    """Atualização parcial de uma assinatura (aplica apenas campos enviados)."""
+class ProdutoPatch(_PatchBase):
+    """Atualização parcial de um produto (aplica apenas campos enviados)."""
 
-    recorrencia: str | None = Field(None, description="anual | bianual | trianual | mensal | bimestral")
-    periodicidade: str | None = Field(None, description="'mensal' | 'bimestral'")
-    guru_ids: list[str] | None = None
-    shopify_ids: list[int] | None = None
-    preco_fallback: float | None = Field(None, ge=0)
-    indisponivel: bool | None = None
-    peso: float | None = Field(None, ge=0)
 
-    @field_validator("guru_ids", mode="before")
-    @classmethod
-    def _norm_guru(cls, v: Any):
-        if v is None:
-            return v
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",")]
-        return [str(x).strip() for x in list(v) if str(x).strip()]
+class AssinaturaPatch(_PatchBase):
+    """Atualização parcial de uma assinatura (aplica apenas campos enviados)."""
 
-    @field_validator("shopify_ids", mode="before")
-    @classmethod
-    def _norm_shopify(cls, v: Any):
-        if v is None:
-            return v
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",") if x.strip()]
-        return [int(x) for x in list(v) if str(x).strip().isdigit()]
+    recorrencia: str | None = Field(None, description="anual | bianual | trianual | mensal | bimestral")
+    periodicidade: Periodicidade | None = Field(None, description="'mensal' | 'bimestral'")
 
-    @field_validator("periodicidade")
+    # só normaliza a grafia; o Literal confere o valor no próprio pydantic-core
+    @field_validator("periodicidade", mode="before")
     @classmethod
-    def _chk_per(cls, v: str | None) -> str | None:
-        if v is None:
-            return v
-        per = (v or "").strip().lower()
-        if per not in ("mensal", "bimestral"):
-            raise ValueError("periodicidade deve ser 'mensal' ou 'bimestral'")
-        return per
+    def _norm_per(cls, v: Any) -> Any:
+        return v.strip().lower() if isinstance(v, str) else v
 
 
-class ComboPatch(BaseModel):
+class ComboPatch(_PatchBase):
     """Atualização parcial de um combo (aplica apenas campos enviados)."""
 
     composto_de: list[str] | None = None
-    guru_ids: list[str] | None = None
-    shopify_ids: list[int] | None = None
-    preco_fallback: float | None = Field(None, ge=0)
-    indisponivel: bool | None = None
-    peso: float | None = Field(None, ge=0)
 
-    @field_validator("composto_de", "guru_ids", mode="before")
+    @field_validator("composto_de", mode="before")
     @classmethod
-    def _norm_list(cls, v: Any):
-        if v is None:
-            return v
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",")]
-        return [str(x).strip() for x in list(v) if str(x).strip()]
+    def _norm_composto(cls, v: Any) -> list[str] | None:
+        return None if v is None else normalizar_ids_str(v)
 
-    @field_validator("shopify_ids", mode="before")
-    @classmethod
-    def _norm_shopify(cls, v: Any):
-        if v is None:
-            return v
-        if isinstance(v, str):
-            v = [x.strip() for x in v.split(",") if x.strip()]
-        return [int(x) for x in list(v) if str(x).strip().isdigit()]
+
+# schema de PATCH por tipo do item (fallback: ProdutoPatch)
+PATCH_MODELS: dict[str, type[BaseModel]] = {
+    "produto": ProdutoPatch,
+    "combo": ComboPatch,
+    "assinatura": AssinaturaPatch,
+}
 
 
 # =========================
@@ -325,3 +258,26 @@ class IdStrIn(BaseModel):
 
 class IdIntIn(BaseModel):
     id: int = Field(..., description="ID inteiro para adicionar/remover (ex.: Shopify ID)")
+
+
+class IdsBulk(BaseModel):
+    """
+    Alterações em lote nos IDs de um item (PATCH /catalogo/{sku}/ids): uma única
+    leitura/gravação do `skus.json` para qualquer quantidade de IDs.
+    Remoções são aplicadas depois das adições.
+    """
+
+    add_guru: list[str] = Field(default_factory=list, description="Guru IDs a adicionar")
+    remove_guru: list[str] = Field(default_factory=list, description="Guru IDs a remover")
+    add_shopify: list[int] = Field(default_factory=list, description="Shopify IDs a adicionar")
+    remove_shopify: list[int] = Field(default_factory=list, description="Shopify IDs a remover")
+
+    @field_validator("add_guru", "remove_guru", mode="before")
+    @classmethod
+    def _norm_guru(cls, v: Any) -> list[str]:
+        return normalizar_ids_str(v)
+
+    @field_validator("add_shopify", "remove_shopify", mode="before")
+    @classmethod
+    def _norm_shopify(cls, v: Any) -> list[int]:
+        return normalizar_ids_int(v)
@@ -0,0 +1,48 @@
+# app/services/_json_cache.py
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+# path -> (mtime_ns, size, conteúdo parseado)
+_CACHE: dict[Path, tuple[int, int, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def load_json_cached(path: Path) -> Any:
+    """
+    Lê e parseia um JSON, reaproveitando o resultado enquanto o arquivo não mudar
+    (chave = mtime_ns + tamanho). Edições no arquivo — pelo próprio app ou externas —
+    são vistas na chamada seguinte, sem precisar reiniciar o processo.
+
+    O objeto retornado é COMPARTILHADO entre chamadas: quem precisar alterá-lo deve copiar antes.
+    Levanta FileNotFoundError se o arquivo não existir.
+    """
+    st = path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _CACHE.get(path)
+    if cached is not None and cached[:2] == key:
+        return cached[2]
+
+    data = orjson.loads(path.read_bytes())
+    with _LOCK:
+        _CACHE[path] = (key[0], key[1], data)
+    return data
+
+
+def invalidate_json_cache(path: Path | None = None) -> None:
+    """
+    Descarta o cache de um arquivo (ou de todos). Útil logo após gravar o arquivo,
+    para não depender da resolução do mtime do sistema de arquivos.
+    """
+    with _LOCK:
+        if path is None:
+            _CACHE.clear()
+        else:
+            _CACHE.pop(path, None)
+
+
+__all__ = ["invalidate_json_cache", "load_json_cached"]
@@ -0,0 +1,55 @@
+# app/services/_skus_cache.py
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, cast
+
+from app.services._json_cache import load_json_cached
+from app.utils.sku import normalizar_ids_int
+
+# raiz do repo → skus.json
+SKUS_PATH = Path(__file__).resolve().parents[2] / "skus.json"
+
+# path -> último objeto parseado já normalizado (a normalização roda uma vez por parse)
+_NORMALIZADOS: dict[Path, object] = {}
+_LOCK = threading.Lock()
+
+
+def _normalizar(data: dict[str, Any]) -> None:
+    """
+    Normaliza tipos uma única vez, no load: `sku` sempre str e `shopify_ids` sempre lista de int
+    (valores não numéricos são descartados, como em `normalizar_ids_int`). Assim os consumidores
+    comparam e ordenam direto, sem `str(...)`/`int(...)` a cada request.
+    """
+    for info in data.values():
+        if not isinstance(info, dict):
+            continue
+        info["sku"] = str(info.get("sku") or "")
+        sids = info.get("shopify_ids")
+        if sids:
+            info["shopify_ids"] = normalizar_ids_int(sids)
+
+
+def carregar_skus_cache(path: Path = SKUS_PATH) -> dict[str, dict[str, Any]]:
+    """
+    Única leitura do skus.json usada pelos loaders (`loader_main.carregar_skus`,
+    `loader_produtos_info.load_skus_info`/`load_skus` e `loader_catalogo.carregar_skus`):
+    parse via orjson, cacheado por mtime/tamanho, mesmo objeto para todos enquanto o arquivo não mudar.
+    Cada novo parse é normalizado uma vez (`sku` → str, `shopify_ids` → int).
+
+    O dict é COMPARTILHADO: não altere in-place (copie antes, como faz o `loader_catalogo`).
+    Levanta FileNotFoundError se o arquivo não existir e ValueError se a raiz não for objeto.
+    """
+    data = load_json_cached(path)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path.name} inválido (raiz não é objeto)")
+    if _NORMALIZADOS.get(path) is not data:
+        with _LOCK:
+            if _NORMALIZADOS.get(path) is not data:
+                _normalizar(data)
+                _NORMALIZADOS[path] = data
+    return cast(dict[str, dict[str, Any]], data)
+
+
+__all__ = ["SKUS_PATH", "carregar_skus_cache"]
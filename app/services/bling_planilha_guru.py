@@ -17,6 +17,15 @@ from app.services.loader_produtos_info import SKUInfo, SKUs, produto_indisponive
 
 UTC = dt.UTC
 
+# singular → chave da contagem por tipo de plano
+_ALIASES_TIPO_PLANO = {
+    "anual": "anuais",
+    "bianual": "bianuais",
+    "trianual": "trianuais",
+    "bimestral": "bimestrais",
+    "mensal": "mensais",
+}
+
 
 def formatar_valor(valor: float) -> str:
     return f"{valor:.2f}".replace(".", ",")
@@ -314,14 +323,7 @@ def montar_planilha_vendas_guru(
         t = (tp or "").strip().lower()
         if t in contagem:
             return t
-        aliases = {
-            "anual": "anuais",
-            "bianual": "bianuais",
-            "trianual": "trianuais",
-            "bimestral": "bimestrais",
-            "mensal": "mensais",
-        }
-        return aliases.get(t, "bimestrais")
+        return _ALIASES_TIPO_PLANO.get(t, "bimestrais")
 
     def _flag_indisp(nome: str, sku: str | None = None) -> str:
         try:
@@ -488,6 +490,8 @@ def montar_planilha_vendas_guru(
         grupo_ordenado = sorted(grupo_transacoes, key=safe_parse_date)
         transacao_base = grupo_ordenado[-1]
         tipo_plano = str(transacao_base.get("tipo_assinatura", "bimestrais"))
+        # contadores do tipo resolvidos uma vez por assinatura (não a cada incremento)
+        contagem_tipo = contagem[_ckey(tipo_plano)]
 
         transacoes_principais = [t for t in grupo_ordenado if is_transacao_principal(t, ids_planos_validos)]
         produtos_distintos = {t.get("product", {}).get("internal_id") for t in transacoes_principais}
@@ -537,7 +541,7 @@ def montar_planilha_vendas_guru(
             coupon = payment_base.get("coupon") or {}
             cupom_usado = (coupon.get("coupon_code") or "").strip()
             if valores.get("usou_cupom"):
-                contagem[_ckey(tipo_plano)]["cupons"] += 1
+                contagem_tipo["cupons"] += 1
 
             # linha principal (dedupe = transaction_id)
             contact = transacao.get("contact", {})
@@ -644,9 +648,9 @@ def montar_planilha_vendas_guru(
                 elif tid:
                     le["dedup_id"] = tid
                 linhas_planilha.append(le)
-                contagem[_ckey(tipo_plano)]["embutidos"] += 1
+                contagem_tipo["embutidos"] += 1
 
-            contagem[_ckey(tipo_plano)]["assinaturas"] += 1
+            contagem_tipo["assinaturas"] += 1
 
         except Exception as e:
             print(f"[❌ ERRO] Transação {transacao.get('id')}: {e}")
@@ -910,7 +914,7 @@ def calcular_valores_pedidos(
 
         if prod_custom and prod_custom in skus_info:
             produto_principal = cast(str, prod_custom)
-            info_produto = skus_info.setdefault(produto_principal, {})
+            info_produto = cast(SKUInfo, skus_info[produto_principal])
             sku_principal = str(info_produto.get("sku", "") or "")
             peso_principal = cast(float | int, info_produto.get("peso", 0))
 
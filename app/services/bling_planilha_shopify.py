@@ -6,9 +6,10 @@ from typing import Any
 
 from app.services.shopify_ajuste_endereco import (
     _limpa_cep,
-    normalizar_endereco_unico,
+    normalizar_enderecos_em_lote,
     obter_bairros_por_cep,
     parse_enderecos,
+    resolver_ceps,
 )
 from app.services.shopify_client import _coletar_remaining_lineitems
 from app.utils.utils_helpers import normalizar_order_id
@@ -193,25 +194,50 @@ def enriquecer_bairros_nas_linhas(
                     l["Bairro Comprador"] = bx
 
 
+def pre_resolver_ceps_das_linhas(linhas: list[dict[str, Any]], *, timeout: int = 5) -> None:
+    """
+    Resolve num lote só (paralelo, via `resolver_ceps`) os CEPs que `enriquecer_enderecos_nas_linhas`
+    e `enriquecer_bairros_nas_linhas` vão consultar — Entrega e Comprador das linhas sem número
+    ou sem bairro. Os dois passos depois só leem o cache, em vez de cada um esperar o seu lote.
+    """
+    ceps: list[Any] = []
+    for l in linhas:
+        sem_numero = not (l.get("Número Entrega") or l.get("Número Comprador"))
+        sem_endereco = not (l.get("Endereço Entrega") or l.get("Endereço Comprador"))
+        if sem_numero or sem_endereco or not str(l.get("Bairro Entrega", "")).strip():
+            ceps.append(l.get("CEP Entrega") or l.get("CEP Comprador"))
+        if not str(l.get("Bairro Comprador", "")).strip():
+            ceps.append(l.get("CEP Comprador"))
+    resolver_ceps(ceps, timeout=timeout)
+
+
 def enriquecer_enderecos_nas_linhas(
     linhas: list[dict[str, Any]],
     *,
     ai_provider: Callable[[str], Any] | None = None,
 ) -> None:
+    pendentes: list[dict[str, Any]] = []
+    itens: list[dict[str, str]] = []
     for l in linhas:
         address1 = str(l.get("Endereço Entrega") or l.get("Endereço Comprador") or "")
-        address2 = str(l.get("Complemento Entrega") or l.get("Complemento Comprador") or "")
         numero_existente = str(l.get("Número Entrega") or l.get("Número Comprador") or "")
         if numero_existente and address1:
             continue
-        cep = str(l.get("CEP Entrega") or l.get("CEP Comprador") or "")
-        res = normalizar_endereco_unico(
-            order_id=str(l.get("transaction_id", "")),
-            address1=address1,
-            address2=address2,
-            cep=cep,
-            ai_provider=ai_provider,
+        pendentes.append(l)
+        itens.append(
+            {
+                "order_id": str(l.get("transaction_id", "")),
+                "address1": address1,
+                "address2": str(l.get("Complemento Entrega") or l.get("Complemento Comprador") or ""),
+                "cep": str(l.get("CEP Entrega") or l.get("CEP Comprador") or ""),
+            }
         )
+    if not pendentes:
+        return
+
+    # um passe só: CEPs únicos resolvidos uma vez para o lote inteiro
+    resultados = normalizar_enderecos_em_lote(itens, ai_provider=ai_provider)
+    for l, res in zip(pendentes, resultados, strict=True):
         l["Endereço Comprador"] = res["endereco_base"]
         l["Número Comprador"] = res["numero"]
         l["Complemento Comprador"] = res["complemento"]
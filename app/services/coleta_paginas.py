@@ -0,0 +1,182 @@
+# app/services/coleta_paginas.py
+from __future__ import annotations
+
+import base64
+import binascii
+import contextlib
+import re
+import secrets
+import threading
+import time
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from app.common.jsonutil import dumps_json, gravar_atomico
+from app.common.settings import settings
+
+# ------------------------------------------------------------------
+# Paginação por cursor das coletas do Guru
+# ------------------------------------------------------------------
+# A coleta em si precisa rodar inteira (contagem + persistência na planilha dependem de todas
+# as linhas), mas a resposta pode ser servida em páginas: a 1ª página sai junto da coleta e o
+# restante fica num snapshot em disco, lido por cursor em O(limit) sem refazer a coleta.
+#
+# O snapshot fica em arquivo (e não num dict do processo) para valer entre workers do uvicorn:
+# a memória é paga uma vez e qualquer worker atende o cursor. Por coleta:
+#   <id>.ndjson → uma linha JSON por item
+#   <id>.idx    → offsets (int64) do início de cada linha + fim do arquivo → leitura por faixa de bytes
+#   <id>.meta   → {"expira_em", "total", "cabecalho"}; gravado por último (presença = snapshot completo)
+
+COLETA_TTL_S = 15 * 60
+COLETA_MAX_BUFFERS = 16
+
+# criado só na primeira gravação (`gravar_atomico` cria o diretório)
+_BASE = settings.VAR_DIR / "coletas"
+
+_RE_COLETA_ID = re.compile(r"^[A-Za-z0-9_-]{12}$")  # secrets.token_urlsafe(9)
+_SUFIXOS = (".meta", ".idx", ".ndjson")
+_LOCK = threading.Lock()
+
+
+def encode_cursor(coleta_id: str, offset: int) -> str:
+    raw = orjson.dumps({"coleta_id": coleta_id, "offset": offset})
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Levanta ValueError se o cursor estiver malformado."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = orjson.loads(raw)
+        coleta_id, offset = data["coleta_id"], data["offset"]
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError("cursor inválido") from e
+    if not isinstance(coleta_id, str) or not _RE_COLETA_ID.match(coleta_id):
+        raise ValueError("cursor inválido")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("cursor inválido")
+    return coleta_id, offset
+
+
+# --------- snapshot em disco ---------
+def _path(coleta_id: str, sufixo: str) -> Path:
+    return _BASE / f"{coleta_id}{sufixo}"
+
+
+def _remover(coleta_id: str) -> None:
+    for sufixo in _SUFIXOS:
+        with contextlib.suppress(FileNotFoundError):
+            _path(coleta_id, sufixo).unlink()
+
+
+def _ler_meta(coleta_id: str) -> dict[str, Any] | None:
+    try:
+        meta: dict[str, Any] = orjson.loads(_path(coleta_id, ".meta").read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+    return meta
+
+
+def _expirar(agora: float) -> None:
+    """Remove snapshots vencidos e mantém só os `COLETA_MAX_BUFFERS` mais recentes."""
+    vivos: list[tuple[float, str]] = []
+    for p in _BASE.glob("*.meta"):
+        meta = _ler_meta(p.stem)
+        if meta is None or float(meta.get("expira_em", 0)) <= agora:
+            _remover(p.stem)
+        else:
+            vivos.append((float(meta["expira_em"]), p.stem))
+    vivos.sort()
+    for _, cid in vivos[: max(len(vivos) - COLETA_MAX_BUFFERS, 0)]:
+        _remover(cid)
+
+
+def _guardar(linhas: list[Any], cabecalho: Mapping[str, Any]) -> str:
+    coleta_id = secrets.token_urlsafe(9)
+    corpo = [dumps_json(linha, orjson.OPT_APPEND_NEWLINE) for linha in linhas]
+    offsets = array("q", [0])
+    for b in corpo:
+        offsets.append(offsets[-1] + len(b))
+    agora = time.time()
+    meta = {"expira_em": agora + COLETA_TTL_S, "total": len(linhas), "cabecalho": cabecalho}
+    with _LOCK:
+        _expirar(agora)
+        gravar_atomico(_path(coleta_id, ".ndjson"), corpo)
+        gravar_atomico(_path(coleta_id, ".idx"), [offsets.tobytes()])
+        gravar_atomico(_path(coleta_id, ".meta"), [dumps_json(meta)])
+    return coleta_id
+
+
+def _ler_linhas(coleta_id: str, inicio: int, fim: int) -> list[Any]:
+    """Lê só a faixa de bytes das linhas [inicio, fim) usando o índice de offsets."""
+    offsets = array("q")
+    with _path(coleta_id, ".idx").open("rb") as f:
+        offsets.frombytes(f.read())
+    fim = min(fim, len(offsets) - 1)
+    if inicio >= fim:
+        return []
+    with _path(coleta_id, ".ndjson").open("rb") as f:
+        f.seek(offsets[inicio])
+        bloco = f.read(offsets[fim] - offsets[inicio])
+    return [orjson.loads(linha) for linha in bloco.splitlines()]
+
+
+# --------- páginas ---------
+def _montar_pagina(
+    coleta_id: str, linhas: list[Any], cabecalho: Mapping[str, Any], fim: int, total: int
+) -> dict[str, Any]:
+    return {
+        "linhas": linhas,
+        **cabecalho,
+        "next_cursor": encode_cursor(coleta_id, fim) if fim < total else None,
+    }
+
+
+def primeira_pagina(linhas: list[Any], cabecalho: dict[str, Any], limit: int) -> dict[str, Any]:
+    """
+    Devolve as `limit` primeiras linhas + `cabecalho` + `next_cursor`.
+    Só grava o snapshot se houver próxima página (I/O em disco: chame fora do event loop).
+    """
+    if len(linhas) <= limit:
+        return {"linhas": linhas, **cabecalho, "next_cursor": None}
+    return _montar_pagina(_guardar(linhas, cabecalho), linhas[:limit], cabecalho, limit, len(linhas))
+
+
+def etag_pagina(cursor: str, limit: int) -> str:
+    """
+    ETag de uma página: o snapshot é imutável, então (coleta, offset, limit) identifica o
+    conteúdo — dá para responder 304 sem ler o disco. Levanta ValueError se o cursor for inválido.
+    """
+    coleta_id, offset = decode_cursor(cursor)
+    return f'"{coleta_id}.{offset}.{limit}"'
+
+
+def proxima_pagina(cursor: str, limit: int) -> dict[str, Any]:
+    """
+    Página seguinte de uma coleta já executada (de qualquer worker).
+    Levanta ValueError (cursor malformado) ou KeyError (coleta expirada/desconhecida).
+    """
+    coleta_id, offset = decode_cursor(cursor)
+    meta = _ler_meta(coleta_id)
+    if meta is None or float(meta.get("expira_em", 0)) <= time.time():
+        raise KeyError(coleta_id)
+    try:
+        linhas = _ler_linhas(coleta_id, offset, offset + limit)
+    except FileNotFoundError as e:  # removido por outro worker entre a leitura do meta e a dos dados
+        raise KeyError(coleta_id) from e
+    return _montar_pagina(coleta_id, linhas, meta["cabecalho"], offset + limit, int(meta["total"]))
+
+
+__all__ = [
+    "COLETA_MAX_BUFFERS",
+    "COLETA_TTL_S",
+    "decode_cursor",
+    "encode_cursor",
+    "etag_pagina",
+    "primeira_pagina",
+    "proxima_pagina",
+]
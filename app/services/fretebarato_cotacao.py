@@ -21,7 +21,7 @@ from app.schemas.fretebarato_cotacao import (
 # --------------------------------------------------------------------
 try:
     # Ideal: um módulo compartilhado atualizado pela rota de coleta
-    from app.services.coletas_cache import get_planilha_atual  # type: ignore[attr-defined]
+    from app.services.coletas_cache import get_planilha_atual, has_planilha  # type: ignore[attr-defined]
 except Exception:
     _PLANILHA_CACHE: list[dict[str, Any]] = []
     _META: dict[str, Any] = {}
@@ -29,6 +29,10 @@ except Exception:
     def get_planilha_atual() -> tuple[list[dict[str, Any]], dict[str, Any]]:
         return _PLANILHA_CACHE, _META
 
+    def has_planilha() -> bool:
+        """Há snapshot disponível? (checagem barata, sem materializar/copiar as linhas)"""
+        return bool(_PLANILHA_CACHE)
+
 
 # Loader de SKUs (peso/preço fallback) — se existir
 try:
@@ -40,8 +44,12 @@ except Exception:
 # ---------------------------
 # Helpers
 # ---------------------------
+_NAO_DIGITO = re.compile(r"\D")
+_NUMERO_RE = re.compile(r"\b(\d{1,6}[A-Za-z]?)\b")
+
+
 def _digits(s: str | None) -> str:
-    return re.sub(r"\D", "", s or "")
+    return _NAO_DIGITO.sub("", s or "")
 
 
 def _norm_email(s: str | None) -> str:
@@ -51,7 +59,7 @@ def _norm_email(s: str | None) -> str:
 def _norm_numero(s: str | None) -> str:
     """Extrai número com opcional 1 letra (ex.: 1500A)."""
     s = (s or "").strip()
-    m = re.search(r"\b(\d{1,6}[A-Za-z]?)\b", s)
+    m = _NUMERO_RE.search(s)
     return (m.group(1) if m else "").upper()
 
 
@@ -141,29 +149,22 @@ def cotar_fretes_auto(req: CotarFretesAutoRequest) -> CotarFretesResponse:
         # Sem snapshot disponível → 409/412 seria ok no router; aqui só retornamos vazio
         return CotarFretesResponse(ok=True, resultados=[], total_lotes=0, total_com_frete=0)
 
-    # 1) normaliza entradas e monta um conjunto de (email, cep8, numero)
-    entradas_norm = {
-        (_norm_email(e.email), _digits(e.cep).zfill(8), _norm_numero(e.numero_entrega)) for e in req.entradas
-    }
+    # 1) monta o conjunto de (email, cep8, numero) das entradas (cep já vem com 8 dígitos do schema)
+    entradas_norm = {(_norm_email(e.email), e.cep, _norm_numero(e.numero_entrega)) for e in req.entradas}
+
+    selecionadas_set = {s.value for s in req.selecionadas}
 
-    # 2) filtra linhas que batem com QUALQUER das entradas
+    # 2+3) filtra as linhas que batem com QUALQUER das entradas e já agrupa por (email, cep8)
+    #      → id_lote L0001, L0002... Num passe só: cada linha da planilha é normalizada uma vez.
     # colunas esperadas na planilha (desktop/serviço):
     #   "E-mail Comprador", "CEP Entrega", "Número Entrega", "SKU", "Valor Total", ...
-    selecionadas_set = {s.value for s in req.selecionadas}
-    linhas_match: list[dict[str, Any]] = []
+    grupos: dict[tuple[str, str], list[dict[str, Any]]] = defaultdict(list)
     for row in linhas:
         email = _norm_email(row.get("E-mail Comprador") or row.get("Email") or "")
         cep8 = _digits(row.get("CEP Entrega") or row.get("CEP") or "").zfill(8)
         numero = _norm_numero(row.get("Número Entrega") or row.get("Numero") or row.get("address2") or "")
         if (email, cep8, numero) in entradas_norm:
-            linhas_match.append(row)
-
-    # 3) agrupa por (email, cep8) → id_lote L0001, L0002...
-    grupos: dict[tuple[str, str], list[dict[str, Any]]] = defaultdict(list)
-    for row in linhas_match:
-        email = _norm_email(row.get("E-mail Comprador") or row.get("Email") or "")
-        cep8 = _digits(row.get("CEP Entrega") or row.get("CEP") or "").zfill(8)
-        grupos[(email, cep8)].append(row)
+            grupos[(email, cep8)].append(row)
 
     # 4) carrega catálogo de SKUs (peso/preço fallback) se existir
     skus_info = None
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import io
-from typing import Any
+from collections.abc import Iterator
+from typing import Any, BinaryIO
 
 import pandas as pd
 
-from app.services.loader_produtos_info import get_produto_info, is_indisponivel, load_skus
+from app.services.loader_main import sku_para_nome
+from app.services.loader_produtos_info import get_produto_info, is_indisponivel
 from app.services.loader_regras_assinaturas import (
     TABELA_VALORES,
     divisor_para,
@@ -15,28 +17,43 @@ from app.services.loader_regras_assinaturas import (
 )
 from app.utils.utils_helpers import limpar, parse_money
 
+# linhas por bloco na leitura do CSV (limita o pico de memória em exportações grandes)
+CSV_CHUNK_ROWS = 10_000
 
-def importar(file_bytes: bytes, filename: str, sku: str) -> dict[str, Any]:
-    info = get_produto_info(sku)
-    if not info:
-        raise ValueError(f"SKU '{sku}' não encontrado no skus.json")
-    produto_nome = next((nome for nome, i in load_skus().items() if i.get("sku") == sku), sku)
-    buf = io.BytesIO(file_bytes)
-    fname = (filename or "").lower()
 
+def _ler_planilha(fonte: bytes | BinaryIO, fname: str) -> Iterator[pd.DataFrame]:
+    """Lê a planilha em blocos de DataFrame (CSV em chunks; XLSX de uma vez, via openpyxl)."""
+    buf = io.BytesIO(fonte) if isinstance(fonte, bytes | bytearray) else fonte
     try:
         if fname.endswith(".csv"):
-            df = pd.read_csv(buf, sep=";", encoding="utf-8", quotechar='"', dtype=str)
+            yield from pd.read_csv(buf, sep=";", encoding="utf-8", quotechar='"', dtype=str, chunksize=CSV_CHUNK_ROWS)
         elif fname.endswith(".xlsx"):
-            df = pd.read_excel(buf)  # requer openpyxl
+            yield pd.read_excel(buf)  # requer openpyxl
         else:
             raise ValueError("Extensão não suportada (use .csv ou .xlsx)")
     except Exception as e:
         raise ValueError(f"Erro ao carregar planilha: {e}") from e
 
+
+def importar(fonte: bytes | BinaryIO, filename: str, sku: str) -> dict[str, Any]:
+    """
+    Importa a planilha do Guru. `fonte` pode ser os bytes do arquivo ou um file-like binário
+    (ex.: `UploadFile.file`), lido em blocos sem materializar tudo em memória.
+    """
+    info = get_produto_info(sku)
+    if not info:
+        raise ValueError(f"SKU '{sku}' não encontrado no skus.json")
+    produto_nome = sku_para_nome().get(sku, sku)
+    fname = (filename or "").lower()
+
     registros: list[dict[str, Any]] = []
+    # constantes do lote inteiro: calculadas uma vez, não por linha
+    hoje = pd.Timestamp.today().strftime("%d/%m/%Y")
+    indisponivel = "S" if is_indisponivel(sku) else ""
 
-    for _, linha in df.iterrows():
+    # dicts simples por linha (to_dict) em vez de uma pd.Series por linha (iterrows)
+    linhas = (linha for df in _ler_planilha(fonte, fname) for linha in df.to_dict("records"))
+    for linha in linhas:
         if pd.isna(linha.get("email contato")) and pd.isna(linha.get("nome contato")):
             continue
 
@@ -73,14 +90,14 @@ def importar(file_bytes: bytes, filename: str, sku: str) -> dict[str, Any]:
         try:
             data_pedido = pd.to_datetime(data_pedido_raw, dayfirst=True).strftime("%d/%m/%Y")
         except Exception:
-            data_pedido = pd.Timestamp.today().strftime("%d/%m/%Y")
+            data_pedido = hoje
 
         registros.append(
             {
                 "Número pedido": "",
                 "Nome Comprador": limpar(linha.get("nome contato")),
                 "Data Pedido": data_pedido,
-                "Data": pd.Timestamp.today().strftime("%d/%m/%Y"),
+                "Data": hoje,
                 "CPF/CNPJ Comprador": cpf,
                 "Endereço Comprador": limpar(linha.get("logradouro contato")),
                 "Bairro Comprador": limpar(linha.get("bairro contato")),
@@ -120,7 +137,7 @@ def importar(file_bytes: bytes, filename: str, sku: str) -> dict[str, Any]:
                 "Forma Pagamento": limpar(linha.get("pagamento")),
                 "ID Forma Pagamento": "",
                 "transaction_id": limpar(linha.get("id transação")),
-                "indisponivel": "S" if is_indisponivel(sku) else "",
+                "indisponivel": indisponivel,
                 "periodicidade": periodicidade,
                 "Plano Assinatura": tipo_ass if is_assin else "",
                 "assinatura_codigo": assinatura_codigo,
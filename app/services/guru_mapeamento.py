@@ -1,16 +1,11 @@
 # app/services/guru_mapeamento.py
 from __future__ import annotations
 
-import json
-import os
-import tempfile
-from collections.abc import Mapping, Sequence
-from pathlib import Path
+from collections.abc import Sequence
 from typing import Any, TypedDict, cast
 
-from app.services.loader_produtos_info import load_skus
-
-SKUS_PATH = Path(__file__).resolve().parents[2] / "skus.json"
+# mesma leitura (cache por mtime + gravação pendente) e gravação atômica do catálogo
+from app.services.loader_catalogo import SKUS_PATH, carregar_skus, salvar_skus
 
 
 class MapearIn(TypedDict, total=False):
@@ -30,21 +25,6 @@ class MapearOut(TypedDict, total=False):
     message: str
 
 
-def _write_json_atomic(path: Path, data: Mapping[str, Any]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    fd, tmp = tempfile.mkstemp(prefix=path.name, dir=str(path.parent))
-    try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        os.replace(tmp, path)  # atomic on Windows/Unix
-    finally:
-        if os.path.exists(tmp):
-            try:
-                os.remove(tmp)
-            except OSError:
-                pass
-
-
 def mapear_produtos_guru(req: MapearIn) -> MapearOut:
     sku = (req.get("sku") or "").strip()
     tipo = (req.get("tipo") or "").strip().lower()
@@ -59,7 +39,7 @@ def mapear_produtos_guru(req: MapearIn) -> MapearOut:
         if not (req.get("recorrencia") and req.get("periodicidade")):
             raise ValueError("Para 'assinatura', informe 'recorrencia' e 'periodicidade'.")
 
-    skus_info: dict[str, Any] = dict(load_skus())  # snapshot em memória
+    skus_info: dict[str, Any] = carregar_skus()  # cópia por item (o cache não é alterado)
 
     # cria/obtém entrada
     entrada: dict[str, Any] = cast(dict[str, Any], skus_info.setdefault(sku, {}))
@@ -82,14 +62,14 @@ def mapear_produtos_guru(req: MapearIn) -> MapearOut:
         entrada.pop("periodicidade", None)
 
     # atualiza guru_ids sem duplicar
-    entrada.setdefault("guru_ids", [])
+    entrada["guru_ids"] = list(entrada.get("guru_ids") or [])
     ja = {str(x).strip() for x in entrada["guru_ids"]}
     for gid in guru_ids_in:
         if gid not in ja:
             entrada["guru_ids"].append(gid)
             ja.add(gid)
 
-    _write_json_atomic(SKUS_PATH, skus_info)
+    salvar_skus(skus_info, SKUS_PATH)
 
     return {
         "sku": sku,
@@ -1,31 +1,28 @@
 # app/services/regras_service.py
 from __future__ import annotations
 
-import json
 from collections.abc import Mapping, MutableMapping, Sequence
 from pathlib import Path
 from typing import Any, cast
 from uuid import uuid4
 
+import orjson
 import requests
 
+from app.services._json_cache import invalidate_json_cache, load_json_cached
+
 # Reúso do cliente/constantes do Guru (sem UI)
 from app.services.guru_client import BASE_URL_GURU, HEADERS_GURU
 
 # ======================== I/O de regras (arquivo) ========================
 
 
-def carregar_regras(config_path: str | Path) -> list[dict[str, Any]]:
-    """
-    Lê a lista de regras do arquivo JSON (config_ofertas.json).
-    Se o arquivo não existir, retorna [].
-    """
-    p = Path(config_path)
+def _regras_compartilhadas(p: Path) -> list[dict[str, Any]]:
+    # lista de regras do objeto parseado em cache (compartilhada: não alterar)
     if not p.exists():
         return []
     try:
-        with p.open(encoding="utf-8") as f:
-            data = json.load(f)
+        data = load_json_cached(p)
     except Exception as e:
         raise ValueError(f"JSON inválido em {p}: {e}") from e
 
@@ -37,18 +34,65 @@ def carregar_regras(config_path: str | Path) -> list[dict[str, Any]]:
     return []
 
 
+def carregar_regras(config_path: str | Path) -> Sequence[Mapping[str, Any]]:
+    """
+    Lê a lista de regras do arquivo JSON (config_ofertas.json).
+    Se o arquivo não existir, retorna [].
+    O parse é cacheado por mtime/tamanho (mesmo cache do `loader_main.carregar_cfg`) e o retorno é
+    a lista COMPARTILHADA, somente leitura: para alterar, use `copiar_regras` antes.
+    """
+    return _regras_compartilhadas(Path(config_path))
+
+
+def copiar_regras(rules: Sequence[Mapping[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Cópia alterável da lista: nova lista e um dict novo por regra. Basta para as operações
+    deste módulo (add/edit/dup/del/move), que trocam regras inteiras sem mexer nos valores internos.
+    """
+    return [dict(r) for r in rules]
+
+
+# path -> (lista de regras de origem, índice id -> posição); refeito só quando o arquivo é reparseado
+_INDICES: dict[Path, tuple[object, dict[str, int]]] = {}
+
+
+def indexar_por_id(rules: Sequence[Mapping[str, Any]]) -> dict[str, int]:
+    """{id: posição} da lista de regras (ids vazios são ignorados; id repetido → 1ª ocorrência)."""
+    indice: dict[str, int] = {}
+    for i, r in enumerate(rules):
+        rid = str(r.get("id") or "")
+        if rid:
+            indice.setdefault(rid, i)
+    return indice
+
+
+def carregar_regras_indexadas(config_path: str | Path) -> tuple[Sequence[Mapping[str, Any]], dict[str, int]]:
+    """
+    Como `carregar_regras`, mas devolve também o índice `id -> posição` da mesma versão do arquivo,
+    para localizar regras em O(1). Lista e índice são compartilhados: não altere (copie com `copiar_regras`).
+    """
+    p = Path(config_path)
+    origem = _regras_compartilhadas(p)
+    cached = _INDICES.get(p)
+    if cached is None or cached[0] is not origem:
+        cached = (origem, indexar_por_id(origem))
+        _INDICES[p] = cached
+    return origem, cached[1]
+
+
 def salvar_regras(config_path: str | Path, rules: Sequence[Mapping[str, Any]]) -> None:
     """
     Persiste as regras no arquivo (formato { "rules": [...] }) de forma atômica.
+    Serializa com orjson num único buffer de bytes (UUID/datetime nativos).
     """
     p = Path(config_path)
     payload = {"rules": list(rules)}
     tmp = p.with_suffix(p.suffix + ".tmp")
     try:
         p.parent.mkdir(parents=True, exist_ok=True)
-        with tmp.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2, ensure_ascii=False)
+        tmp.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
         tmp.replace(p)  # operação atômica
+        invalidate_json_cache(p)
     finally:
         if tmp.exists():
             try:
@@ -117,7 +161,7 @@ def iniciar_gerenciador_regras_backend(
         print(f"[❌ Guru] Exceção ao buscar produtos: {e}")
         ctx["produtos_guru"] = []
 
-    ctx["rules"] = carregar_regras(config_path)
+    ctx["rules"] = copiar_regras(carregar_regras(config_path))
     ctx["config_path"] = str(config_path)
     # “estado” externo pode ser atualizado pelo chamador, mas não é obrigatório
     if isinstance(estado, dict):
@@ -161,7 +205,7 @@ def dup_regra(rules: list[dict[str, Any]], idx: int) -> list[dict[str, Any]]:
     """
     if not 0 <= idx < len(rules):
         raise IndexError("Índice de regra inválido")
-    copia = json.loads(json.dumps(rules[idx]))  # deep copy
+    copia = orjson.loads(orjson.dumps(rules[idx]))  # deep copy
     copia["id"] = gerar_uuid()
     rules.insert(idx + 1, copia)
     return rules
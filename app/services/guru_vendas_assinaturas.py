@@ -7,7 +7,6 @@ import calendar
 import datetime as dt
 
 # stdlib
-import json
 import os
 from collections.abc import Callable, Mapping, Sequence
 from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
@@ -16,8 +15,10 @@ from pathlib import Path
 from typing import Any, Protocol, TypedDict, cast
 
 # terceiros
+import orjson
 from unidecode import unidecode
 
+from app.common.logging_setup import submit_in_ctx
 from app.common.settings import settings
 from app.services.guru_client import LIMITE_INFERIOR, coletar_vendas_com_retry, dividir_periodos_coleta_api_guru
 from app.services.loader_produtos_info import produto_indisponivel
@@ -93,11 +94,10 @@ def ler_regras_assinaturas(config_path: str | None = None) -> list[dict[str, Any
             config_path = os.path.join(os.path.dirname(__file__), "config_ofertas.json")
         path = Path(config_path)
         if path.exists():
-            with path.open(encoding="utf-8") as f:
-                cfg: dict[str, Any] = json.load(f)
-                regras = cfg.get("rules") or cfg.get("regras") or []
-                if isinstance(regras, list):
-                    return regras
+            cfg: dict[str, Any] = orjson.loads(path.read_bytes())
+            regras = cfg.get("rules") or cfg.get("regras") or []
+            if isinstance(regras, list):
+                return regras
     except Exception:
         pass
     return []
@@ -236,7 +236,8 @@ def gerenciar_coleta_vendas_assinaturas(
         max_workers = min(getattr(settings, "GURU_MAX_CONCURRENCY", 4), len(tarefas))
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = [
-                executor.submit(
+                submit_in_ctx(
+                    executor,
                     coletar_vendas_com_retry,
                     pid,
                     ini,
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from typing import Any, cast
 
+from app.common.logging_setup import submit_in_ctx
+from app.common.settings import settings
+
 # primitives de coleta no Guru
 from app.services.guru_client import (
     LIMITE_INFERIOR,
@@ -161,22 +165,24 @@ def coletar_vendas_guru(
     if not blocos:
         return [], {}, dict(dados)
 
-    transacoes: list[dict[str, Any]] = []
-
-    # execução simples (sequencial). Se quiser, paralelize como em assinaturas.
-    for pid in produtos_ids:
-        for ini_iso, fim_iso in blocos:
-            try:
-                pagina = coletar_vendas(pid, ini_iso, fim_iso)
-                if pagina:
-                    transacoes.extend(pagina)
-            except TransientGuruError as e:
-                # aplica retry externo com backoff
-                pagina = coletar_vendas_com_retry(pid, ini_iso, fim_iso)
-                if pagina:
-                    transacoes.extend(pagina)
-                else:
-                    print(f"[⚠️] Produto {pid} sem dados após retries: {e}")
+    def _coletar_bloco(pid: str, ini_iso: str, fim_iso: str) -> list[dict[str, Any]]:
+        try:
+            return coletar_vendas(pid, ini_iso, fim_iso)
+        except TransientGuruError as e:
+            # aplica retry externo com backoff
+            pagina = coletar_vendas_com_retry(pid, ini_iso, fim_iso)
+            if not pagina:
+                print(f"[⚠️] Produto {pid} sem dados após retries: {e}")
+            return pagina
+
+    # (produto x bloco) em paralelo, como em assinaturas: cada tarefa pagina o cursor do Guru
+    # em sequência, mas as tarefas sobrepõem os round-trips (limitadas por GURU_MAX_CONCURRENCY)
+    tarefas = [(pid, ini_iso, fim_iso) for pid in produtos_ids for (ini_iso, fim_iso) in blocos]
+    max_workers = min(getattr(settings, "GURU_MAX_CONCURRENCY", 4), len(tarefas))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [submit_in_ctx(executor, _coletar_bloco, *tarefa) for tarefa in tarefas]
+        # resultados na ordem das tarefas (mesma ordem da coleta sequencial)
+        transacoes: list[dict[str, Any]] = [t for future in futures for t in future.result()]
 
     # 🔹 Padroniza dedupe no GURU: uma linha por 'transaction_id'
     for row in transacoes:
@@ -186,3 +192,18 @@ def coletar_vendas_guru(
             row.setdefault("dedup_id", tid)
 
     return transacoes, {}, dict(dados)
+
+
+def garantir_dedup_ids_produtos(linhas: list[dict[str, Any]]) -> None:
+    """
+    Garante 'dedup_id' em cada linha coletada de produtos (in-place):
+      - se já vier (ex.: combo desmembrado → transaction_id:SKU), preserva
+      - se não vier (linha principal), usa o transaction_id
+    Lança ValueError se alguma linha vier sem 'transaction_id' (dedup_id é obrigatório).
+    """
+    for r in linhas:
+        tid = str(r.get("transaction_id") or "").strip()
+        if not tid:
+            raise ValueError("Linha sem transaction_id; dedup_id é obrigatório.")
+        if not str(r.get("dedup_id") or "").strip():
+            r["dedup_id"] = tid
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
-import json
-from collections.abc import Mapping
+import asyncio
+import atexit
+import contextlib
+import logging
+import sys
+import threading
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
+import orjson
+
+from app.common.jsonutil import gravar_atomico
+from app.services._json_cache import invalidate_json_cache
+from app.services._skus_cache import SKUS_PATH, carregar_skus_cache
+
+if sys.platform != "win32":
+    import fcntl
+
 BASE_DIR = Path(__file__).resolve().parents[2]
-SKUS_PATH = BASE_DIR / "skus.json"
+
+logger = logging.getLogger(__name__)
 
 
 def gerar_chave_assinatura(nome: str, periodicidade: str) -> str:
@@ -20,12 +36,7 @@ def gerar_chave_assinatura(nome: str, periodicidade: str) -> str:
     return f"{nome.strip()} - {p}"
 
 
-def carregar_skus(path: str | Path = SKUS_PATH) -> dict[str, dict[str, Any]]:
-    p = Path(path)
-    if not p.exists():
-        return {}
-    with p.open(encoding="utf-8") as f:
-        data = json.load(f)
+def _copiar_skus(data: Any) -> dict[str, dict[str, Any]]:
     if not isinstance(data, dict):
         raise ValueError("skus.json inválido: conteúdo não é objeto")
     # força dict[str, dict]
@@ -36,17 +47,220 @@ def carregar_skus(path: str | Path = SKUS_PATH) -> dict[str, dict[str, Any]]:
     return out
 
 
+def carregar_skus(path: str | Path = SKUS_PATH) -> dict[str, dict[str, Any]]:
+    """
+    Lê o catálogo (cache por mtime) e devolve uma cópia rasa por item,
+    que os endpoints podem alterar livremente antes de `salvar_skus`.
+    """
+    p = Path(path)
+    pendente = _pendente_para(p)
+    if pendente is not None:
+        return _copiar_skus(pendente)
+    if not p.exists():
+        return {}
+    return _copiar_skus(carregar_skus_cache(p))
+
+
+# ----------------------------------------------------------------------
+# Índice reverso sku -> [nomes]
+# ----------------------------------------------------------------------
+# path -> (objeto parseado de origem, índice). O índice é refeito só quando o
+# _json_cache reparseia o arquivo (o objeto de origem deixa de ser o mesmo).
+_INDICES: dict[Path, tuple[object, dict[str, list[str]]]] = {}
+
+
+def _montar_indice_sku(data: Mapping[str, Any]) -> dict[str, list[str]]:
+    indice: dict[str, list[str]] = {}
+    for nome, info in data.items():
+        if not isinstance(info, Mapping):
+            continue
+        sku = info.get("sku")  # já normalizado para str no load
+        if sku:
+            indice.setdefault(sku, []).append(str(nome))
+    return indice
+
+
+def carregar_catalogo(path: str | Path = SKUS_PATH) -> tuple[dict[str, dict[str, Any]], dict[str, list[str]]]:
+    """
+    Como `carregar_skus`, mas devolve também o índice `sku -> [nomes]` da mesma versão
+    do arquivo, para resolver itens por SKU em O(1). O índice é compartilhado: não altere.
+    """
+    p = Path(path)
+    data = _pendente_para(p)
+    if data is None:
+        return _carregar_catalogo_arquivo(p)
+    return _copiar_skus(data), _indice_de(p, data)
+
+
+def _carregar_catalogo_arquivo(p: Path) -> tuple[dict[str, dict[str, Any]], dict[str, list[str]]]:
+    # ignora o estado pendente: o que está gravado agora no disco
+    if not p.exists():
+        return {}, {}
+    data = carregar_skus_cache(p)
+    return _copiar_skus(data), _indice_de(p, data)
+
+
+def _indice_de(p: Path, data: Any) -> dict[str, list[str]]:
+    cached = _INDICES.get(p)
+    if cached is None or cached[0] is not data:
+        cached = (data, _montar_indice_sku(data) if isinstance(data, Mapping) else {})
+        _INDICES[p] = cached
+    return cached[1]
+
+
 def salvar_skus(skus: Mapping[str, Mapping[str, Any]], path: str | Path = SKUS_PATH) -> None:
+    """
+    Gravação síncrona e atômica (tmp + fsync + os.replace): o arquivo nunca fica pela metade.
+    Descarta qualquer gravação agendada pendente do mesmo arquivo (esta é mais nova).
+    """
     p = Path(path)
+    with _DIRTY.lock:
+        if _DIRTY.path == p:
+            _DIRTY.pending = None
+            _DIRTY.mutacoes.clear()
+        with _trava_arquivo(p):
+            _gravar_atomico(skus, p)
+
+
+@contextlib.contextmanager
+def _trava_arquivo(p: Path) -> Iterator[None]:
+    """
+    Trava exclusiva entre processos (workers do uvicorn) em `<arquivo>.lock`, para que
+    ler-alterar-gravar o catálogo não sobrescreva a edição de outro worker.
+    No Windows não há `fcntl`: vale só o lock em memória (um processo).
+    """
+    if sys.platform == "win32":
+        yield
+        return
     p.parent.mkdir(parents=True, exist_ok=True)
-    tmp = p.with_suffix(p.suffix + ".tmp")
-    try:
-        with tmp.open("w", encoding="utf-8") as f:
-            json.dump(skus, f, indent=4, ensure_ascii=False)
-        tmp.replace(p)
-    finally:
-        if tmp.exists():
-            try:
-                tmp.unlink(missing_ok=True)
-            except Exception:
-                pass
+    with open(p.with_suffix(p.suffix + ".lock"), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _gravar_atomico(skus: Mapping[str, Mapping[str, Any]], p: Path) -> None:
+    gravar_atomico(p, orjson.dumps(skus, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    invalidate_json_cache(p)
+
+
+# ----------------------------------------------------------------------
+# Gravação agendada (coalesce rajadas de PATCH/POST/DELETE)
+# ----------------------------------------------------------------------
+FLUSH_INTERVAL_S = 0.25
+
+# recebe (cópia do catálogo, índice sku -> [nomes]) e altera o catálogo in-place
+type Mutacao[T] = Callable[[dict[str, dict[str, Any]], dict[str, list[str]]], T]
+
+
+@dataclass
+class DirtyState:
+    """Estado em memória ainda não gravado no `skus.json`."""
+
+    path: Path = SKUS_PATH
+    pending: dict[str, dict[str, Any]] | None = None
+    # (sku, mutação) já aplicadas em `pending`, reaplicadas sobre o arquivo atual no flush
+    mutacoes: list[tuple[str, Mutacao[Any]]] = field(default_factory=list)
+    flusher_ativo: bool = False
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    task: asyncio.Task[None] | None = None
+
+
+_DIRTY = DirtyState()
+
+
+def _pendente_para(p: Path) -> dict[str, dict[str, Any]] | None:
+    # leituras enxergam o que já foi agendado (read-your-writes), mesmo antes do flush
+    return _DIRTY.pending if _DIRTY.path == p else None
+
+
+def mutar_skus[T](fn: Mutacao[T], sku: str = "") -> tuple[dict[str, dict[str, Any]], T]:
+    """
+    Aplica `fn` ao estado MAIS RECENTE do catálogo (pendente ou arquivo), sob o lock:
+    mutações concorrentes não se sobrescrevem. Se `fn` levantar exceção, nada muda.
+    Devolve o catálogo resultante (não altere) e o retorno de `fn`. `sku` identifica o item
+    alterado nos logs, caso a mutação falhe ao ser reaplicada no flush.
+
+    Com o flusher ativo, várias mutações seguidas viram um único rewrite do arquivo
+    (flush a cada FLUSH_INTERVAL_S); sem flusher (CLI, scripts), grava na hora.
+    """
+    with _DIRTY.lock:
+        p = _DIRTY.path
+        if not _DIRTY.flusher_ativo:
+            with _trava_arquivo(p):
+                invalidate_json_cache(p)
+                skus, indice = _carregar_catalogo_arquivo(p)
+                resultado = fn(skus, indice)
+                _gravar_atomico(skus, p)
+            return skus, resultado
+        skus, indice = carregar_catalogo(p)
+        resultado = fn(skus, indice)
+        _DIRTY.mutacoes.append((sku, fn))
+        _DIRTY.pending = skus
+        return skus, resultado
+
+
+def flush_skus_pendentes() -> bool:
+    """
+    Grava o estado pendente, se houver. Retorna True se algo foi gravado.
+    As mutações são reaplicadas sobre o arquivo relido sob a trava entre processos,
+    preservando o que outro worker tenha gravado nesse meio-tempo.
+    """
+    with _DIRTY.lock:
+        if _DIRTY.pending is None:
+            return False
+        p = _DIRTY.path
+        with _trava_arquivo(p):
+            invalidate_json_cache(p)
+            skus, indice = _carregar_catalogo_arquivo(p)
+            for sku, fn in _DIRTY.mutacoes:
+                try:
+                    fn(skus, indice)
+                except Exception:
+                    # o cliente já recebeu 200: deixa rastro da escrita perdida (ex.: item removido por outro worker)
+                    logger.error("mutacao_catalogo_descartada", extra={"sku": sku}, exc_info=True)
+                    continue
+                indice = _montar_indice_sku(skus)
+            _gravar_atomico(skus, p)
+        _DIRTY.pending = None
+        _DIRTY.mutacoes.clear()
+        return True
+
+
+async def _loop_flush(intervalo: float) -> None:
+    while True:
+        await asyncio.sleep(intervalo)
+        if _DIRTY.pending is None:
+            continue
+        try:
+            await asyncio.to_thread(flush_skus_pendentes)
+        except Exception:
+            # erro de IO/lock não pode matar o flusher: o pendente fica e é tentado de novo na próxima volta
+            logger.exception("flush_skus_falhou", extra={"path": str(_DIRTY.path)})
+
+
+async def iniciar_flusher_skus(intervalo: float = FLUSH_INTERVAL_S) -> None:
+    """Inicia o flush periódico (chamar no startup do app)."""
+    with _DIRTY.lock:
+        if _DIRTY.task is not None and not _DIRTY.task.done():
+            return
+        _DIRTY.flusher_ativo = True
+        _DIRTY.task = asyncio.create_task(_loop_flush(intervalo))
+
+
+async def parar_flusher_skus() -> None:
+    """Para o flush periódico e grava o que estiver pendente (chamar no shutdown)."""
+    with _DIRTY.lock:
+        task, _DIRTY.task = _DIRTY.task, None
+        _DIRTY.flusher_ativo = False
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await asyncio.to_thread(flush_skus_pendentes)
+
+
+# garantia extra se o processo sair sem passar pelo shutdown do app
+atexit.register(flush_skus_pendentes)
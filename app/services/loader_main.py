@@ -1,12 +1,21 @@
 # app/services/loader_main.py
 from __future__ import annotations
 
-import json
+import contextlib
+import hashlib
+import os
+import pickle
+import sys
+from collections.abc import Mapping
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, cast
+from typing import Any, NamedTuple, cast
 
 from fastapi import HTTPException
 
+from app.services._json_cache import invalidate_json_cache, load_json_cached
+from app.services._skus_cache import SKUS_PATH, carregar_skus_cache
+
 # Reexports do domínio (NÃO duplicar aqui)
 from app.services.loader_produtos_info import (
     SKUInfo,
@@ -21,64 +30,188 @@ from app.services.loader_regras_assinaturas import (
     normalizar_rules,
 )
 
-# Cache simples (pode trocar a implementação em infra/cache.py depois)
-try:
-    from app.infra.cache import simple_cache
-except Exception:  # fallback sem infra
-    from functools import lru_cache as simple_cache  # type: ignore
-
-
 # ------------------------- caminhos padrão -------------------------
 BASE_DIR = Path(__file__).resolve().parents[2]  # raiz do projeto
-SKUS_PATH = BASE_DIR / "skus.json"
 CFG_PATH = BASE_DIR / "config_ofertas.json"
+# artefato pré-compilado das regras derivadas (ver `compilar_cfg` / `python -m app.tools.compile_cfg`)
+CFG_COMPILADO_PATH = BASE_DIR / "config_ofertas.compiled.pickle"
+_CFG_COMPILADO_VERSAO = 1
 
 
 # ------------------------- loaders de arquivo -------------------------
-@simple_cache(maxsize=1)
-def carregar_skus() -> dict[str, dict[str, Any]]:
+def carregar_skus() -> SKUs:
     """
     Carrega o skus.json da raiz do projeto.
-    Retorna dict[str, dict[str, Any]] (mesmo shape que você usa no app).
+    Cacheado por mtime/tamanho do arquivo (mesmo objeto de `load_skus`/`loader_catalogo`):
+    o dict é compartilhado, por isso é exposto como `Mapping` (somente leitura para o mypy).
+    Para alterar, use `loader_catalogo.carregar_skus`, que devolve uma cópia.
     """
     try:
-        with SKUS_PATH.open(encoding="utf-8") as f:
-            data = json.load(f)
-            return cast(dict[str, dict[str, Any]], data)
+        return carregar_skus_cache()
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=f"Arquivo não encontrado: {SKUS_PATH}") from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falha ao ler {SKUS_PATH.name}: {e!s}") from e
 
 
-@simple_cache(maxsize=1)
-def carregar_cfg() -> dict[str, Any]:
+# path -> (objeto de skus de origem, mapa sku -> nome); refeito só quando o skus.json é reparseado
+_SKU_PARA_NOME: dict[Path, tuple[object, dict[str, str]]] = {}
+
+
+def sku_para_nome() -> dict[str, str]:
+    """
+    Mapa `sku -> nome` (chave no skus.json) da versão atual do arquivo, para lookup O(1).
+    SKU repetido → primeiro nome (mesma ordem do arquivo). Compartilhado: não altere.
+    """
+    skus = carregar_skus()
+    cached = _SKU_PARA_NOME.get(SKUS_PATH)
+    if cached is None or cached[0] is not skus:
+        mapa: dict[str, str] = {}
+        for nome, info in skus.items():
+            sku = info.get("sku")
+            if sku:
+                mapa.setdefault(sku, nome)
+        cached = _SKU_PARA_NOME[SKUS_PATH] = (skus, mapa)
+    return cached[1]
+
+
+# skus.json -> (objeto parseado de origem, conjunto de SKUs em caixa alta); refeito quando o arquivo muda
+_SKUS_VALIDOS: dict[Path, tuple[object, frozenset[str]]] = {}
+
+
+def skus_validos() -> frozenset[str]:
+    """
+    SKUs conhecidos (caixa alta, internados) da versão atual do skus.json, para validar filtros
+    vindos na query em O(1) por token antes de chamar APIs externas. Compartilhado e imutável.
+    """
+    skus = carregar_skus()
+    cached = _SKUS_VALIDOS.get(SKUS_PATH)
+    if cached is None or cached[0] is not skus:
+        validos = frozenset(sys.intern(sku.upper()) for sku in sku_para_nome())
+        cached = _SKUS_VALIDOS[SKUS_PATH] = (skus, validos)
+    return cached[1]
+
+
+def carregar_cfg() -> Mapping[str, Any]:
     """
     Carrega o config_ofertas.json da raiz do projeto.
     Retorna dict com a chave "rules" (quando existir) + outros metadados que você guardar.
+    Cacheado por mtime/tamanho do arquivo: o dict é compartilhado, exposto como `Mapping` (somente leitura).
     """
     try:
-        with CFG_PATH.open(encoding="utf-8") as f:
-            return json.load(f)
+        return cast(Mapping[str, Any], load_json_cached(CFG_PATH))
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=f"Arquivo não encontrado: {CFG_PATH}") from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Falha ao ler {CFG_PATH.name}: {e!s}") from e
 
 
-# ------------------------- utilitário de cache-bust -------------------------
-def invalidar_cache_catalogo() -> None:
+# ------------------------- derivados das regras -------------------------
+class RegrasDerivadas(NamedTuple):
+    rules: list[dict[str, Any]]
+    ofertas_embutidas: dict[str, str]
+    cupons_cdf: dict[str, str]
+    cupons_bi_mens: dict[str, str]
+
+
+def _montar_regras_derivadas(cfg: Mapping[str, Any]) -> RegrasDerivadas:
+    cupons_cdf, cupons_bi_mens = montar_mapas_cupons(cfg)
+    return RegrasDerivadas(
+        rules=normalizar_rules(cfg),
+        ofertas_embutidas=montar_ofertas_embutidas(cfg),
+        cupons_cdf=cupons_cdf,
+        cupons_bi_mens=cupons_bi_mens,
+    )
+
+
+def _hash_cfg() -> str:
+    return hashlib.blake2b(CFG_PATH.read_bytes(), digest_size=16).hexdigest()
+
+
+def _ler_cfg_compilado(src_hash: str) -> RegrasDerivadas | None:
+    """Artefato compilado, se existir e tiver sido gerado a partir do conteúdo atual do JSON."""
+    try:
+        data = pickle.loads(CFG_COMPILADO_PATH.read_bytes())
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("versao") != _CFG_COMPILADO_VERSAO or data.get("src_hash") != src_hash:
+        return None
+    return RegrasDerivadas(*data["regras"])
+
+
+def _gravar_cfg_compilado(regras: RegrasDerivadas, src_hash: str) -> None:
+    tmp = CFG_COMPILADO_PATH.with_suffix(CFG_COMPILADO_PATH.suffix + ".tmp")
+    payload = {"versao": _CFG_COMPILADO_VERSAO, "src_hash": src_hash, "regras": tuple(regras)}
+    tmp.write_bytes(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+    os.replace(tmp, CFG_COMPILADO_PATH)
+
+
+def compilar_cfg() -> RegrasDerivadas:
     """
-    Invalida os caches de carregar_skus/carregar_cfg quando os arquivos forem atualizados em runtime.
+    Gera o artefato `config_ofertas.compiled.pickle` (regras normalizadas + mapas derivados),
+    amarrado ao hash do conteúdo do config_ofertas.json. Usado no build/deploy.
+    """
+    src_hash = _hash_cfg()
+    regras = _montar_regras_derivadas(carregar_cfg())
+    _gravar_cfg_compilado(regras, src_hash)
+    return regras
+
+
+@lru_cache(maxsize=1)
+def _derive_cfg(_mtime_ns: int, _size: int) -> RegrasDerivadas:
+    """
+    Monta (uma vez por versão do arquivo) as estruturas derivadas do config_ofertas.json.
+    Os argumentos são só a chave do cache: (mtime_ns, size) muda quando o arquivo é regravado
+    → recalcula; só a versão atual interessa, então a anterior é descartada (maxsize=1).
+    Usa o artefato compilado quando ele corresponde ao conteúdo atual; senão recalcula
+    e tenta regravá-lo (best-effort: diretório pode ser somente leitura).
     """
     try:
-        carregar_skus.cache_clear()  # type: ignore[attr-defined]
-    except Exception:
-        pass
+        src_hash = _hash_cfg()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=f"Arquivo não encontrado: {CFG_PATH}") from e
+    compilado = _ler_cfg_compilado(src_hash)
+    if compilado is not None:
+        return compilado
+    regras = _montar_regras_derivadas(carregar_cfg())
+    with contextlib.suppress(OSError):
+        _gravar_cfg_compilado(regras, src_hash)
+    return regras
+
+
+def carregar_regras_derivadas() -> RegrasDerivadas:
+    """
+    Regras normalizadas + mapas de ofertas embutidas e cupons, memoizados pela versão do
+    config_ofertas.json. Os objetos são compartilhados entre requests: não altere in-place.
+    """
     try:
-        carregar_cfg.cache_clear()  # type: ignore[attr-defined]
-    except Exception:
-        pass
+        st = CFG_PATH.stat()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=f"Arquivo não encontrado: {CFG_PATH}") from e
+    return _derive_cfg(st.st_mtime_ns, st.st_size)
+
+
+# ------------------------- pré-aquecimento -------------------------
+def pre_aquecer_caches() -> None:
+    """
+    Popula os caches de skus.json (e o conjunto de SKUs válidos), config_ofertas.json e das regras derivadas.
+    Chamado no startup do app para que o primeiro request não pague o parse.
+    """
+    carregar_skus()
+    carregar_cfg()
+    carregar_regras_derivadas()
+    skus_validos()
+
+
+# ------------------------- utilitário de cache-bust -------------------------
+def invalidar_cache_catalogo() -> None:
+    """
+    Invalida os caches de carregar_skus/carregar_cfg.
+    Normalmente desnecessário (o cache já compara mtime/tamanho), mas força a releitura.
+    """
+    invalidate_json_cache(SKUS_PATH)
+    invalidate_json_cache(CFG_PATH)
+    _derive_cfg.cache_clear()
 
 
 __all__ = [
@@ -89,7 +222,13 @@ __all__ = [
     # loaders de arquivo
     "carregar_skus",
     "carregar_cfg",
+    "carregar_regras_derivadas",
+    "sku_para_nome",
+    "skus_validos",
+    "RegrasDerivadas",
+    "compilar_cfg",
     "invalidar_cache_catalogo",
+    "pre_aquecer_caches",
     # domínio (reexports)
     "produto_indisponivel",
     "load_skus_info",
@@ -100,4 +239,5 @@ __all__ = [
     "BASE_DIR",
     "SKUS_PATH",
     "CFG_PATH",
+    "CFG_COMPILADO_PATH",
 ]
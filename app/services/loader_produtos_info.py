@@ -2,12 +2,13 @@ from __future__ import annotations
 
 import json
 from collections.abc import Mapping, Sequence
-from functools import lru_cache
 from pathlib import Path
 from typing import Any, TypedDict, cast
 
 import unidecode
 
+from app.services._skus_cache import SKUS_PATH, carregar_skus_cache
+
 
 # ----------------------------
 # Tipos
@@ -28,17 +29,6 @@ SKUInfoMapping = Mapping[str, Any]
 SKUs = Mapping[str, SKUInfoMapping]
 
 
-# ----------------------------
-# Caminho padrão do skus.json
-# (repo_root/skus.json)
-# ----------------------------
-def _default_skus_path() -> Path:
-    # este arquivo costuma estar em app/utils/
-    # parents[2] → raiz do repo
-    repo_root = Path(__file__).resolve().parents[2]
-    return repo_root / "skus.json"
-
-
 # ----------------------------
 # Loader com/sem cache
 # ----------------------------
@@ -46,16 +36,13 @@ def load_skus_info(path: str | Path | None = None, *, create_if_missing: bool =
     """
     Carrega o dicionário de SKUs a partir de `skus.json`.
     Se não existir e create_if_missing=True, cria com um exemplo mínimo.
-    Não é cacheado (use `load_skus()` para versão cacheada).
+    Cacheado por mtime/tamanho (cache compartilhado com `loader_main`/`loader_catalogo`):
+    o retorno é compartilhado, não altere in-place.
     """
-    p = Path(path) if path is not None else _default_skus_path()
+    p = Path(path) if path is not None else SKUS_PATH
 
     if p.exists():
-        with p.open(encoding="utf-8") as f:
-            data = json.load(f)
-        if not isinstance(data, dict):
-            raise ValueError("skus.json inválido (raiz não é objeto)")
-        return cast(SKUs, data)
+        return carregar_skus_cache(p)
 
     if not create_if_missing:
         # retorna vazio se não for para criar
@@ -70,10 +57,9 @@ def load_skus_info(path: str | Path | None = None, *, create_if_missing: bool =
     return cast(SKUs, skus_info)
 
 
-# cacheia o conteúdo do caminho padrão (útil para rotas que leem sempre o mesmo arquivo)
-@lru_cache(maxsize=1)
+# conteúdo do caminho padrão (cache por mtime: reflete gravações sem reiniciar o processo)
 def load_skus() -> SKUs:
-    return load_skus_info(_default_skus_path(), create_if_missing=True)
+    return load_skus_info(SKUS_PATH, create_if_missing=True)
 
 
 # ----------------------------
@@ -1,18 +1,24 @@
 from __future__ import annotations
 
+import re
+from collections.abc import Mapping
 from typing import Any
 
+# classificação do texto de assinaturas de uma regra de cupom (uma varredura por grupo)
+_RE_CDF = re.compile(r"anual|2 anos|bianual|3 anos|trianual")
+_RE_BIMENS = re.compile(r"bimestral|mensal")
+
 
 # =========================
 # Regras (cfg)
 # =========================
-def normalizar_rules(cfg: dict[str, Any]) -> list[dict[str, Any]]:
+def normalizar_rules(cfg: Mapping[str, Any]) -> list[dict[str, Any]]:
     """Aceita 'rules' ou legado 'regras' e retorna lista."""
     regras = cfg.get("rules", cfg.get("regras"))
     return regras if isinstance(regras, list) else []
 
 
-def montar_ofertas_embutidas(cfg: dict[str, Any]) -> dict[str, str]:
+def montar_ofertas_embutidas(cfg: Mapping[str, Any]) -> dict[str, str]:
     """
     Gera {oferta_id: nome_do_produto_embutido} a partir de regras:
       applies_to='oferta' com action.type='adicionar_brindes'.
@@ -43,7 +49,7 @@ def montar_ofertas_embutidas(cfg: dict[str, Any]) -> dict[str, str]:
     return mapa
 
 
-def montar_mapas_cupons(cfg: dict[str, Any]) -> tuple[dict[str, str], dict[str, str]]:
+def montar_mapas_cupons(cfg: Mapping[str, Any]) -> tuple[dict[str, str], dict[str, str]]:
     """
     Retorna:
       - cupons_cdf:     {cupom_lower: box}  -> Anual / 2 anos / 3 anos
@@ -68,11 +74,11 @@ def montar_mapas_cupons(cfg: dict[str, Any]) -> tuple[dict[str, str], dict[str,
         assinaturas = r.get("assinaturas") or []
         if isinstance(assinaturas, str):
             assinaturas = [assinaturas]
-        txt = " | ".join(str(x) for x in assinaturas).lower()
-
-        if any(k in txt for k in ("anual", "2 anos", "bianual", "3 anos", "trianual")):
+        # procura em cada assinatura (sem montar o texto concatenado) e para no primeiro acerto
+        textos = [str(x).lower() for x in assinaturas]
+        if any(_RE_CDF.search(t) for t in textos):
             cupons_cdf[cupom] = box
-        if any(k in txt for k in ("bimestral", "mensal")):
+        if any(_RE_BIMENS.search(t) for t in textos):
             cupons_bi_mens[cupom] = box
 
     return cupons_cdf, cupons_bi_mens
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import contextlib
+import copy
 import json
 import re
+import sqlite3
+import threading
+import time
 from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from functools import lru_cache
-from typing import Any
+from typing import Any, TypedDict
 
-from brazilcep import exceptions as br_ex, get_address_from_cep
-
-from app.schemas.shopify_vendas_produtos import ShopifyEnderecoResultado
+from app.common.http_client import http_get
+from app.common.logging_setup import submit_in_ctx
+from app.common.settings import settings
 from app.utils.utils_helpers import (
     logger,  # mantido se outros módulos usarem; ok permanecer importado
     normalizar_order_id,
@@ -20,6 +27,7 @@ from app.utils.utils_helpers import (
 
 _BRASILIENSE_KEYS = ("SQS", "SQN", "SHIN", "SHIS", "SCLN", "SGAN", "SGAS", "SMLN", "SMAS")
 _CEP_RE = re.compile(r"\d{5}-?\d{3}")
+_CEP_MAX_CONCURRENCY = 8  # consultas simultâneas ao brazilcep num lote
 
 # Número (com sufixo opcional em letra) e captura no fim da linha
 _numero_pat = re.compile(r"(?:^|\s|,|-)N(?:º|o|\.)?\s*(\d+[A-Za-z]?)\b", flags=re.IGNORECASE)
@@ -28,6 +36,20 @@ _fim_numero_pat = re.compile(
     re.IGNORECASE,
 )
 
+
+class EnderecoNormalizado(TypedDict):
+    """Resultado da normalização de um endereço (campos prontos para o front/integrações)."""
+
+    endereco_base: str
+    numero: str | None  # None só no fallback (normalização do item falhou)
+    complemento: str
+    precisa_contato: str | None  # "SIM" | "NÃO" (None no fallback)
+    logradouro_oficial: str | None
+    bairro_oficial: str | None
+    raw_address1: str
+    raw_address2: str
+
+
 # =============================================================================
 # Utilidades de CEP (consulta unitária e em lote)
 # =============================================================================
@@ -38,28 +60,153 @@ def _limpa_cep(cep: str | None) -> str:
     return re.sub(r"\D", "", str(cep or ""))[:8]
 
 
-@lru_cache(maxsize=4096)
+# --------- cache de CEP: LRU em memória + SQLite em disco (vale entre workers e restarts) ---------
+# Positivos valem 30 dias; negativos (CEP inexistente) valem 24h. Falhas de rede NÃO são cacheadas.
+_CEP_TTL_S = 30 * 24 * 3600
+_CEP_NEG_TTL_S = 24 * 3600
+_CEP_DB = settings.VAR_DIR / "cache" / "cep.sqlite"
+_VIACEP_URL = "https://viacep.com.br/ws/{cep8}/json/"
+_db_local = threading.local()  # uma conexão por thread (resolver_ceps consulta em paralelo)
+
+# Dentro de um lote (resolver_ceps) o disco é lido numa consulta só e as gravações saem numa
+# transação só: (CEPs já lidos do disco, gravações pendentes). As threads do lote enxergam o
+# mesmo par porque `submit_in_ctx` copia o contexto de quem submete.
+_CepLote = tuple[dict[str, dict[str, Any]], list[tuple[str, dict[str, Any]]]]
+_CEP_LOTE: ContextVar[_CepLote | None] = ContextVar("_CEP_LOTE", default=None)
+
+
+def _cep_db() -> sqlite3.Connection | None:
+    conn: sqlite3.Connection | None = getattr(_db_local, "conn", None)
+    if conn is None:
+        try:
+            _CEP_DB.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(_CEP_DB, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # em WAL: sem fsync por commit, ainda consistente
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cep ("
+                "cep TEXT PRIMARY KEY, data BLOB NOT NULL, expira_em REAL NOT NULL"
+                ")"
+            )
+        except sqlite3.Error as e:
+            logger.warning("cep_cache_indisponivel", extra={"err": str(e)})
+            return None
+        _db_local.conn = conn
+    return conn
+
+
+def _ceps_do_disco(ceps: list[str]) -> dict[str, dict[str, Any]]:
+    """Lê vários CEPs numa consulta só (`IN`, em blocos abaixo do limite de parâmetros do SQLite)."""
+    conn = _cep_db()
+    if conn is None:
+        return {}
+    out: dict[str, dict[str, Any]] = {}
+    agora = time.time()
+    try:
+        for i in range(0, len(ceps), 500):
+            bloco = ceps[i : i + 500]
+            sql = f"SELECT cep, data, expira_em FROM cep WHERE cep IN ({','.join('?' * len(bloco))})"
+            for cep8, data, expira_em in conn.execute(sql, bloco):
+                if float(expira_em) > agora:
+                    out[cep8] = json.loads(data)
+    except sqlite3.Error:
+        pass
+    return out
+
+
+def _ceps_para_disco(itens: list[tuple[str, dict[str, Any]]]) -> None:
+    """Grava vários CEPs numa transação só (um commit/fsync para o lote inteiro)."""
+    conn = _cep_db()
+    if conn is None or not itens:
+        return
+    agora = time.time()
+    linhas = [
+        (cep8, json.dumps(data, ensure_ascii=False), agora + (_CEP_TTL_S if data else _CEP_NEG_TTL_S))
+        for cep8, data in itens
+    ]
+    try:
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO cep (cep, data, expira_em) VALUES (?, ?, ?)", linhas)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        with contextlib.suppress(sqlite3.Error):
+            conn.execute("ROLLBACK")
+
+
+def _consultar_viacep(cep8: str, timeout: int) -> dict[str, Any]:
+    """
+    ViaCEP pela sessão HTTP compartilhada (pool keep-alive do http_client): um lote de CEPs
+    reaproveita as mesmas conexões em vez de abrir TCP+TLS a cada consulta.
+    {} = CEP inexistente; falhas de rede/HTTP propagam.
+    """
+    data = http_get(_VIACEP_URL.format(cep8=cep8), timeout=(timeout, timeout), retries=1).json()
+    if not isinstance(data, dict) or data.get("erro"):
+        return {}
+    return {
+        "street": str(data.get("logradouro") or "").strip(),
+        "district": str(data.get("bairro") or "").strip(),
+        "city": str(data.get("localidade") or "").strip(),
+        "uf": str(data.get("uf") or "").strip(),
+        "cep": cep8,
+    }
+
+
+def _consultar_brazilcep(cep8: str, timeout: int) -> dict[str, Any]:
+    """
+    Fallback (outros webservices). {} = CEP inexistente; outras falhas propagam (não entram em cache).
+    `brazilcep` só é importado aqui, sob demanda: com o ViaCEP respondendo, o app nunca paga esse import.
+    """
+    from brazilcep import exceptions as br_ex, get_address_from_cep
+
+    try:
+        data = get_address_from_cep(cep8, timeout=timeout) or {}
+    except br_ex.CEPNotFound:
+        return {}
+    # Normaliza chaves esperadas
+    return {
+        "street": str(data.get("street") or "").strip(),
+        "district": str(data.get("district") or "").strip(),
+        "city": str(data.get("city") or data.get("localidade") or "").strip(),
+        "uf": str(data.get("state") or data.get("uf") or "").strip(),
+        "cep": cep8,
+    }
+
+
+def _consultar_cep(cep8: str, timeout: int) -> dict[str, Any]:
+    """Consulta de rede: ViaCEP (pool compartilhado) e, se ele falhar, brazilcep."""
+    try:
+        return _consultar_viacep(cep8, timeout)
+    except Exception as e:
+        logger.warning("viacep_falhou", extra={"cep": cep8, "err": str(e)})
+    return _consultar_brazilcep(cep8, timeout)
+
+
+@lru_cache(maxsize=50_000)
+def _buscar_cep_cached(cep8: str, _janela: int, timeout: int) -> dict[str, Any]:
+    """
+    Memória → disco → rede. `_janela` (dia corrente em blocos de `_CEP_NEG_TTL_S`) faz parte da
+    chave só para que nenhum resultado fique na LRU além do TTL dos negativos.
+    """
+    lote = _CEP_LOTE.get()
+    data = lote[0].get(cep8) if lote is not None else _ceps_do_disco([cep8]).get(cep8)
+    if data is None:
+        data = _consultar_cep(cep8, timeout)
+        if lote is not None:
+            lote[1].append((cep8, data))  # list.append é atômico entre threads
+        else:
+            _ceps_para_disco([(cep8, data)])
+    return data
+
+
 def _buscar_endereco_cached(cep8: str, timeout: int = 5) -> dict[str, Any]:
     """
     Busca endereço no brazilcep para um CEP de 8 dígitos.
     Retorna sempre um dict (pode ser {} em caso de erro/CEP inexistente).
-    OBS: timeout participa da chave do cache (está na assinatura).
     """
     if not cep8 or len(cep8) != 8:
         return {}
     try:
-        data = get_address_from_cep(cep8, timeout=timeout) or {}
-        # Normaliza chaves esperadas
-        return {
-            "street": str(data.get("street") or "").strip(),
-            "district": str(data.get("district") or "").strip(),
-            "city": str(data.get("city") or data.get("localidade") or "").strip(),
-            "uf": str(data.get("state") or data.get("uf") or "").strip(),
-            "cep": cep8,
-        }
-    except br_ex.CEPNotFound:
-        # CEP não encontrado
-        return {}
+        return _buscar_cep_cached(cep8, int(time.time() // _CEP_NEG_TTL_S), timeout)
     except Exception:
         # Qualquer outra falha de rede/parse
         return {}
@@ -71,26 +218,39 @@ def buscar_cep_com_timeout(cep: str, timeout: int = 5) -> dict[str, Any]:
     return _buscar_endereco_cached(cep8, timeout=timeout) if len(cep8) == 8 else {}
 
 
+def resolver_ceps(ceps: Iterable[str | None], timeout: int = 5) -> dict[str, dict[str, Any]]:
+    """
+    Resolve um lote de CEPs de uma vez: dedupe (já no formato de 8 dígitos) e consulta cada
+    CEP único uma só vez, em paralelo (até `_CEP_MAX_CONCURRENCY`), passando pelo cache interno
+    (disco lido numa consulta só antes do lote e gravado numa transação só no fim).
+    Retorna {cep8: info}; CEPs inválidos ficam de fora e CEPs sem resultado mapeiam para {}.
+    """
+    unicos = list(dict.fromkeys(c for c in map(_limpa_cep, ceps) if len(c) == 8))
+    if not unicos:
+        return {}
+    lote: _CepLote = (_ceps_do_disco(unicos), [])
+    token = _CEP_LOTE.set(lote)
+    try:
+        if len(unicos) == 1:
+            return {unicos[0]: _buscar_endereco_cached(unicos[0], timeout=timeout)}
+        with ThreadPoolExecutor(max_workers=min(_CEP_MAX_CONCURRENCY, len(unicos))) as executor:
+            futures = [submit_in_ctx(executor, _buscar_endereco_cached, c, timeout=timeout) for c in unicos]
+            return {c: f.result() for c, f in zip(unicos, futures, strict=True)}
+    finally:
+        _CEP_LOTE.reset(token)
+        _ceps_para_disco(lote[1])
+
+
 def obter_bairros_por_cep(ceps: Iterable[str], timeout: int = 5) -> tuple[dict[str, str], dict[str, str]]:
     """
     Retorna (mapa_bairros, mapa_logradouros) por CEP usando brazilcep.
-    - Dedupe automático de CEPs.
+    - Dedupe automático de CEPs e consulta em lote (`resolver_ceps`).
     - Usa cache interno (_buscar_endereco_cached) para evitar chamadas repetidas.
     """
     bairros: dict[str, str] = {}
     logs: dict[str, str] = {}
 
-    seen: set[str] = set()
-    for c in ceps:
-        cep8 = _limpa_cep(c)
-        if len(cep8) != 8 or cep8 in seen:
-            continue
-        seen.add(cep8)
-
-        data = _buscar_endereco_cached(cep8, timeout=timeout)
-        if not data:
-            continue
-
+    for cep8, data in resolver_ceps(ceps, timeout=timeout).items():
         if data.get("district"):
             bairros[cep8] = data["district"]
         if data.get("street"):
@@ -252,29 +412,92 @@ def normalizar_endereco_unico(
     address2: str,
     cep: str | None = None,
     ai_provider: Callable[[str], Any] | None = None,
-) -> ShopifyEnderecoResultado:
+) -> EnderecoNormalizado:
     """
     Normaliza um endereço de pedido, combinando heurística determinística + (opcional) IA.
     Usa CEP para preferir logradouro/bairro oficiais e aplicar exceção Brasília/DF.
-    Retorna um ShopifyEnderecoResultado com campos prontos para o front/integrações.
+    Retorna um EnderecoNormalizado com campos prontos para o front/integrações.
+    Para vários pedidos, prefira `normalizar_enderecos_em_lote` (um CEP é consultado uma vez só).
     """
     pedido_id = normalizar_order_id(order_id)
-
-    # 1) CEP → logradouro/bairro/cidade/UF (para regra Brasília/DF e logradouro preferencial)
-    logradouro_cep = ""
-    bairro_cep = ""
-    cidade_cep = ""
-    uf_cep = ""
+    cep_info: Mapping[str, Any] = {}
     if cep:
         try:
             cep_info = buscar_cep_com_timeout(cep) or {}
-            logradouro_cep = str(cep_info.get("street") or "")
-            bairro_cep = str(cep_info.get("district") or "")
-            cidade_cep = str(cep_info.get("city") or "")
-            uf_cep = str(cep_info.get("uf") or "")
         except Exception as e:
             logger.error("addr_norm_cep_error", extra={"order_id": pedido_id, "err": str(e)})
+    out = _normalizar_com_cep(address1, address2, cep_info, ai_provider)
+    registrar_log_norm_enderecos(pedido_id, out)
+    return out
+
+
+def normalizar_enderecos_em_lote(
+    itens: Iterable[Mapping[str, Any]],
+    *,
+    ai_provider: Callable[[str], Any] | None = None,
+) -> list[EnderecoNormalizado]:
+    """
+    Versão em lote de `normalizar_endereco_unico`: cada item traz `order_id`, `address1`,
+    `address2` e `cep` (opcional). Os CEPs únicos do lote são resolvidos uma vez (`resolver_ceps`)
+    e o resultado é aplicado a todos os itens. Devolve os resultados na mesma ordem dos itens;
+    um item cuja normalização falhar volta com os campos originais e `numero`/`precisa_contato` None.
+    """
+    itens = list(itens)
+    try:
+        infos = resolver_ceps(str(it.get("cep") or "") for it in itens)
+    except Exception as e:
+        logger.error("addr_norm_cep_error", extra={"err": str(e), "itens": len(itens)})
+        infos = {}
+
+    # endereços idênticos no mesmo lote (mesmo comprador, mesmo prédio) são normalizados uma vez só
+    vistos: dict[tuple[str, str, str], EnderecoNormalizado] = {}
+    out: list[EnderecoNormalizado] = []
+    for it in itens:
+        pedido_id = normalizar_order_id(str(it.get("order_id") or ""))
+        address1 = str(it.get("address1") or "")
+        address2 = str(it.get("address2") or "")
+        cep8 = _limpa_cep(it.get("cep"))
+        chave = (address1, address2, cep8)
+        res = vistos.get(chave)
+        if res is None:
+            try:
+                res = _normalizar_com_cep(address1, address2, infos.get(cep8, {}), ai_provider)
+            except Exception as e:
+                # falha isolada: só este item fica com o endereço original (os demais seguem normalizados)
+                logger.error("addr_norm_item_error", extra={"order_id": pedido_id, "err": str(e)})
+                res = _resultado_bruto(address1, address2)
+            vistos[chave] = res
+        res = copy.copy(res)
+        registrar_log_norm_enderecos(pedido_id, res)
+        out.append(res)
+    return out
+
+
+def _resultado_bruto(address1: str, address2: str) -> EnderecoNormalizado:
+    # fallback quando a normalização do item falha: mantém os originais, sem número/contato inferidos
+    out: EnderecoNormalizado = {
+        "endereco_base": address1,
+        "numero": None,
+        "complemento": address2,
+        "precisa_contato": None,
+        "logradouro_oficial": None,
+        "bairro_oficial": None,
+        "raw_address1": address1,
+        "raw_address2": address2,
+    }
+    return out
 
+
+@lru_cache(maxsize=50_000)
+def _normalizar_deterministico(
+    address1: str,
+    address2: str,
+    logradouro_cep: str,
+    bairro_cep: str,
+    cidade_cep: str,
+    uf_cep: str,
+) -> tuple[str, str, str, bool]:
+    """Parte determinística (regex + dados do CEP) da normalização; pura, por isso cacheada."""
     # 2) Parser determinístico (regex)
     parsed = _parse_endereco(address1, address2)  # {"endereco_base","numero","complemento","precisa_contato"}
     base = parsed.get("endereco_base", "").strip(" ,-/")
@@ -302,6 +525,25 @@ def normalizar_endereco_unico(
         if _is_brasilia_exception(cidade_cep, uf_cep, base):
             precisa = False
 
+    return base, numero, complemento, precisa
+
+
+def _normalizar_com_cep(
+    address1: str,
+    address2: str,
+    cep_info: Mapping[str, Any],
+    ai_provider: Callable[[str], Any] | None,
+) -> EnderecoNormalizado:
+    # 1) CEP → logradouro/bairro/cidade/UF (para regra Brasília/DF e logradouro preferencial)
+    logradouro_cep = str(cep_info.get("street") or "")
+    bairro_cep = str(cep_info.get("district") or "")
+    cidade_cep = str(cep_info.get("city") or "")
+    uf_cep = str(cep_info.get("uf") or "")
+
+    base, numero, complemento, precisa = _normalizar_deterministico(
+        (address1 or "").strip(), (address2 or "").strip(), logradouro_cep, bairro_cep, cidade_cep, uf_cep
+    )
+
     # 4) Fallback via IA somente se continuamos sem número real e provider foi passado
     if numero.lower() in {"s/n", "sn", "s-n"} and ai_provider is not None:
         resp = normalizar_enderecos_gpt(
@@ -333,7 +575,7 @@ def normalizar_endereco_unico(
             if numero.lower() in {"s/n", "sn", "s-n"}:
                 precisa = not _is_brasilia_exception(cidade_cep, uf_cep, base)
 
-    out: ShopifyEnderecoResultado = {
+    out: EnderecoNormalizado = {
         "endereco_base": base or (address1 or "").strip(),
         "numero": numero or "s/n",
         "complemento": complemento,
@@ -343,5 +585,4 @@ def normalizar_endereco_unico(
         "raw_address1": address1 or "",
         "raw_address2": address2 or "",
     }
-    registrar_log_norm_enderecos(pedido_id, out)
     return out
@@ -1,31 +1,10 @@
 from __future__ import annotations
 
-import json
-import os
-import tempfile
-from collections.abc import Mapping, MutableMapping, Sequence
-from pathlib import Path
+from collections.abc import MutableMapping, Sequence
 from typing import Any, cast
 
-from app.services.loader_produtos_info import load_skus
-
-SKUS_PATH = Path(__file__).resolve().parents[2] / "skus.json"
-
-
-def _write_json_atomic(path: Path, data: Mapping[str, Any]) -> None:
-    """Grava JSON de forma atômica, evitando corrupção em caso de falha."""
-    path.parent.mkdir(parents=True, exist_ok=True)
-    fd, tmp = tempfile.mkstemp(prefix=path.name, dir=str(path.parent))
-    try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        os.replace(tmp, path)
-    finally:
-        if os.path.exists(tmp):
-            try:
-                os.remove(tmp)
-            except OSError:
-                pass
+# mesma leitura (cache por mtime + gravação pendente) e gravação atômica do catálogo
+from app.services.loader_catalogo import SKUS_PATH, carregar_skus, salvar_skus
 
 
 def mapear_produtos_shopify_service(
@@ -41,7 +20,7 @@ def mapear_produtos_shopify_service(
     if not sku_norm:
         raise ValueError("SKU é obrigatório.")
 
-    skus_info: MutableMapping[str, Any] = cast(MutableMapping[str, Any], dict(load_skus()))
+    skus_info: MutableMapping[str, Any] = cast(MutableMapping[str, Any], carregar_skus())
 
     # Localiza entrada pelo SKU
     entrada: MutableMapping[str, Any] | None = None
@@ -53,7 +32,7 @@ def mapear_produtos_shopify_service(
     if entrada is None:
         raise ValueError(f"SKU '{sku}' não encontrado no skus.json")
 
-    entrada.setdefault("shopify_ids", [])
+    entrada["shopify_ids"] = list(entrada.get("shopify_ids") or [])
     atuais_set = {str(x).strip() for x in entrada["shopify_ids"] if str(x).strip()}
 
     novos_normalizados: list[int | str] = []
@@ -70,7 +49,7 @@ def mapear_produtos_shopify_service(
 
     if novos_normalizados:
         entrada["shopify_ids"].extend(novos_normalizados)
-        _write_json_atomic(SKUS_PATH, skus_info)
+        salvar_skus(skus_info, SKUS_PATH)
         return {
             "sku": sku_norm,
             "shopify_ids": list(entrada["shopify_ids"]),
@@ -79,7 +58,7 @@ def mapear_produtos_shopify_service(
             "message": f"Mapeados {len(novos_normalizados)} ID(s) da Shopify para '{sku_norm}'.",
         }
     else:
-        _write_json_atomic(SKUS_PATH, skus_info)
+        salvar_skus(skus_info, SKUS_PATH)
         return {
             "sku": sku_norm,
             "shopify_ids": list(entrada["shopify_ids"]),
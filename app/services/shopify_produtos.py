@@ -1,19 +1,76 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import time
 from typing import Any
 
-from app.common.http_client import http_get
+import orjson
+
+from app.common.http_client import ahttp_get
 from app.common.settings import settings
 from app.schemas.shopify_produtos import ProductShopifyVariant
 from app.services.shopify_client import API_VERSION
 
 
-def buscar_produtos_shopify() -> list[ProductShopifyVariant]:
-    """
-    Consulta a API REST da Shopify e retorna uma lista plana de variantes de produtos
-    com product_id, variant_id, title e sku. Paginação automática (limit=250).
-    """
-    url: str | None = f"https://{settings.SHOP_URL}/admin/api/{API_VERSION}/products.json?limit=250"
+def _variantes_da_pagina(produtos_json: list[dict[str, Any]]) -> list[ProductShopifyVariant]:
+    """Achata os produtos de uma página em variantes (product_id, variant_id, title, sku)."""
+    variantes: list[ProductShopifyVariant] = []
+    for produto in produtos_json:
+        id_produto_any: Any = produto.get("id")
+        if not id_produto_any:
+            continue
+        try:
+            id_produto: int = int(id_produto_any)
+        except (TypeError, ValueError):
+            continue
+
+        titulo_produto: str = str(produto.get("title", "")).strip()
+        variants: list[dict[str, Any]] = produto.get("variants", []) or []
+
+        for variante in variants:
+            variant_id_any: Any = variante.get("id")
+            if not variant_id_any:
+                continue
+            try:
+                variant_id: int = int(variant_id_any)
+            except (TypeError, ValueError):
+                continue
+
+            sku: str = str(variante.get("sku", "")).strip()
+
+            # tipos já convertidos acima (int/str): monta sem revalidar campo a campo
+            variantes.append(
+                ProductShopifyVariant.model_construct(
+                    product_id=id_produto,
+                    variant_id=variant_id,
+                    title=titulo_produto,
+                    sku=sku,
+                )
+            )
+    return variantes
+
+
+def _proxima_url(link: str) -> str | None:
+    """Paginação via header "Link" (rel="next")."""
+    if 'rel="next"' not in link:
+        return None
+    partes = [p.strip() for p in link.split(",")]
+    next_url_parts = [p.split(";")[0].strip().strip("<>") for p in partes if 'rel="next"' in p]
+    return next_url_parts[0] if next_url_parts else None
+
+
+# Catálogo completo em memória por CATALOGO_TTL_S: dentro da janela, um GET vira um lookup
+# em vez de uma varredura paginada na Shopify. Só varreduras completas (sem erro) entram no cache.
+CATALOGO_TTL_S = 300
+_catalogo: dict[str, Any] = {}  # {"variantes", "etag", "expira_em"}
+_catalogo_lock = asyncio.Lock()
+
+
+async def _varrer_produtos(limit: int | None) -> tuple[list[ProductShopifyVariant], bool]:
+    """Varre as páginas da Shopify. Devolve (variantes, completo) — completo=False se parou por erro."""
+    por_pagina = min(limit, 250) if limit else 250
+    url: str | None = f"https://{settings.SHOP_URL}/admin/api/{API_VERSION}/products.json?limit={por_pagina}"
     headers: dict[str, str] = {
         "X-Shopify-Access-Token": settings.SHOPIFY_TOKEN,
         "Content-Type": "application/json",
@@ -23,56 +80,62 @@ def buscar_produtos_shopify() -> list[ProductShopifyVariant]:
     pagina_atual: int = 1
 
     while url:
-        # ❌ remove verify=False — seu http_get já deve validar TLS por padrão
-        resp = http_get(url, headers=headers)
+        resp = await ahttp_get(url, headers=headers)
         if resp.status_code != 200:
             print(f"❌ Erro Shopify {resp.status_code}: {resp.text}")
-            break
+            return todos, False
 
         produtos_json: list[dict[str, Any]] = resp.json().get("products", []) or []
         print(f"📄 Página {pagina_atual}: {len(produtos_json)} produtos retornados")
+        todos.extend(_variantes_da_pagina(produtos_json))
+        if limit and len(todos) >= limit:
+            del todos[limit:]
+            break
 
-        for produto in produtos_json:
-            id_produto_any: Any = produto.get("id")
-            if not id_produto_any:
-                continue
-            try:
-                id_produto: int = int(id_produto_any)
-            except (TypeError, ValueError):
-                continue
+        pagina_atual += 1
+        url = _proxima_url(resp.headers.get("Link", "") or "")
 
-            titulo_produto: str = str(produto.get("title", "")).strip()
-            variants: list[dict[str, Any]] = produto.get("variants", []) or []
-
-            for variante in variants:
-                variant_id_any: Any = variante.get("id")
-                if not variant_id_any:
-                    continue
-                try:
-                    variant_id: int = int(variant_id_any)
-                except (TypeError, ValueError):
-                    continue
-
-                sku: str = str(variante.get("sku", "")).strip()
-
-                todos.append(
-                    ProductShopifyVariant(
-                        product_id=id_produto,
-                        variant_id=variant_id,
-                        title=titulo_produto,
-                        sku=sku,
-                    )
-                )
+    return todos, True
 
-        pagina_atual += 1
 
-        # paginação via header "Link"
-        link: str = resp.headers.get("Link", "") or ""
-        if 'rel="next"' in link:
-            partes = [p.strip() for p in link.split(",")]
-            next_url_parts = [p.split(";")[0].strip().strip("<>") for p in partes if 'rel="next"' in p]
-            url = next_url_parts[0] if next_url_parts else None
-        else:
-            break
+def _catalogo_fresco() -> bool:
+    return bool(_catalogo) and _catalogo["expira_em"] > time.monotonic()
+
 
-    return todos
+def _etag_catalogo(variantes: list[ProductShopifyVariant]) -> str:
+    chave = orjson.dumps([(v.product_id, v.variant_id, v.title, v.sku) for v in variantes])
+    return hashlib.blake2b(chave, digest_size=16).hexdigest()
+
+
+async def buscar_produtos_shopify(limit: int | None = None) -> list[ProductShopifyVariant]:
+    """
+    Consulta a API REST da Shopify e retorna uma lista plana de variantes de produtos
+    com product_id, variant_id, title e sku. Paginação automática (até 250 produtos por página).
+    Com `limit`, para de paginar assim que junta `limit` variantes (e devolve exatamente `limit`).
+    Assíncrona (AsyncClient compartilhado): a espera pela Shopify não ocupa uma thread do threadpool.
+    """
+    variantes, _ = await _varrer_produtos(limit)
+    return variantes
+
+
+async def catalogo_shopify(limit: int | None = None) -> tuple[list[ProductShopifyVariant], str | None]:
+    """
+    Variantes da Shopify servidas do cache de catálogo (TTL `CATALOGO_TTL_S`).
+    Devolve (variantes, etag do catálogo). Com `limit` e cache frio, faz só a varredura curta
+    (sem cachear) e o etag vem None. A lista devolvida é compartilhada: não altere in-place.
+    """
+    if not _catalogo_fresco():
+        if limit:
+            return await buscar_produtos_shopify(limit), None
+        async with _catalogo_lock:  # uma varredura só, mesmo com GETs simultâneos no cache frio
+            if not _catalogo_fresco():
+                variantes, completo = await _varrer_produtos(None)
+                if not completo:
+                    return variantes, None
+                _catalogo.update(
+                    variantes=variantes,
+                    etag=_etag_catalogo(variantes),
+                    expira_em=time.monotonic() + CATALOGO_TTL_S,
+                )
+    variantes = _catalogo["variantes"]
+    return (variantes[:limit] if limit else variantes), _catalogo["etag"]
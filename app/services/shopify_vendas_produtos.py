@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+import operator
 import re
 import threading
 import time
-from collections.abc import Iterable, Mapping
-from datetime import datetime
-from typing import Any, cast
+from collections.abc import Callable, Iterable, Mapping
+from datetime import date
+from functools import partial
+from typing import Any, Optional, cast
+
+import orjson
+from anyio import to_thread
 
 from app.common.http_client import DEFAULT_TIMEOUT, get_session
 from app.common.settings import settings
@@ -15,8 +22,10 @@ from app.services.bling_planilha_shopify import (
     _linhas_por_pedido,
     enriquecer_bairros_nas_linhas,
     enriquecer_enderecos_nas_linhas,
+    pre_resolver_ceps_das_linhas,
 )
 from app.services.loader_main import carregar_skus
+from app.services.shopify_ajuste_endereco import normalizar_enderecos_em_lote
 from app.utils.throttlers import (
     _GRAPHQL_BACKOFF_MAX,
     _GRAPHQL_BACKOFF_MIN,
@@ -34,6 +43,28 @@ from .shopify_client import _coletar_remaining_lineitems, _graphql_url, _http_sh
 logger = logging.getLogger(__name__)
 
 
+# -----------------------------------------------------------------------------
+# Exceptions
+# -----------------------------------------------------------------------------
+# 429/THROTTLED seguidos tolerados numa mesma página antes de desistir e devolver 429 ao cliente
+_GRAPHQL_MAX_THROTTLES = 8
+
+
+class ShopifyRateLimitError(Exception):
+    """A Shopify seguiu limitando (429/THROTTLED) após `_GRAPHQL_MAX_THROTTLES` esperas seguidas."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Shopify rate limit: tente de novo em {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def _aguardar_throttle(throttles: int, espera: float) -> None:
+    """Dorme `espera` (limitada pelo throttler) ou, após muitas esperas seguidas, desiste."""
+    if throttles > _GRAPHQL_MAX_THROTTLES:
+        raise ShopifyRateLimitError(retry_after=espera)
+    _sleep_throttle(espera)
+
+
 # -----------------------------------------------------------------------------
 # Shopify GraphQL basics
 # -----------------------------------------------------------------------------
@@ -120,15 +151,21 @@ def query_vendas_shopify() -> str:
     """.strip()
 
 
+_DDMMYYYY_RE = re.compile(r"(0[1-9]|[12]\d|3[01])/(0[1-9]|1[0-2])/(\d{4})")
+
+
 def _parametros_coleta_shopify(data_inicio_ddmmyyyy: str, fulfillment_status: str) -> str:
     # created_at:>=YYYY-MM-DD + fulfillment_status opcional
+    m = _DDMMYYYY_RE.fullmatch(data_inicio_ddmmyyyy or "")
     try:
-        dt = datetime.strptime(data_inicio_ddmmyyyy, "%d/%m/%Y")
-    except Exception:
-        raise ValueError('data_inicio inválida: use "dd/MM/yyyy"')
+        if m is None:
+            raise ValueError(data_inicio_ddmmyyyy)
+        date(int(m[3]), int(m[2]), int(m[1]))  # o regex não pega datas impossíveis (ex.: 31/02)
+    except ValueError:
+        raise ValueError('data_inicio inválida: use "dd/MM/yyyy"') from None
 
     filtros: list[str] = [
-        f'created_at:>={dt.strftime("%Y-%m-%d")}',
+        f"created_at:>={m[3]}-{m[2]}-{m[1]}",
         "financial_status:paid",
     ]
     if (fulfillment_status or "any").strip().lower() == "unfulfilled":
@@ -147,6 +184,7 @@ def _paginacao_vendas_shopify(search_str: str) -> Iterable[ShopifyPedido]:
 
     sess = get_session()
     backoff = _GRAPHQL_BACKOFF_MIN
+    throttles = 0
     pagina = 0
 
     while True:
@@ -165,12 +203,14 @@ def _paginacao_vendas_shopify(search_str: str) -> Iterable[ShopifyPedido]:
                 "graphql_http_429",
                 extra={"retry_after_s": float(ra) if ra and ra.isdigit() else None, "duration_s": dur},
             )
-            _sleep_throttle(float(ra) if ra and ra.isdigit() else backoff)
+            throttles += 1
+            _aguardar_throttle(throttles, float(ra) if ra and ra.isdigit() else backoff)
             backoff = min(backoff * _GRAPHQL_BACKOFF_MULT, _GRAPHQL_BACKOFF_MAX)
             continue
 
         resp.raise_for_status()
-        payload = cast(dict[str, Any], resp.json() or {})
+        # bytes crus direto no orjson (páginas de 50 pedidos com line items: o decode do json stdlib pesa)
+        payload = cast(dict[str, Any], orjson.loads(resp.content) or {})
 
         errors = payload.get("errors") or []
         if errors:
@@ -181,7 +221,8 @@ def _paginacao_vendas_shopify(search_str: str) -> Iterable[ShopifyPedido]:
                     "graphql_throttled",
                     extra={"duration_s": dur, "wait_s": round(wait, 3), **metrics, "pagina": pagina},
                 )
-                _sleep_throttle(wait if wait > 0 else backoff)
+                throttles += 1
+                _aguardar_throttle(throttles, wait if wait > 0 else backoff)
                 backoff = min(backoff * _GRAPHQL_BACKOFF_MULT, _GRAPHQL_BACKOFF_MAX)
                 continue
             logger.error("graphql_errors", extra={"errors": errors, "duration_s": dur, "pagina": pagina})
@@ -189,6 +230,7 @@ def _paginacao_vendas_shopify(search_str: str) -> Iterable[ShopifyPedido]:
 
         # sucesso → reseta backoff
         backoff = _GRAPHQL_BACKOFF_MIN
+        throttles = 0
         data = cast(dict[str, Any], payload.get("data") or {})
         orders = cast(dict[str, Any], data.get("orders") or {})
         edges = cast(list[dict[str, Any]], orders.get("edges") or [])
@@ -226,6 +268,7 @@ def _pagina_vendas_shopify(
 
     # backoff simples em caso de 429/THROTTLED (mantemos consistente com o fluxo legado)
     backoff = _GRAPHQL_BACKOFF_MIN
+    throttles = 0
 
     while True:
         body = {
@@ -243,12 +286,13 @@ def _pagina_vendas_shopify(
                 "graphql_http_429_single",
                 extra={"retry_after_s": float(ra) if ra and ra.isdigit() else None, "duration_s": dur},
             )
-            _sleep_throttle(float(ra) if ra and ra.isdigit() else backoff)
+            throttles += 1
+            _aguardar_throttle(throttles, float(ra) if ra and ra.isdigit() else backoff)
             backoff = min(backoff * _GRAPHQL_BACKOFF_MULT, _GRAPHQL_BACKOFF_MAX)
             continue
 
         resp.raise_for_status()
-        payload = cast(dict[str, Any], resp.json() or {})
+        payload = cast(dict[str, Any], orjson.loads(resp.content) or {})
 
         errors = payload.get("errors") or []
         if errors:
@@ -259,7 +303,8 @@ def _pagina_vendas_shopify(
                     "graphql_throttled_single",
                     extra={"duration_s": dur, "wait_s": round(wait, 3), **metrics},
                 )
-                _sleep_throttle(wait if wait > 0 else backoff)
+                throttles += 1
+                _aguardar_throttle(throttles, wait if wait > 0 else backoff)
                 backoff = min(backoff * _GRAPHQL_BACKOFF_MULT, _GRAPHQL_BACKOFF_MAX)
                 continue
             logger.error("graphql_errors_single", extra={"errors": errors, "duration_s": dur})
@@ -349,7 +394,7 @@ def _coletar_pedidos_shopify_base(
 ) -> list[dict[str, Any]]:
     t0 = time.time()
     search = _parametros_coleta_shopify(data_inicio, fulfillment_status)
-    skus_info = cast(Mapping[str, Mapping[str, Any]], carregar_skus())
+    skus_info = carregar_skus()
     modo_fs = (fulfillment_status or "any").strip().lower()
     sku_filter = {s.strip().upper() for s in (sku_produtos or []) if s.strip()}
 
@@ -445,6 +490,17 @@ def coletar_vendas_shopify(
         sku_produtos=sku_produtos,
     )
 
+    # 1.1) CEPs dos passos 2 e 3 resolvidos juntos, num lote paralelo só: as consultas de um
+    #      não esperam as do outro, e os dois passos leem do cache. Falha aqui não é fatal:
+    #      cada passo refaz a consulta do que faltar.
+    if linhas and (enrich_enderecos or enrich_bairros):
+        tc = time.time()
+        try:
+            pre_resolver_ceps_das_linhas(linhas, timeout=5)
+        except Exception as e:
+            logger.warning("pre_resolver_ceps_falhou", extra={"err": str(e)})
+        logger.info("pre_resolver_ceps_ok", extra={"duration_s": round(time.time() - tc, 3)})
+
     # 2) NORMALIZAR ENDEREÇOS — determinístico; escreve "s/n" e "Precisa Contato"
     #    (com exceção Brasília/DF) e não promove complemento para bairro.
     if linhas and enrich_enderecos:
@@ -512,18 +568,95 @@ def coletar_vendas_shopify(
 
 
 # -----------------------------------------------------------------------------
-# NOVO: Função pública para a rota HTTP
+# Cache de coletas (mesmos parâmetros → mesma varredura)
 # -----------------------------------------------------------------------------
+# Cada coleta é uma varredura paginada completa na Shopify (minutos). Quem repete os mesmos
+# filtros dentro de COLETA_CACHE_TTL_S recebe o resultado guardado; pedidos simultâneos com a
+# mesma chave esperam a varredura em andamento (lock por chave) em vez de abrir outra.
+# Só coletas bem-sucedidas entram no cache (429/erro propaga e a próxima chamada tenta de novo).
+# `unfulfilled` não é cacheado: a lista de pendentes muda a cada despacho e precisa vir fresca
+# (pedidos simultâneos iguais continuam passando pelo lock da chave, um de cada vez).
+COLETA_CACHE_TTL_S = 600
+COLETA_CACHE_MAX = 64
+_coletas: dict[str, tuple[float, tuple[list[dict[str, Any]], dict[str, dict[str, int]]]]] = {}
+_coletas_locks: dict[str, asyncio.Lock] = {}
+
 
+def _chave_coleta(params: Mapping[str, Any]) -> str:
+    return hashlib.blake2b(orjson.dumps(params, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+
+def _coleta_em_cache(chave: str) -> tuple[list[dict[str, Any]], dict[str, dict[str, int]]] | None:
+    item = _coletas.get(chave)
+    if item is None or item[0] <= time.monotonic():
+        return None
+    return item[1]
+
+
+def _guardar_coleta(chave: str, resultado: tuple[list[dict[str, Any]], dict[str, dict[str, int]]]) -> None:
+    agora = time.monotonic()
+    for k in [k for k, (expira_em, _) in _coletas.items() if expira_em <= agora]:
+        del _coletas[k]
+    while len(_coletas) >= COLETA_CACHE_MAX:
+        del _coletas[next(iter(_coletas))]  # mais antiga (ordem de inserção)
+    _coletas[chave] = (agora + COLETA_CACHE_TTL_S, resultado)
+    for k in [k for k, lock in _coletas_locks.items() if k not in _coletas and not lock.locked()]:
+        del _coletas_locks[k]
+
+
+async def coletar_vendas_shopify_cache(
+    *,
+    data_inicio: str,
+    fulfillment_status: str = "any",
+    sku_produtos: list[str] | None = None,
+    enrich_cpfs: bool = True,
+    enrich_bairros: bool = True,
+    enrich_enderecos: bool = True,
+    refresh: bool = False,
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, int]]]:
+    """
+    `coletar_vendas_shopify` com cache por parâmetros (TTL `COLETA_CACHE_TTL_S`) e uma
+    varredura por chave em andamento. A coleta roda numa thread, fora do event loop.
+    `refresh=True` ignora o que estiver em cache (e guarda a coleta nova); `unfulfilled` nunca usa o cache.
+    O resultado é COMPARTILHADO entre chamadas: não altere as linhas nem o stats in-place.
+    """
+    params: dict[str, Any] = {
+        "data_inicio": data_inicio,
+        "fulfillment_status": fulfillment_status,
+        "sku_produtos": sorted(set(sku_produtos)) if sku_produtos else None,
+        "enrich_cpfs": enrich_cpfs,
+        "enrich_bairros": enrich_bairros,
+        "enrich_enderecos": enrich_enderecos,
+    }
+    chave = _chave_coleta(params)
+    cacheavel = fulfillment_status != "unfulfilled"
+    usar_cache = cacheavel and not refresh
+    if usar_cache and (resultado := _coleta_em_cache(chave)) is not None:
+        return resultado
+    lock = _coletas_locks.setdefault(chave, asyncio.Lock())
+    async with lock:
+        em_cache = _coleta_em_cache(chave) if usar_cache else None
+        if em_cache is not None:
+            return em_cache
+        resultado = await to_thread.run_sync(partial(coletar_vendas_shopify, **params))
+        if cacheavel:
+            _guardar_coleta(chave, resultado)
+    if not cacheavel and not lock.locked():
+        _coletas_locks.pop(chave, None)
+    return resultado
 
-from collections.abc import Callable
-from typing import Optional
 
-from app.services.shopify_ajuste_endereco import normalizar_endereco_unico
+# -----------------------------------------------------------------------------
+# NOVO: Função pública para a rota HTTP
+# -----------------------------------------------------------------------------
 
 # se você tiver um provider de IA, importe-o e passe aqui; senão deixe None
 AiProvider = Optional[Callable[[str], Any]]
 
+# campos do shippingAddress que vão para o normalizador, lidos numa chamada só (itemgetter é C);
+# a query GraphQL sempre seleciona os três, então as chaves existem (valor pode vir null)
+_CAMPOS_ENDERECO = operator.itemgetter("address1", "address2", "zip")
+
 
 def _extrair_cpf_do_node(node: dict[str, Any]) -> str | None:
     """
@@ -539,9 +672,7 @@ def _extrair_cpf_do_node(node: dict[str, Any]) -> str | None:
             title = str(n.get("title") or "").lower()
             purpose = str(n.get("purpose") or "").lower()
             if "cpf" in title or purpose == "tax":
-                import re as _re
-
-                cpf = _re.sub(r"\D", "", str(n.get("value") or ""))[:11]
+                cpf = re.sub(r"\D", "", str(n.get("value") or ""))[:11]
                 if len(cpf) == 11:
                     return cpf
     except Exception:
@@ -568,71 +699,46 @@ def listar_pedidos_shopify(
     search = _parametros_coleta_shopify(data_inicio, status)
 
     pedidos_norm: list[ShopifyPedido] = []
+    enderecos: list[dict[str, Any]] = []
+    shipping_out: list[dict[str, Any]] = []  # shippingAddress de cada pedido com endereço (preenchido no passo 3)
 
     # 2) Itera TODAS as páginas da Shopify
     for node in _paginacao_vendas_shopify(search):
         # --- 2.1 Achatar line items ---
         li_edges = (node.get("lineItems") or {}).get("edges") or []
         line_items: list[dict[str, Any]] = []
+        append_item = line_items.append
         for lie in li_edges:
-            inode = (lie or {}).get("node") or {}
-            line_items.append(
+            get = ((lie or {}).get("node") or {}).get  # um lookup de método por item, não seis
+            append_item(
                 {
-                    "id": inode.get("id"),
-                    "title": inode.get("title"),
-                    "quantity": inode.get("quantity"),
-                    "sku": inode.get("sku"),
-                    "product": (inode.get("product") or {}),
-                    "discountedTotalSet": (inode.get("discountedTotalSet") or {}),
+                    "id": get("id"),
+                    "title": get("title"),
+                    "quantity": get("quantity"),
+                    "sku": get("sku"),
+                    "product": (get("product") or {}),
+                    "discountedTotalSet": (get("discountedTotalSet") or {}),
                 }
             )
 
         # --- 2.2 Extrair CPF ---
         cpf = _extrair_cpf_do_node(node)
 
-        # --- 2.3 Normalizar endereço SEMPRE (usa CEP internamente) ---
+        # --- 2.3 Endereço: só coleta aqui; a normalização roda em lote no passo 3 ---
+        # pedido sem shippingAddress (ex.: só itens digitais) não entra no lote: nada a normalizar
         addr_in = node.get("shippingAddress") or {}
-        order_id = str(node.get("id") or node.get("name") or "")
-        address1 = str(addr_in.get("address1") or "")
-        address2 = str(addr_in.get("address2") or "")
-        cep = str(addr_in.get("zip") or "") or None
-
-        # provider de IA (se você tiver um, injete no normalizador; caso contrário fica None)
-        ai_provider = None
-        if usar_gpt:
-            ai_provider = None  # substitua aqui pelo seu provider quando disponível
-
-        try:
-            norm = normalizar_endereco_unico(
-                order_id=order_id,
-                address1=address1,
-                address2=address2,
-                cep=cep,
-                ai_provider=ai_provider,
+        shipping_address_out: dict[str, Any] = dict(addr_in)
+        if addr_in:
+            address1, address2, cep = _CAMPOS_ENDERECO(addr_in)
+            enderecos.append(
+                {
+                    "order_id": str(node.get("id") or node.get("name") or ""),
+                    "address1": str(address1 or ""),
+                    "address2": str(address2 or ""),
+                    "cep": str(cep or "") or None,
+                }
             )
-        except Exception:
-            # fallback: mantém originais
-            norm = {
-                "endereco_base": address1,
-                "numero": None,
-                "complemento": address2,
-                "logradouro_oficial": None,
-                "bairro_oficial": None,
-                "precisa_contato": None,
-            }
-
-        shipping_address_out: dict[str, Any] = dict(addr_in or {})
-        # aplica mínimos obrigatórios
-        shipping_address_out["address1"] = norm.get("endereco_base") or address1
-        shipping_address_out["address2"] = norm.get("complemento") or address2
-        if norm.get("numero") is not None:
-            shipping_address_out["numero"] = norm.get("numero")
-        if norm.get("bairro_oficial"):
-            shipping_address_out["bairro_oficial"] = norm["bairro_oficial"]
-        if norm.get("logradouro_oficial"):
-            shipping_address_out["logradouro_oficial"] = norm["logradouro_oficial"]
-        if "precisa_contato" in norm:
-            shipping_address_out["precisa_contato"] = norm.get("precisa_contato")
+            shipping_out.append(shipping_address_out)
 
         pedido: dict[str, Any] = {
             "id": node.get("id"),
@@ -649,6 +755,28 @@ def listar_pedidos_shopify(
 
         pedidos_norm.append(cast(ShopifyPedido, pedido))
 
+    # 3) Normalizar endereços SEMPRE, num passe só (cada CEP único é consultado uma vez)
+    # provider de IA (se você tiver um, injete no normalizador; caso contrário fica None)
+    ai_provider = None
+    if usar_gpt:
+        ai_provider = None  # substitua aqui pelo seu provider quando disponível
+
+    # falhas são tratadas item a item dentro do lote (o item afetado mantém o endereço original)
+    normalizados: list[Any] = list(normalizar_enderecos_em_lote(enderecos, ai_provider=ai_provider))
+
+    for shipping_address_out, end, norm in zip(shipping_out, enderecos, normalizados, strict=True):
+        # aplica mínimos obrigatórios
+        shipping_address_out["address1"] = norm.get("endereco_base") or end["address1"]
+        shipping_address_out["address2"] = norm.get("complemento") or end["address2"]
+        if norm.get("numero") is not None:
+            shipping_address_out["numero"] = norm.get("numero")
+        if norm.get("bairro_oficial"):
+            shipping_address_out["bairro_oficial"] = norm["bairro_oficial"]
+        if norm.get("logradouro_oficial"):
+            shipping_address_out["logradouro_oficial"] = norm["logradouro_oficial"]
+        if "precisa_contato" in norm:
+            shipping_address_out["precisa_contato"] = norm.get("precisa_contato")
+
     logger.info(
         "listar_pedidos_shopify_ok",
         extra={
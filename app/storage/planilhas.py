@@ -1,19 +1,36 @@
 from __future__ import annotations
 
-import contextlib
-import json
-import os
-import tempfile
+import threading
+from collections.abc import Iterable, Iterator
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 from zoneinfo import ZoneInfo
 
+import orjson
+
+from app.common.jsonutil import dumps_json, gravar_atomico
+
 _BASE = Path("var/planilhas")
 _BASE.mkdir(parents=True, exist_ok=True)
 
 TZ_BR = ZoneInfo("America/Sao_Paulo")
 
+# ------------------------------------------------------------------
+# Formato em disco (log-structured), por planilha:
+#   <id>.json    → cabeçalho (id, datas, row_count, log_count, meta), regravado inteiro (é pequeno)
+#   <id>.ndjson  → log append-only: uma linha JSON por linha coletada; uma linha com dedup_id já
+#                  visto é um update (aplicado por `dict.update` na leitura, na ordem do log)
+#   <id>.idx     → dedup_ids já presentes (um JSON string por linha, append-only)
+# Assim o `append_coleta` custa O(linhas novas) em vez de regravar a planilha toda.
+# Planilhas no formato antigo (tudo no .json, com "lines") são lidas normalmente e
+# convertidas no primeiro append.
+# ------------------------------------------------------------------
+
+# compacta o log quando ele passa de 2x as linhas vivas (+ folga)
+_COMPACTAR_FOLGA = 1000
+_LOCK = threading.Lock()
+
 
 def _now_local() -> str:
     return datetime.now(TZ_BR).strftime("%Y-%m-%d %H:%M:%S")
@@ -23,6 +40,33 @@ def _path(planilha_id: str) -> Path:
     return _BASE / f"{planilha_id}.json"
 
 
+def _log_path(planilha_id: str) -> Path:
+    return _BASE / f"{planilha_id}.ndjson"
+
+
+def _idx_path(planilha_id: str) -> Path:
+    return _BASE / f"{planilha_id}.idx"
+
+
+def _ndjson(itens: Iterable[Any]) -> bytes:
+    return b"".join(dumps_json(item, orjson.OPT_APPEND_NEWLINE) for item in itens)
+
+
+def _iter_ndjson(p: Path) -> Iterator[Any]:
+    try:
+        raw = p.read_bytes()
+    except FileNotFoundError:
+        return
+    for linha in raw.splitlines():
+        if not linha:
+            continue
+        try:
+            yield orjson.loads(linha)
+        except orjson.JSONDecodeError:
+            # última linha truncada (escrita interrompida): ignora
+            continue
+
+
 def create_planilha(planilha_id: str, meta: dict[str, Any] | None = None) -> str:
     """
     Cria uma planilha vazia em JSON com o id informado.
@@ -40,33 +84,60 @@ def create_planilha(planilha_id: str, meta: dict[str, Any] | None = None) -> str
         "row_count": 0,
         "meta": meta or {},
         "lines": [],
-        # índice persistido (lista) para dedupe rápido
-        "index": {"dedup_ids": []},
     }
     save_planilha(planilha_id, payload)
     return planilha_id
 
 
-def save_planilha(planilha_id: str, payload: dict[str, Any]) -> Path:
+def _ler_cabecalho(planilha_id: str) -> dict[str, Any]:
     p = _path(planilha_id)
-    tmp_fd, tmp_path = tempfile.mkstemp(prefix=f"{planilha_id}.", suffix=".tmp", dir=_BASE)
-    try:
-        with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, p)
-    except Exception:
-        with contextlib.suppress(Exception):
-            os.remove(tmp_path)
-        raise
-    return p
+    if not p.exists():
+        raise FileNotFoundError(f"planilha_id não encontrada: {planilha_id}")
+    data: dict[str, Any] = orjson.loads(p.read_bytes())
+    return data
+
+
+def _gravar_cabecalho(planilha_id: str, cabecalho: dict[str, Any]) -> None:
+    gravar_atomico(_path(planilha_id), orjson.dumps(cabecalho, option=orjson.OPT_INDENT_2))
+
+
+def save_planilha(planilha_id: str, payload: dict[str, Any]) -> Path:
+    """
+    Grava a planilha inteira (`payload["lines"]`) no formato log-structured, já compactado:
+    log com uma linha por registro, índice de dedup_ids e cabeçalho (gravado por último).
+    """
+    linhas: list[dict[str, Any]] = payload.get("lines") or []
+    cabecalho = {k: v for k, v in payload.items() if k not in ("lines", "index")}
+    cabecalho["row_count"] = cabecalho["log_count"] = len(linhas)
+    ids = dict.fromkeys(did for did in (_ensure_dedup_id_inplace(r) for r in linhas) if did)
+
+    gravar_atomico(_log_path(planilha_id), _ndjson(linhas))
+    gravar_atomico(_idx_path(planilha_id), _ndjson(ids))
+    _gravar_cabecalho(planilha_id, cabecalho)
+    return _path(planilha_id)
+
+
+def _replay_log(planilha_id: str) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """Reconstrói as linhas a partir do log: 1ª ocorrência de um dedup_id = linha; demais = update()."""
+    linhas: list[dict[str, Any]] = []
+    por_id: dict[str, dict[str, Any]] = {}
+    for row in _iter_ndjson(_log_path(planilha_id)):
+        did = str(row.get("dedup_id") or "").strip()
+        if did and did in por_id:
+            por_id[did].update(row)
+            continue
+        linhas.append(row)
+        if did:
+            por_id[did] = row
+    return linhas, por_id
 
 
 def load_planilha(planilha_id: str) -> dict[str, Any]:
-    p = _path(planilha_id)
-    if not p.exists():
-        raise FileNotFoundError(f"planilha_id não encontrada: {planilha_id}")
-    with p.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = _ler_cabecalho(planilha_id)
+    if "lines" not in data:
+        linhas, por_id = _replay_log(planilha_id)
+        data["lines"] = linhas
+        data["index"] = {"dedup_ids": sorted(por_id)}
     data.setdefault("lines", [])
     data.setdefault("index", {}).setdefault("dedup_ids", [])
     return data
@@ -109,40 +180,45 @@ def append_coleta(planilha_id: str, novas_linhas: list[dict[str, Any]]) -> tuple
     """
     Acrescenta/atualiza linhas deduplicando por 'dedup_id' (ID único por linha).
     - Se 'dedup_id' (ou equivalente) não existe ainda: adiciona a linha.
-    - Se já existe: faz update() na linha existente (enriquecendo/atualizando), sem criar nova linha.
+    - Se já existe: a linha é registrada como update e, na leitura, faz update() na existente
+      (enriquecendo/atualizando), sem criar nova linha.
+    Só acrescenta ao log/índice (O(linhas novas)); o log é compactado quando cresce demais.
     Retorna (adicionados, atualizados).
     """
-    data = load_planilha(planilha_id)
-
-    # índice in-memory: dedup_id -> referência da linha existente
-    idx: dict[str, dict[str, Any]] = {}
-    for row in data.get("lines", []):
-        did = _ensure_dedup_id_inplace(row)
-        if did:
-            idx[did] = row
-
-    adicionados, atualizados = 0, 0
-
-    for row in novas_linhas:
-        did = _ensure_dedup_id_inplace(row)
-        if not did:
-            # Sem dedup_id identificável: adiciona assim mesmo
-            data["lines"].append(row)
+    with _LOCK:
+        cabecalho = _ler_cabecalho(planilha_id)
+        if "lines" in cabecalho:
+            # formato antigo: converte uma vez para o log
+            save_planilha(planilha_id, cabecalho)
+            cabecalho = _ler_cabecalho(planilha_id)
+
+        ids: set[str] = set(_iter_ndjson(_idx_path(planilha_id)))
+        novos_ids: list[str] = []
+        adicionados, atualizados = 0, 0
+
+        for row in novas_linhas:
+            did = _ensure_dedup_id_inplace(row)
+            if did and did in ids:
+                atualizados += 1
+                continue
+            if did:
+                ids.add(did)
+                novos_ids.append(did)
             adicionados += 1
-            continue
 
-        if did in idx:
-            # Atualiza/enriquece a linha existente
-            idx[did].update(row)
-            atualizados += 1
+        with _log_path(planilha_id).open("ab") as f:
+            f.write(_ndjson(novas_linhas))
+        with _idx_path(planilha_id).open("ab") as f:
+            f.write(_ndjson(novos_ids))
+
+        row_count = int(cabecalho.get("row_count", 0)) + adicionados
+        log_count = int(cabecalho.get("log_count", 0)) + len(novas_linhas)
+        if log_count > 2 * row_count + _COMPACTAR_FOLGA:
+            data = load_planilha(planilha_id)
+            data["updated_at"] = _now_local()
+            save_planilha(planilha_id, data)
         else:
-            data["lines"].append(row)
-            idx[did] = row
-            adicionados += 1
-
-    data["row_count"] = len(data["lines"])
-    data["updated_at"] = _now_local()
-    data.setdefault("index", {})["dedup_ids"] = sorted(idx.keys())
+            cabecalho.update(row_count=row_count, log_count=log_count, updated_at=_now_local())
+            _gravar_cabecalho(planilha_id, cabecalho)
 
-    save_planilha(planilha_id, data)
     return adicionados, atualizados
@@ -0,0 +1,31 @@
+# app/tools/compile_cfg.py
+"""
+Pré-compila as regras derivadas do config_ofertas.json (passo de build/deploy):
+
+    python -m app.tools.compile_cfg
+
+Gera `config_ofertas.compiled.pickle` ao lado do JSON; no boot o app usa esse artefato
+enquanto o hash do JSON bater, sem refazer a varredura das regras.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from app.services.loader_main import CFG_COMPILADO_PATH, compilar_cfg
+
+
+def main() -> int:
+    t0 = time.perf_counter()
+    regras = compilar_cfg()
+    ms = (time.perf_counter() - t0) * 1000
+    print(
+        f"{CFG_COMPILADO_PATH.name}: {len(regras.rules)} regras, {len(regras.ofertas_embutidas)} ofertas embutidas, "
+        f"{len(regras.cupons_cdf)}/{len(regras.cupons_bi_mens)} cupons (cdf/bi-mens) em {ms:.1f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# app/utils/sku.py
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import Any
+
+# ============== LISTAS DE SKUs / IDs (CSV ou lista) ==============
+
+# só dígitos ASCII: `str.isdigit()` aceita expoentes (U+00B2) e dígitos arábico-índicos (U+0660-U+0669),
+# que passam no filtro e quebram no int()
+_DIGITOS = re.compile(r"\d+", re.ASCII)
+
+
+@lru_cache(maxsize=2048)
+def parse_csv(valor: str) -> tuple[str, ...]:
+    """
+    "A, B,,C " → ("A", "B", "C"): separa por vírgula, tira espaços e descarta vazios.
+    Cacheado pelo texto cru (o mesmo filtro/payload se repete muito); devolve tupla (imutável).
+    """
+    return tuple(p for p in (x.strip() for x in valor.split(",")) if p)
+
+
+def normalizar_ids_str(v: str | Iterable[Any] | None) -> list[str]:
+    """SKUs / Guru IDs vindos como CSV ou lista → lista de str sem vazios (None → [])."""
+    if v is None:
+        return []
+    if isinstance(v, str):
+        return list(parse_csv(v))
+    return [s for s in (str(x).strip() for x in v) if s]
+
+
+@lru_cache(maxsize=2048)
+def _ids_int_csv(valor: str) -> tuple[int, ...]:
+    return tuple(int(x) for x in parse_csv(valor) if _DIGITOS.fullmatch(x))
+
+
+def normalizar_ids_int(v: str | Iterable[Any] | None) -> list[int]:
+    """Shopify IDs vindos como CSV ou lista → lista de int (descarta não numéricos; None → [])."""
+    if v is None:
+        return []
+    if isinstance(v, str):
+        return list(_ids_int_csv(v))
+    out: list[int] = []
+    append = out.append
+    for x in v:
+        if type(x) is int:  # caso comum (JSON já traz int): sem str()/regex; bool não entra
+            if x >= 0:
+                append(x)
+            continue
+        s = x.strip() if isinstance(x, str) else str(x).strip()
+        if _DIGITOS.fullmatch(s):
+            append(int(s))
+    return out